@@ -0,0 +1,115 @@
+"""
+Rows/sec and bytes on the wire for the bulk write paths: a 1k-chunk document
+written as an INSERT of text vector literals, a text-format COPY (the previous
+two write paths) and the binary COPY now used; plus flashcards saved with one
+INSERT per row versus one multi-row INSERT ... RETURNING.
+
+Run from backend/ against a scratch database (rows are deleted afterwards):
+    python -m benchmarks.bench_bulk_write --chunks 1000 --repeat 5
+"""
+import argparse
+import io
+import statistics
+import time
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+from utils import database as db
+from utils.bulk_write import encode_copy, insert_returning
+from utils.embeddings import embedding_dim
+
+SENTENCE = "Binary COPY sends each float as four bytes instead of a decimal string. "
+
+
+def make_chunks(count: int, dim: int) -> tuple[list[str], np.ndarray]:
+    rng = np.random.default_rng(0)
+    return [f"Chunk {i}. " + SENTENCE * 12 for i in range(count)], rng.standard_normal((count, dim)).astype(np.float32)
+
+
+def write_values_text(cur, session_id, contents, matrix) -> int:
+    rows = [(session_id, c, i, e) for i, (c, e) in enumerate(zip(contents, matrix.tolist()))]
+    execute_values(
+        cur, "INSERT INTO chunks (session_id, content, chunk_index, embedding) VALUES %s", rows,
+        template="(%s, %s, %s, %s::vector)", page_size=len(rows),
+    )
+    return len(cur.query)
+
+
+def write_copy_text(cur, session_id, contents, matrix) -> int:
+    buf = io.StringIO()
+    for i, (content, embedding) in enumerate(zip(contents, matrix)):
+        vector = ",".join(map(str, embedding.tolist()))
+        buf.write(f"{session_id}\t{content}\t{i}\t[{vector}]\n")
+    data = buf.getvalue().encode()
+    cur.copy_expert("COPY chunks (session_id, content, chunk_index, embedding) FROM STDIN", io.BytesIO(data))
+    return len(data)
+
+
+def write_copy_binary(cur, session_id, contents, matrix) -> int:
+    data = encode_copy(db.CHUNK_COLUMNS[1], ((session_id, c, i, None, e) for i, (c, e) in enumerate(zip(contents, matrix))))
+    cur.copy_expert(
+        f"COPY chunks ({', '.join(db.CHUNK_COLUMNS[0])}) FROM STDIN WITH (FORMAT binary)", io.BytesIO(data)
+    )
+    return len(data)
+
+
+def save_cards_per_row(cur, session_id, cards) -> int:
+    for front, back in cards:
+        cur.execute("INSERT INTO flashcards (session_id, front, back) VALUES (%s, %s, %s) RETURNING id",
+                    (session_id, front, back))
+        cur.fetchone()
+    return len(cards)
+
+
+def save_cards_multi_row(cur, session_id, cards) -> int:
+    insert_returning(cur, "INSERT INTO flashcards (session_id, front, back) VALUES %s RETURNING id",
+                     [(session_id, front, back) for front, back in cards])
+    return 1
+
+
+def timed(fn, repeat: int, *args) -> tuple[float, int]:
+    """Median seconds over `repeat` runs, each in its own transaction, and the last run's result."""
+    timings, result = [], 0
+    for _ in range(repeat):
+        with db.db_cursor() as cur:
+            started = time.perf_counter()
+            result = fn(cur, *args)
+            timings.append(time.perf_counter() - started)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--cards", type=int, default=15)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    db._init_db_sync()
+    db.init_embedding_schema()
+    dim = embedding_dim()
+    contents, matrix = make_chunks(args.chunks, dim)
+    cards = [(f"What is concept {i}?", "A definition. " * 10) for i in range(args.cards)]
+    session_id = db.create_session("bench-bulk-write", "pdf", "bench.pdf", "benchmark")
+
+    try:
+        print(f"{args.chunks} chunks x {dim} dims, median of {args.repeat}\n")
+        print(f"{'chunk write':<22} {'rows/s':>10} {'KB sent':>10} {'bytes/row':>10}")
+        for name, fn in (("INSERT vector text", write_values_text),
+                         ("COPY text", write_copy_text),
+                         ("COPY binary", write_copy_binary)):
+            secs, sent = timed(fn, args.repeat, session_id, contents, matrix)
+            print(f"{name:<22} {args.chunks / secs:>10.0f} {sent / 1024:>10.0f} {sent / args.chunks:>10.0f}")
+
+        print(f"\n{'save ' + str(args.cards) + ' flashcards':<22} {'rows/s':>10} {'ms':>10} {'queries':>10}")
+        for name, fn in (("INSERT per row", save_cards_per_row), ("multi-row INSERT", save_cards_multi_row)):
+            secs, queries = timed(fn, args.repeat, session_id, cards)
+            print(f"{name:<22} {args.cards / secs:>10.0f} {secs * 1000:>10.2f} {queries:>10}")
+    finally:
+        with db.db_cursor() as cur:
+            cur.execute("DELETE FROM sessions WHERE id = %s", (session_id,))
+
+
+if __name__ == "__main__":
+    main()
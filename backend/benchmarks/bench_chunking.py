@@ -0,0 +1,151 @@
+"""
+Word-window chunking (800 words, 100 overlap) versus sentence-aware child chunks
+with parent-window expansion: chunk sizes in encoder tokens (and how much is cut
+off at embed time), whether the answer reaches the prompt, prompt size, and
+end-to-end chat latency against the fake LLM provider. The corpus is the fixture
+in benchmarks/retrieval_fixture.py, each fact buried in a paragraph of filler.
+
+Run from backend/ (two scratch sessions are created and deleted):
+    python -m benchmarks.bench_chunking --filler-sentences 12 --filler-paragraphs 6
+"""
+import os
+
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("LLM_FAKE_LATENCY_MS", "150")
+os.environ.setdefault("LLM_FAKE_TOKENS_PER_SEC", "2000")
+os.environ.setdefault("LLM_FAKE_PREFILL_TOKENS_PER_SEC", "20000")
+
+import argparse
+import asyncio
+import statistics
+import time
+from functools import partial
+
+from benchmarks.retrieval_fixture import DOCUMENTS, FILLER_TOPICS
+from services import conversation_memory, llm_gateway, rag_service
+from services.embedding_service import embed_query
+from utils import database as db, session_vectors
+from utils.chunking import iter_chunks, token_counts, child_token_limit
+from utils.embeddings import get_model, iter_embedded_batches
+from utils.tokens import count_tokens
+
+LEGACY_WORDS, LEGACY_OVERLAP, LEGACY_TOP_K = 800, 100, 5
+
+
+def legacy_chunks(pages: list[str]) -> list[dict]:
+    """The previous chunker: fixed word windows with overlap, no parents."""
+    words = " ".join(pages).split()
+    step = LEGACY_WORDS - LEGACY_OVERLAP
+    return [{"content": " ".join(words[i:i + LEGACY_WORDS]), "parent": None}
+            for i in range(0, max(len(words) - LEGACY_OVERLAP, 1), step)]
+
+
+def document(filler_sentences: int, filler_paragraphs: int) -> list[str]:
+    """
+    Pages of lecture notes: one paragraph per fact, padded with filler sentences,
+    followed by paragraphs of filler only.
+    """
+    def filler(topic: str, n: int, offset: int = 0) -> list[str]:
+        return [f"Point {offset + j} about {topic} is worth revisiting before the next class meeting."
+                for j in range(n)]
+
+    paragraphs = []
+    for i, (fact, _) in enumerate(DOCUMENTS):
+        topic = FILLER_TOPICS[i % len(FILLER_TOPICS)]
+        half = filler_sentences // 2
+        paragraphs.append(" ".join(filler(topic, half) + [fact] + filler(topic, filler_sentences - half, half)))
+        paragraphs.extend(" ".join(filler(topic, filler_sentences, filler_sentences * (p + 1)))
+                          for p in range(filler_paragraphs))
+    return ["\n\n".join(paragraphs[i:i + 3]) for i in range(0, len(paragraphs), 3)]
+
+
+def legacy_context(session_id: str, query: str, lexical_weight: float | None = None) -> list[str]:
+    results = rag_service.retrieve_chunks(session_id, embed_query(query), top_k=LEGACY_TOP_K, query_text=query,
+                                          lexical_weight=lexical_weight)
+    return [f"[Chunk {i+1} (similarity: {r['similarity']:.2f})]:\n{r['content']}" for i, r in enumerate(results)]
+
+
+def store(title: str, chunks: list[dict]) -> tuple[str, float]:
+    started = time.perf_counter()
+    batches = list(iter_embedded_batches(chunks))
+    embed_secs = time.perf_counter() - started
+    session_id = db.create_pending_session(title, "pdf", "bench.pdf", None)
+    stored = 0
+    for batch_chunks, embeddings in batches:
+        stored += db.store_chunk_batch(session_id, batch_chunks, embeddings, stored)
+    db.finish_session(session_id, "bench")
+    return session_id, embed_secs
+
+
+async def chat(session_id: str, query: str, context) -> dict:
+    """One chat turn as chat_with_rag runs it, with a pluggable context builder."""
+    started = time.perf_counter()
+    parts = await asyncio.get_running_loop().run_in_executor(None, context, session_id, query)
+    messages, usage = await conversation_memory.build_messages(session_id, rag_service.SYSTEM_PROMPT, parts, query)
+    first = None
+    async for _ in llm_gateway.stream(messages, route="chat", model=rag_service.MODEL, max_tokens=1500):
+        if first is None:
+            first = time.perf_counter()
+    done = time.perf_counter()
+    return {"parts": parts, "prompt_tokens": usage["prompt_tokens"],
+            "ttft_ms": (first - started) * 1000, "total_ms": (done - started) * 1000}
+
+
+async def evaluate(name: str, session_id: str, chunks: list[dict], embed_secs: float, context, limit: int):
+    counts = token_counts([c["content"] for c in chunks])
+    cut = sum(max(n - limit, 0) for n in counts) / sum(counts)
+    queries = [(query, fact) for fact, qs in DOCUMENTS for _, query in qs]
+    turns = [(await chat(session_id, query, context), fact) for query, fact in queries]
+    # Fact text is whitespace-normalised by the sentence splitter; compare on the same form
+    found = [" ".join(fact.split()) in " ".join(" ".join(t["parts"]).split()) for t, fact in turns]
+    top1 = [bool(t["parts"]) and " ".join(fact.split()) in " ".join(t["parts"][0].split()) for t, fact in turns]
+    print(f"{name:<10} {len(chunks):>7} {statistics.mean(counts):>10.0f} {cut:>9.0%} {embed_secs * 1000:>9.0f}"
+          f" {sum(found) / len(found):>7.2f} {sum(top1) / len(top1):>6.2f}"
+          f" {statistics.mean(count_tokens(' '.join(t['parts'])) for t, _ in turns):>11.0f}"
+          f" {statistics.mean(t['prompt_tokens'] for t, _ in turns):>8.0f}"
+          f" {statistics.median(t['ttft_ms'] for t, _ in turns):>8.1f}"
+          f" {statistics.median(t['total_ms'] for t, _ in turns):>9.1f}")
+
+
+async def run(args):
+    pages = document(args.filler_sentences, args.filler_paragraphs)
+    limit = getattr(get_model(), "max_seq_length", None) or child_token_limit()
+    sessions = []
+    try:
+        legacy = legacy_chunks(pages)
+        legacy_id, legacy_secs = store("bench-chunking-legacy", legacy)
+        sessions.append(legacy_id)
+        children = list(iter_chunks(pages))
+        children_id, children_secs = store("bench-chunking-sentences", children)
+        sessions.append(children_id)
+
+        print(f"{sum(len(p.split()) for p in pages)} words, {len(DOCUMENTS) * 2} questions, "
+              f"encoder limit {limit} tokens\n")
+        print(f"{'chunker':<10} {'chunks':>7} {'mean tok':>10} {'cut off':>9} {'embed ms':>9}"
+              f" {'found':>7} {'top-1':>6} {'context tok':>11} {'prompt':>8} {'TTFT ms':>8} {'total ms':>9}")
+        await evaluate("words", legacy_id, legacy, legacy_secs,
+                       partial(legacy_context, lexical_weight=args.lexical_weight), limit)
+        await evaluate("sentences", children_id, children, children_secs,
+                       partial(rag_service.build_rag_context, lexical_weight=args.lexical_weight), limit)
+    finally:
+        with db.db_cursor() as cur:
+            cur.execute("DELETE FROM sessions WHERE id = ANY(%s::uuid[])", (sessions,))
+        for session_id in sessions:
+            session_vectors.invalidate(session_id)
+        await llm_gateway.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filler-sentences", type=int, default=12, help="filler sentences per paragraph")
+    parser.add_argument("--filler-paragraphs", type=int, default=6, help="filler-only paragraphs after each fact")
+    parser.add_argument("--lexical-weight", type=float, default=None,
+                        help="override HYBRID_LEXICAL_WEIGHT (1 = full-text only)")
+    args = parser.parse_args()
+    db._init_db_sync()
+    db.init_embedding_schema()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
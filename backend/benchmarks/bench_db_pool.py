@@ -0,0 +1,88 @@
+"""
+Requests/sec for the database work behind /chat and /quiz/evaluate, with one
+connection per query (the old behaviour) versus the connection pool.
+
+Run from backend/ against a scratch database:
+    python -m benchmarks.bench_db_pool --requests 400 --concurrency 8
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import database as db
+
+
+def _embedding_dim() -> int:
+    with db.db_cursor() as cur:
+        cur.execute(
+            "SELECT atttypmod FROM pg_attribute WHERE attrelid = 'chunks'::regclass AND attname = 'embedding'"
+        )
+        return cur.fetchone()[0]
+
+
+def _random_vector(dim: int) -> list[float]:
+    return [random.uniform(-1, 1) for _ in range(dim)]
+
+
+def setup_fixture(dim: int) -> tuple[str, list[str]]:
+    session_id = db.create_session("bench-db-pool", "pdf", "bench.pdf", "benchmark " * 200)
+    db.store_chunks_with_embeddings(session_id, [
+        {"content": f"chunk {i} " * 50, "index": i, "embedding": _random_vector(dim)}
+        for i in range(40)
+    ])
+    question_ids = db.save_quiz_questions(session_id, [
+        {"question": f"Q{i}?", "options": ["a", "b", "c", "d"], "correct_answer": i % 4, "explanation": "because"}
+        for i in range(8)
+    ])
+    return session_id, question_ids
+
+
+def chat_path(session_id: str, query_embedding: list[float], _question_ids: list[str]):
+    db.get_session(session_id)
+    db.save_chat_message(session_id, "user", "What is this about?")
+    db.similarity_search(session_id, query_embedding, top_k=5)
+    db.get_conversation_memory(session_id, 20)
+    db.save_chat_message(session_id, "assistant", "It is about benchmarks.")
+
+
+def quiz_evaluate_path(session_id: str, _query_embedding: list[float], question_ids: list[str]):
+    db.get_quiz_answer(session_id, random.choice(question_ids))
+
+
+def run(workload, args, session_id, query_embedding, question_ids) -> float:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(lambda _: workload(session_id, query_embedding, question_ids), range(args.requests)))
+    return args.requests / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    db._init_db_sync()
+    db.init_embedding_schema()  # the chunks table (loads the embedding model for its dimension)
+    dim = _embedding_dim()
+    session_id, question_ids = setup_fixture(dim)
+    query_embedding = _random_vector(dim)
+    pool_max = db.DB_POOL_MAX or 10
+
+    try:
+        print(f"{'path':<18} {'direct req/s':>14} {'pooled req/s':>14} {'speedup':>9}")
+        for name, workload in (("/chat", chat_path), ("/quiz/evaluate", quiz_evaluate_path)):
+            db.DB_POOL_MAX = 0
+            direct = run(workload, args, session_id, query_embedding, question_ids)
+            db.DB_POOL_MAX = pool_max
+            pooled = run(workload, args, session_id, query_embedding, question_ids)
+            print(f"{name:<18} {direct:>14.1f} {pooled:>14.1f} {pooled / direct:>8.1f}x")
+    finally:
+        with db.db_cursor() as cur:
+            cur.execute("DELETE FROM sessions WHERE id = %s", (session_id,))
+        db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
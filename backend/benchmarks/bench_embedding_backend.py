@@ -0,0 +1,107 @@
+"""
+Startup time, peak RSS and embeddings/sec for each encoder runtime, plus how
+closely its vectors match the PyTorch ones. Each configuration runs in a fresh
+process so load time and memory aren't shared.
+
+Run from backend/ (ONNX needs `pip install sentence-transformers[onnx]`):
+    python -m benchmarks.bench_embedding_backend --texts 512
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+CONFIGS = [
+    ("torch", "torch", ""),
+    ("onnx fp32", "onnx", "onnx/model.onnx"),
+    ("onnx int8", "onnx", "onnx/model_quint8_avx2.onnx"),
+]
+
+SENTENCE = (
+    "Retrieval augmented generation grounds a language model's answers in passages "
+    "retrieved from an index of document chunks. "
+)
+AGREEMENT_TEXTS = 64  # vectors compared against the torch baseline
+
+
+def make_texts(count: int) -> list[str]:
+    return [f"Chunk {i}. " + SENTENCE * (4 + i % 8) for i in range(count)]
+
+
+def run_worker(texts: int, batch_size: int, out_path: str):
+    """Runs inside the child process configured through EMBEDDING_BACKEND / EMBEDDING_MODEL_FILE."""
+    started = time.perf_counter()
+    from utils import embeddings
+    embeddings.get_model()
+    load_secs = time.perf_counter() - started
+
+    corpus = make_texts(texts)
+    embeddings.encode_batch(corpus[:batch_size])  # first call pays for lazy kernel init
+    started = time.perf_counter()
+    for i in range(0, len(corpus), batch_size):
+        matrix = embeddings.encode_batch(corpus[i:i + batch_size])
+        if i == 0:
+            np.save(out_path, matrix[:AGREEMENT_TEXTS])
+    per_sec = len(corpus) / (time.perf_counter() - started)
+
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+    print(json.dumps({"load_secs": load_secs, "rss_mb": rss_mb, "per_sec": per_sec}))
+
+
+def run_config(backend: str, model_file: str, texts: int, batch_size: int, out_path: str) -> dict | None:
+    env = {**os.environ, "EMBEDDING_BACKEND": backend, "EMBEDDING_MODEL_FILE": model_file}
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_embedding_backend", "--worker",
+         "--texts", str(texts), "--batch-size", str(batch_size), "--out", out_path],
+        env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        print(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed", file=sys.stderr)
+        return None
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def agreement(a: np.ndarray, b: np.ndarray) -> float:
+    """Mean cosine similarity between matching rows."""
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return float(np.mean(np.sum(a * b, axis=1)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.texts, args.batch_size, args.out)
+        return
+
+    outdir = tempfile.mkdtemp()
+    baseline = None
+    print(f"{args.texts} texts, batch {args.batch_size}\n")
+    print(f"{'runtime':<10} {'load s':>7} {'peak RSS MB':>12} {'emb/s':>8} {'cos vs torch':>13}")
+    for name, backend, model_file in CONFIGS:
+        out_path = os.path.join(outdir, f"{backend}_{len(model_file)}.npy")
+        result = run_config(backend, model_file, args.texts, args.batch_size, out_path)
+        if result is None:
+            print(f"{name:<10} (unavailable)")
+            continue
+        vectors = np.load(out_path)
+        if baseline is None and backend == "torch":
+            baseline = vectors
+        cos = f"{agreement(vectors, baseline):.4f}" if baseline is not None else "-"
+        print(f"{name:<10} {result['load_secs']:>7.2f} {result['rss_mb']:>12.0f} {result['per_sec']:>8.1f} {cos:>13}")
+
+
+if __name__ == "__main__":
+    main()
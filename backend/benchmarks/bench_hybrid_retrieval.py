@@ -0,0 +1,73 @@
+"""
+Offline recall and latency for chat retrieval: vector only, full-text only and
+hybrid (RRF) at a few lexical weights, over the fixture corpus in
+benchmarks/retrieval_fixture.py. Recall is reported separately for exact-term
+and paraphrased questions. Latency covers the one-round-trip SQL path and the
+path used for sessions in the in-process vector cache.
+
+Run from backend/ (a scratch session is created and deleted):
+    python -m benchmarks.bench_hybrid_retrieval --filler 500 --k 5
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.retrieval_fixture import corpus
+from services import rag_service
+from utils import database as db, session_vectors
+from utils.embeddings import encode_batch
+
+WEIGHTS = [("vector", 0.0), ("hybrid 0.3", 0.3), ("hybrid 0.5", 0.5), ("full-text", 1.0)]
+
+
+def evaluate(session_id: str, queries, embeddings, chunks: list[str], weight: float, k: int,
+             cached: bool) -> tuple[dict[str, float], float]:
+    """Recall@k per query kind and median latency in ms."""
+    if cached:
+        rag_service.get_session_vectors(session_id)
+    else:
+        session_vectors.invalidate(session_id)
+    hits, totals, latencies = {}, {}, []
+    for (kind, query, gold), embedding in zip(queries, embeddings):
+        if not cached:
+            session_vectors.mark_too_large(session_id)  # keep this run on the SQL path
+        started = time.perf_counter()
+        results = rag_service.retrieve_chunks(session_id, embedding, top_k=k, query_text=query, lexical_weight=weight)
+        latencies.append((time.perf_counter() - started) * 1000)
+        totals[kind] = totals.get(kind, 0) + 1
+        hits[kind] = hits.get(kind, 0) + any(r["content"] == chunks[gold] for r in results)
+    recall = {kind: hits[kind] / totals[kind] for kind in totals}
+    return recall, statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filler", type=int, default=500, help="distractor chunks added to the corpus")
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    db._init_db_sync()
+    db.init_embedding_schema()
+    chunks, queries = corpus(args.filler)
+    vectors = encode_batch(chunks)
+    query_vectors = [v.tolist() for v in encode_batch([q for _, q, _ in queries])]
+    session_id = db.create_session("bench-hybrid-retrieval", "pdf", "bench.pdf", "\n\n".join(chunks))
+    db.store_chunks_with_embeddings(session_id, [
+        {"content": text, "index": i, "embedding": vector} for i, (text, vector) in enumerate(zip(chunks, vectors))
+    ])
+
+    try:
+        print(f"{len(chunks)} chunks, {len(queries)} queries, recall@{args.k}\n")
+        print(f"{'retriever':<12} {'exact':>7} {'paraphrase':>11} {'SQL ms':>8} {'cached ms':>10}")
+        for name, weight in WEIGHTS:
+            recall, sql_ms = evaluate(session_id, queries, query_vectors, chunks, weight, args.k, cached=False)
+            _, cached_ms = evaluate(session_id, queries, query_vectors, chunks, weight, args.k, cached=True)
+            print(f"{name:<12} {recall['exact']:>7.2f} {recall['paraphrase']:>11.2f} {sql_ms:>8.2f} {cached_ms:>10.2f}")
+    finally:
+        with db.db_cursor() as cur:
+            cur.execute("DELETE FROM sessions WHERE id = %s", (session_id,))
+        session_vectors.invalidate(session_id)
+
+
+if __name__ == "__main__":
+    main()
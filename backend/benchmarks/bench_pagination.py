@@ -0,0 +1,124 @@
+"""
+Session listing and chat history latency as the tables grow: the old unbounded
+listing versus keyset pages (first page and one halfway down), with and without
+the composite indexes. Runs on scratch tables (bench_sessions,
+bench_chat_messages); real tables are untouched.
+
+Run from backend/:
+    python -m benchmarks.bench_pagination --sizes 1000 10000 100000
+"""
+import argparse
+import statistics
+import time
+
+from utils import database as db
+
+PAGE = 50
+
+QUERIES = {
+    "list all (old)": "SELECT id, title, created_at FROM bench_sessions ORDER BY created_at DESC",
+    "sessions page 1": "SELECT id, title, created_at FROM bench_sessions ORDER BY created_at DESC, id DESC LIMIT %(page)s",
+    "sessions deep page": """SELECT id, title, created_at FROM bench_sessions
+                             WHERE (created_at, id) < (%(session_at)s, %(session_id)s)
+                             ORDER BY created_at DESC, id DESC LIMIT %(page)s""",
+    "history page 1": """SELECT id, role, content, created_at FROM bench_chat_messages
+                         WHERE session_id = %(hot)s ORDER BY created_at DESC, id DESC LIMIT %(page)s""",
+    "history deep page": """SELECT id, role, content, created_at FROM bench_chat_messages
+                            WHERE session_id = %(hot)s AND (created_at, id) < (%(message_at)s, %(message_id)s)
+                            ORDER BY created_at DESC, id DESC LIMIT %(page)s""",
+}
+
+INDEXES = [
+    "CREATE INDEX ON bench_sessions (created_at DESC, id DESC)",
+    "CREATE INDEX ON bench_chat_messages (session_id, created_at DESC, id DESC)",
+]
+
+
+def load(cur, sessions: int, messages_per_session: int):
+    cur.execute("DROP TABLE IF EXISTS bench_chat_messages, bench_sessions")
+    cur.execute("""CREATE TABLE bench_sessions (
+                       id UUID PRIMARY KEY DEFAULT gen_random_uuid(), title TEXT, created_at TIMESTAMPTZ)""")
+    cur.execute("""CREATE TABLE bench_chat_messages (
+                       id UUID PRIMARY KEY DEFAULT gen_random_uuid(), session_id UUID,
+                       role TEXT, content TEXT, created_at TIMESTAMPTZ)""")
+    cur.execute(
+        """INSERT INTO bench_sessions (title, created_at)
+           SELECT 'Session ' || i, NOW() - i * INTERVAL '1 minute' FROM generate_series(1, %s) i""",
+        (sessions,)
+    )
+    # Most sessions get a few messages; the first (hot) session gets a long conversation
+    cur.execute(
+        """INSERT INTO bench_chat_messages (session_id, role, content, created_at)
+           SELECT s.id, CASE WHEN m %% 2 = 0 THEN 'user' ELSE 'assistant' END,
+                  'Message ' || m, s.created_at + m * INTERVAL '1 second'
+           FROM bench_sessions s, generate_series(1, %s) m""",
+        (messages_per_session,)
+    )
+    cur.execute("SELECT id FROM bench_sessions ORDER BY created_at DESC LIMIT 1")
+    hot = cur.fetchone()[0]
+    cur.execute(
+        """INSERT INTO bench_chat_messages (session_id, role, content, created_at)
+           SELECT %s, 'user', 'Message ' || m, NOW() + m * INTERVAL '1 second' FROM generate_series(1, %s) m""",
+        (hot, sessions // 10)
+    )
+    cur.execute("ANALYZE bench_sessions")
+    cur.execute("ANALYZE bench_chat_messages")
+    return hot
+
+
+def params(cur, hot, sessions: int) -> dict:
+    cur.execute("SELECT created_at, id FROM bench_sessions ORDER BY created_at DESC, id DESC OFFSET %s LIMIT 1",
+                (sessions // 2,))
+    session_at, session_id = cur.fetchone()
+    cur.execute("""SELECT created_at, id FROM bench_chat_messages WHERE session_id = %s
+                   ORDER BY created_at DESC, id DESC OFFSET %s LIMIT 1""", (hot, sessions // 20))
+    message_at, message_id = cur.fetchone()
+    return {"page": PAGE, "hot": hot, "session_at": session_at, "session_id": session_id,
+            "message_at": message_at, "message_id": message_id}
+
+
+def measure(cur, values: dict, repeat: int) -> dict[str, float]:
+    results = {}
+    for name, sql in QUERIES.items():
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            cur.execute(sql, values)
+            cur.fetchall()
+            timings.append(time.perf_counter() - started)
+        results[name] = statistics.median(timings) * 1000
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="sessions")
+    parser.add_argument("--messages-per-session", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    conn = db.get_connection()
+    conn.autocommit = True
+    cur = conn.cursor()
+    try:
+        print(f"median ms over {args.repeat} runs, page size {PAGE}\n")
+        print(f"{'sessions':>9} {'query':<20} {'no index':>10} {'indexed':>10}")
+        for size in args.sizes:
+            hot = load(cur, size, args.messages_per_session)
+            values = params(cur, hot, size)
+            plain = measure(cur, values, args.repeat)
+            for ddl in INDEXES:
+                cur.execute(ddl)
+            cur.execute("ANALYZE bench_sessions")
+            cur.execute("ANALYZE bench_chat_messages")
+            indexed = measure(cur, values, args.repeat)
+            for name in QUERIES:
+                print(f"{size:>9} {name:<20} {plain[name]:>10.2f} {indexed[name]:>10.2f}")
+            print()
+    finally:
+        cur.execute("DROP TABLE IF EXISTS bench_chat_messages, bench_sessions")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
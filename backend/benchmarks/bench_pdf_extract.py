@@ -0,0 +1,73 @@
+"""
+Pages/sec for each PDF extraction backend, serial vs. process pool.
+
+Run from backend/:
+    python -m benchmarks.bench_pdf_extract --pages 300
+    python -m benchmarks.bench_pdf_extract --pdf path/to/textbook.pdf
+Without --pdf, a synthetic text PDF with --pages pages is generated (needs PyMuPDF).
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from services import pdf_service
+
+BACKENDS = ("pdfplumber", "pymupdf", "pypdfium2")
+
+LOREM = (
+    "Retrieval augmented generation combines a vector index over document chunks with a "
+    "language model that answers questions grounded in the retrieved passages. "
+)
+
+
+def make_pdf(pages: int) -> str:
+    import pymupdf
+    path = os.path.join(tempfile.mkdtemp(), f"bench_{pages}.pdf")
+    doc = pymupdf.open()
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_textbox(pymupdf.Rect(50, 50, 550, 800), f"Page {i + 1}. " + LOREM * 18, fontsize=10)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def bench(path: str, backend: str, parallel: bool) -> tuple[float, float]:
+    """Returns (pages/sec, seconds until the first page was yielded)."""
+    started = time.perf_counter()
+    first = None
+    pages = 0
+    for _ in pdf_service.iter_pdf_pages(path, backend=backend, parallel=parallel):
+        if first is None:
+            first = time.perf_counter() - started
+        pages += 1
+    return pages / (time.perf_counter() - started), first or 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="PDF to extract (default: generate one)")
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    pdf_service.PDF_WORKERS = args.workers  # sizes the pool, created on first use
+
+    path = args.pdf or make_pdf(args.pages)
+    print(f"{path}: {pdf_service.pdf_page_count(path)} pages, {args.workers} workers\n")
+    print(f"{'backend':<12} {'serial p/s':>11} {'pool p/s':>10} {'pool 1st page':>14}")
+    try:
+        for backend in BACKENDS:
+            try:
+                serial, _ = bench(path, backend, parallel=False)
+            except ImportError:
+                print(f"{backend:<12} (not installed)")
+                continue
+            parallel, first = bench(path, backend, parallel=True)
+            print(f"{backend:<12} {serial:>11.1f} {parallel:>10.1f} {first * 1000:>12.0f}ms")
+    finally:
+        pdf_service.shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Retrieval latency and recall@k for the vector index options, on a synthetic
+clustered corpus in a scratch table (bench_chunks; real tables are untouched).
+Per-session searches (what the app runs) are measured for each VECTOR_SESSION_SCAN
+mode on the same multi-session table, with the mean rows returned: an ANN scan
+that filters afterwards returns far fewer than k.
+
+Run from backend/ against a Postgres with pgvector >= 0.5:
+    python -m benchmarks.bench_vector_index --rows 50000 --sessions 500
+"""
+import argparse
+import io
+import statistics
+import time
+
+import numpy as np
+
+from utils import database as db
+from utils.vector_index import index_ddl, ivfflat_lists
+
+CONFIGS = [
+    ("exact", None, []),
+    ("ivfflat probes=1", "ivfflat", ["SET LOCAL ivfflat.probes = 1"]),
+    ("ivfflat probes=10", "ivfflat", ["SET LOCAL ivfflat.probes = 10"]),
+    ("hnsw ef_search=40", "hnsw", ["SET LOCAL hnsw.ef_search = 40"]),
+    ("hnsw ef_search=100", "hnsw", ["SET LOCAL hnsw.ef_search = 100"]),
+]
+
+# Per-session scan modes (see utils/vector_index.py), on top of a config's settings
+SESSION_SCANS = {
+    "ann": [],
+    "exact": ["SET LOCAL enable_indexscan = off"],
+    "iterative": ["SET LOCAL hnsw.iterative_scan = strict_order", "SET LOCAL ivfflat.iterative_scan = relaxed_order"],
+}
+
+
+def make_corpus(rows: int, dim: int, clusters: int = 64, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, rows)] + 0.5 * rng.standard_normal((rows, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def load(cur, vectors: np.ndarray, sessions: int, dim: int):
+    cur.execute("DROP TABLE IF EXISTS bench_chunks")
+    cur.execute(f"CREATE TABLE bench_chunks (id SERIAL PRIMARY KEY, session_id INTEGER, embedding vector({dim}))")
+    buf = io.StringIO()
+    for i, v in enumerate(vectors):
+        buf.write(f"{i % sessions}\t[{','.join(map(str, v.tolist()))}]\n")
+    buf.seek(0)
+    cur.copy_expert("COPY bench_chunks (session_id, embedding) FROM STDIN", buf)
+    cur.execute("CREATE INDEX ON bench_chunks (session_id)")
+    cur.execute("ANALYZE bench_chunks")
+
+
+def run_queries(cur, queries: np.ndarray, settings: list[str], k: int, sessions: int,
+                per_session: bool) -> tuple[list[list[int]], list[float]]:
+    results, latencies = [], []
+    for i, q in enumerate(queries):
+        literal = f"[{','.join(map(str, q.tolist()))}]"
+        started = time.perf_counter()
+        for setting in settings:
+            cur.execute(setting)
+        if per_session:
+            cur.execute(
+                "SELECT id FROM bench_chunks WHERE session_id = %s ORDER BY embedding <=> %s::vector LIMIT %s",
+                (i % sessions, literal, k)
+            )
+        else:
+            cur.execute("SELECT id FROM bench_chunks ORDER BY embedding <=> %s::vector LIMIT %s", (literal, k))
+        results.append([r[0] for r in cur.fetchall()])
+        latencies.append((time.perf_counter() - started) * 1000)
+        cur.connection.commit()
+    return results, latencies
+
+
+def mean_rows(results: list[list[int]]) -> float:
+    return sum(len(r) for r in results) / max(len(results), 1)
+
+
+def recall(results: list[list[int]], truth: list[list[int]]) -> float:
+    hits = sum(len(set(r) & set(t)) for r, t in zip(results, truth))
+    return hits / max(sum(len(t) for t in truth), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    vectors = make_corpus(args.rows, args.dim)
+    queries = make_corpus(args.queries, args.dim, seed=1)
+
+    conn = db.get_connection()
+    cur = conn.cursor()
+    cur.execute("SET statement_timeout = 0")
+    try:
+        load(cur, vectors, args.sessions, args.dim)
+        conn.commit()
+
+        cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        version = cur.fetchone()[0]
+        scans = [scan for scan in SESSION_SCANS
+                 if scan != "iterative" or tuple(int(p) for p in version.split(".")[:2]) >= (0, 8)]
+
+        truth = {}
+        print(f"{args.rows} rows, {args.sessions} sessions, dim {args.dim}, k={args.k}, pgvector {version}\n")
+        header = [f"{'config':<20} {'build s':>8}", f"{'global p50 ms':>13} {'recall':>7}"]
+        header += [f"{scan + ' p50 ms':>15} {'recall':>7} {'rows':>5}" for scan in scans]
+        print(" | ".join(header))
+        for name, kind, settings in CONFIGS:
+            build = 0.0
+            cur.execute("DROP INDEX IF EXISTS bench_chunks_embedding_idx")
+            if kind:
+                spec = ({"kind": "hnsw", "m": 16, "ef_construction": 64} if kind == "hnsw"
+                        else {"kind": "ivfflat", "lists": ivfflat_lists(args.rows)})
+                started = time.perf_counter()
+                cur.execute(index_ddl(spec, name="bench_chunks_embedding_idx", table="bench_chunks",
+                                      concurrently=False))
+                build = time.perf_counter() - started
+            conn.commit()
+
+            row = [f"{name:<20} {build:>8.1f}"]
+            results, latencies = run_queries(cur, queries, settings, args.k, args.sessions, per_session=False)
+            truth.setdefault("global", results)
+            row.append(f"{statistics.median(latencies):>13.2f} {recall(results, truth['global']):>7.3f}")
+            for scan in scans:
+                scan_settings = [x for x in SESSION_SCANS[scan] if kind and x.startswith(f"SET LOCAL {kind}.")]
+                if scan == "exact":
+                    scan_settings = SESSION_SCANS["exact"]
+                results, latencies = run_queries(cur, queries, settings + scan_settings, args.k, args.sessions,
+                                                 per_session=True)
+                truth.setdefault("session", results)
+                row.append(f"{statistics.median(latencies):>15.2f} {recall(results, truth['session']):>7.3f}"
+                           f" {mean_rows(results):>5.1f}")
+            print(" | ".join(row))
+    finally:
+        cur.execute("DROP TABLE IF EXISTS bench_chunks")
+        conn.commit()
+        cur.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+A local OpenAI/Groq-compatible chat completions server for load tests. It serves
+POST /openai/v1/chat/completions (streaming and not) with configurable time to
+first token, token rate, prompt processing rate and 429 rate, and sends Groq's
+rate-limit headers. Unlike LLM_PROVIDER=fake, requests go through the real Groq
+SDK and HTTP client, so connection pooling and SSE parsing are part of the test.
+
+Run from backend/, then start the API with GROQ_BASE_URL=http://127.0.0.1:8765:
+    python -m benchmarks.fake_groq --port 8765 --latency-ms 300 --tokens-per-sec 250
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from services.llm_fake import HEADERS, asks_for_json, fake_json, fake_text
+from utils.tokens import count_tokens, message_tokens
+
+SETTINGS = {"latency_ms": 300.0, "tokens_per_sec": 250.0, "prefill_tokens_per_sec": 0.0, "error_rate": 0.0}
+
+
+async def chat_completions(request: Request):
+    params = await request.json()
+    messages, model = params["messages"], params.get("model", "fake")
+    if SETTINGS["error_rate"] and random.random() < SETTINGS["error_rate"]:
+        return JSONResponse({"error": {"message": "Rate limit reached (fake)", "type": "tokens",
+                                       "code": "rate_limit_exceeded"}},
+                            status_code=429, headers={**HEADERS, "retry-after": "1"})
+
+    max_tokens = params.get("max_tokens") or 1500
+    json_mode = (params.get("response_format") or {}).get("type") == "json_object"
+    prompt = messages[-1]["content"]
+    content = fake_json(prompt) if json_mode or asks_for_json(prompt) else fake_text(max_tokens)
+    prompt_tokens = message_tokens(messages)
+    first_token = SETTINGS["latency_ms"] / 1000
+    if SETTINGS["prefill_tokens_per_sec"]:
+        first_token += prompt_tokens / SETTINGS["prefill_tokens_per_sec"]
+    await asyncio.sleep(first_token)
+
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    usage = {"prompt_tokens": prompt_tokens, "completion_tokens": count_tokens(content),
+             "total_tokens": prompt_tokens + count_tokens(content)}
+
+    if not params.get("stream"):
+        await asyncio.sleep(count_tokens(content) / SETTINGS["tokens_per_sec"])
+        return JSONResponse({
+            "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                         "finish_reason": "stop", "logprobs": None}],
+            "usage": usage,
+        }, headers=HEADERS)
+
+    def chunk(delta: dict, finish_reason: str | None = None, **extra) -> str:
+        body = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason, "logprobs": None}],
+                **extra}
+        return f"data: {json.dumps(body)}\n\n"
+
+    async def events():
+        yield chunk({"role": "assistant", "content": ""})
+        for word in content.split(" "):
+            await asyncio.sleep(1 / SETTINGS["tokens_per_sec"])
+            yield chunk({"content": word + " "})
+        yield chunk({}, "stop", x_groq={"id": completion_id, "usage": usage})
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=HEADERS)
+
+
+app = Starlette(routes=[
+    Route("/openai/v1/chat/completions", chat_completions, methods=["POST"]),
+    Route("/health", lambda request: JSONResponse({"status": "ok"})),
+])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=SETTINGS["latency_ms"], help="time to first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=SETTINGS["tokens_per_sec"])
+    parser.add_argument("--prefill-tokens-per-sec", type=float, default=SETTINGS["prefill_tokens_per_sec"],
+                        help="prompt processing rate added to the first token (0 = free)")
+    parser.add_argument("--error-rate", type=float, default=SETTINGS["error_rate"], help="fraction answered with 429")
+    args = parser.parse_args()
+    SETTINGS.update(latency_ms=args.latency_ms, tokens_per_sec=args.tokens_per_sec,
+                    prefill_tokens_per_sec=args.prefill_tokens_per_sec, error_rate=args.error_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+A local stand-in for the parts of YouTube the API uses: the watch page, the
+InnerTube player endpoint and caption track that youtube-transcript-api reads,
+and oEmbed for titles. Unlike VIDEO_PROVIDER=fake, requests go through the real
+transcript library and the pooled HTTP clients, so caching and connection reuse
+are part of the test. Transcripts are the same canned lectures as services/video_fake.py.
+
+Video ids starting with "nocc" have transcripts disabled and ids starting with
+"gone" are unavailable. GET /stats counts the requests served per endpoint.
+
+Run from backend/, then start the API with YOUTUBE_BASE_URL=http://127.0.0.1:8766:
+    python -m benchmarks.fake_youtube --port 8766 --latency-ms 150
+"""
+import argparse
+import asyncio
+import re
+from collections import Counter
+from xml.sax.saxutils import escape
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, JSONResponse, Response
+from starlette.routing import Route
+
+from services.video_fake import lecture_text
+
+SETTINGS = {"latency_ms": 150.0, "words": 3000}
+API_KEY = "fake-innertube-key"
+
+served: Counter = Counter()
+
+
+async def _respond_after_latency(endpoint: str):
+    served[endpoint] += 1
+    await asyncio.sleep(SETTINGS["latency_ms"] / 1000)
+
+
+async def watch(request: Request):
+    await _respond_after_latency("watch")
+    return HTMLResponse(f'<html><script>ytcfg.set({{"INNERTUBE_API_KEY": "{API_KEY}"}});</script></html>')
+
+
+async def player(request: Request):
+    await _respond_after_latency("player")
+    video_id = (await request.json())["videoId"]
+    if video_id.startswith("gone"):
+        return JSONResponse({"playabilityStatus": {"status": "ERROR", "reason": "This video is unavailable"}})
+    if video_id.startswith("nocc"):
+        return JSONResponse({"playabilityStatus": {"status": "OK"}})
+    return JSONResponse({
+        "playabilityStatus": {"status": "OK"},
+        "captions": {"playerCaptionsTracklistRenderer": {
+            "captionTracks": [{
+                "baseUrl": f"{str(request.base_url).rstrip('/')}/api/timedtext?v={video_id}&lang=en",
+                "name": {"runs": [{"text": "English"}]},
+                "languageCode": "en",
+                "kind": "asr",
+                "isTranslatable": False,
+            }],
+            "translationLanguages": [],
+        }},
+    })
+
+
+async def timedtext(request: Request):
+    await _respond_after_latency("timedtext")
+    sentences = re.split(r"(?<=\.) ", lecture_text(request.query_params["v"], SETTINGS["words"]))
+    lines = [f'<text start="{i * 4.0}" dur="4.0">{escape(sentence)}</text>' for i, sentence in enumerate(sentences)]
+    return Response(f'<?xml version="1.0" encoding="utf-8" ?><transcript>{"".join(lines)}</transcript>',
+                    media_type="text/xml")
+
+
+async def oembed(request: Request):
+    await _respond_after_latency("oembed")
+    video_id = request.query_params["url"].rsplit("v=", 1)[-1]
+    if video_id.startswith("gone"):
+        return Response("Not Found", status_code=404)
+    return JSONResponse({"title": f"Fake lecture {video_id}", "author_name": "Fake channel", "type": "video"})
+
+
+app = Starlette(routes=[
+    Route("/watch", watch),
+    Route("/youtubei/v1/player", player, methods=["POST"]),
+    Route("/api/timedtext", timedtext),
+    Route("/oembed", oembed),
+    Route("/stats", lambda request: JSONResponse(dict(served))),
+    Route("/health", lambda request: JSONResponse({"status": "ok"})),
+])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency-ms", type=float, default=SETTINGS["latency_ms"], help="per request")
+    parser.add_argument("--words", type=int, default=SETTINGS["words"], help="transcript length")
+    args = parser.parse_args()
+    SETTINGS.update(latency_ms=args.latency_ms, words=args.words)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
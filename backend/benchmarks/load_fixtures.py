@@ -0,0 +1,43 @@
+"""
+Inputs for benchmarks/load_test.py: lecture-note PDFs of a few sizes, YouTube URLs
+for the canned transcript provider (services/video_fake.py) and chat questions.
+"""
+import itertools
+
+from services.video_fake import SUBJECTS, OBJECTS, lecture_text
+
+PDF_SIZES = {"small": 5, "medium": 40, "large": 200}  # pages
+WORDS_PER_PAGE = 300
+
+QUESTIONS = [f"How does {subject} relate to {obj}?" for subject, obj in zip(SUBJECTS, itertools.cycle(OBJECTS))]
+
+_pdfs: dict[str, bytes] = {}
+_ids = itertools.count()
+
+
+def pdf_bytes(size: str) -> bytes:
+    """A text PDF with PDF_SIZES[size] pages of lecture notes, generated once per process (needs PyMuPDF)."""
+    if size not in _pdfs:
+        import pymupdf
+
+        doc = pymupdf.open()
+        for i in range(PDF_SIZES[size]):
+            page = doc.new_page()
+            page.insert_textbox(pymupdf.Rect(50, 50, 550, 800),
+                                f"Page {i + 1}. " + lecture_text(f"{size}-{i}", WORDS_PER_PAGE), fontsize=9)
+        _pdfs[size] = doc.tobytes()
+        doc.close()
+    return _pdfs[size]
+
+
+def unique_pdf(size: str) -> bytes:
+    """
+    The fixture PDF with a distinct trailing comment, so each upload has a new
+    content hash and is ingested rather than cloned (PDF readers ignore it).
+    """
+    return pdf_bytes(size) + f"\n% load-test {next(_ids)}\n".encode()
+
+
+def unique_video_url() -> str:
+    """A valid YouTube URL for a video id nobody has ingested yet."""
+    return f"https://www.youtube.com/watch?v=lt{next(_ids):09d}"
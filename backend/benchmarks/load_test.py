@@ -0,0 +1,437 @@
+"""
+Offline load test of the API. It starts the fake Groq server (benchmarks/fake_groq.py)
+and the API under uvicorn, with canned YouTube transcripts (VIDEO_PROVIDER=fake, or
+with --video-server the stand-in YouTube server benchmarks/fake_youtube.py)
+and a local Postgres + pgvector (DATABASE_URL). Then it drives each endpoint with
+concurrent clients. Per scenario it reports p50/p95/p99 latency (and time to first
+token for chat, or to the first item for streamed flashcards and quizzes), throughput, errors and the API process's peak RSS (Linux).
+
+Results can be saved as a JSON baseline and later runs compared against it;
+the exit status is 1 when a scenario regressed beyond --tolerance.
+
+Run from backend/ (sessions it creates are deleted afterwards):
+    python -m benchmarks.load_test --save benchmarks/baselines/local.json
+    python -m benchmarks.load_test --compare benchmarks/baselines/local.json
+    python -m benchmarks.load_test --scenarios chat,process_pdf_small --concurrency 16
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+from benchmarks import load_fixtures as fixtures
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+READY_TIMEOUT_SECS = 300  # first start may download the embedding model
+JOB_POLL_SECS = 0.1
+RSS_SAMPLE_SECS = 0.05
+
+# Compared against a baseline: (result key, True if higher is worse)
+COMPARED = (("p50_ms", True), ("p95_ms", True), ("rps", False), ("peak_rss_mb", True))
+
+
+def _check(response: httpx.Response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+    return response
+
+
+# --- Scenarios: one request each; raise on failure, optionally return extra timings in ms
+
+async def health(client: httpx.AsyncClient, ctx: dict):
+    _check(await client.get("/health"))
+
+
+async def list_sessions(client: httpx.AsyncClient, ctx: dict):
+    _check(await client.get("/api/sessions", params={"limit": 20}))
+
+
+async def chat_history(client: httpx.AsyncClient, ctx: dict):
+    _check(await client.get(f"/api/chat/history/{ctx['session_id']}"))
+
+
+async def get_quiz(client: httpx.AsyncClient, ctx: dict):
+    _check(await client.get(f"/api/quiz/{ctx['session_id']}"))
+
+
+async def quiz_evaluate(client: httpx.AsyncClient, ctx: dict):
+    answers = [{"question_id": qid, "selected_answer": i % 4} for i, qid in enumerate(ctx["question_ids"])]
+    _check(await client.post("/api/quiz/evaluate-batch", json={"session_id": ctx["session_id"], "answers": answers}))
+
+
+async def chat(client: httpx.AsyncClient, ctx: dict) -> dict:
+    question = fixtures.QUESTIONS[next(ctx["turns"]) % len(fixtures.QUESTIONS)]
+    started = time.perf_counter()
+    first_token = None
+    body = {"session_id": ctx["session_id"], "message": question, "regenerate": True}
+    async with client.stream("POST", "/api/chat", json=body) as response:
+        _check(response)
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[len("data: "):])
+            if event["type"] == "chunk" and first_token is None:
+                first_token = time.perf_counter()
+            elif event["type"] == "error":
+                raise RuntimeError(event["message"])
+    if first_token is None:
+        raise RuntimeError("No answer streamed")
+    return {"ttft_ms": (first_token - started) * 1000}
+
+
+async def flashcards(client: httpx.AsyncClient, ctx: dict):
+    _check(await client.post("/api/generate-flashcards",
+                             json={"session_id": ctx["session_id"], "count": 12, "regenerate": True}))
+
+
+async def quiz(client: httpx.AsyncClient, ctx: dict):
+    _check(await client.post("/api/generate-quiz", json={"session_id": ctx["session_id"], "regenerate": True}))
+
+
+async def flashcards_stream(client: httpx.AsyncClient, ctx: dict) -> dict:
+    body = {"session_id": ctx["session_id"], "count": 12, "regenerate": True}
+    return await _stream_items(client, "/api/generate-flashcards/stream", body, "flashcard")
+
+
+async def quiz_stream(client: httpx.AsyncClient, ctx: dict) -> dict:
+    body = {"session_id": ctx["session_id"], "regenerate": True}
+    return await _stream_items(client, "/api/generate-quiz/stream", body, "question")
+
+
+async def _stream_items(client: httpx.AsyncClient, path: str, body: dict, item_type: str) -> dict:
+    """Read a streamed generation to the end; reported as TTFT is the time to its first item."""
+    started = time.perf_counter()
+    first_item = None
+    async with client.stream("POST", path, json=body) as response:
+        _check(response)
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[len("data: "):])
+            if event["type"] == item_type and first_item is None:
+                first_item = time.perf_counter()
+            elif event["type"] == "error":
+                raise RuntimeError(event["message"])
+    if first_item is None:
+        raise RuntimeError("No items streamed")
+    return {"ttft_ms": (first_item - started) * 1000}
+
+
+async def process_video(client: httpx.AsyncClient, ctx: dict):
+    response = _check(await client.post("/api/process-video", json={"url": fixtures.unique_video_url()}))
+    ctx["sessions"].append(response.json()["session_id"])
+
+
+def process_pdf(size: str):
+    async def run(client: httpx.AsyncClient, ctx: dict):
+        files = {"file": (f"lecture-{size}.pdf", fixtures.unique_pdf(size), "application/pdf")}
+        response = _check(await client.post("/api/process-pdf", files=files))
+        ctx["sessions"].append(response.json()["session_id"])
+    return run
+
+
+async def job_pdf(client: httpx.AsyncClient, ctx: dict):
+    """Queue a medium PDF and poll until the background job finishes."""
+    files = {"file": ("lecture-medium.pdf", fixtures.unique_pdf("medium"), "application/pdf")}
+    job_id = _check(await client.post("/api/jobs/process-pdf", files=files)).json()["job_id"]
+    ctx["jobs"].append(job_id)
+    while True:
+        job = _check(await client.get(f"/api/jobs/{job_id}")).json()
+        if job["status"] == "done":
+            ctx["sessions"].append(job["result"]["session_id"])
+            return
+        if job["status"] == "failed":
+            raise RuntimeError(f"Job failed: {job['error']}")
+        await asyncio.sleep(JOB_POLL_SECS)
+
+
+# name -> (scenario, heavy: runs --heavy-requests instead of --requests)
+SCENARIOS = {
+    "health": (health, False),
+    "list_sessions": (list_sessions, False),
+    "chat_history": (chat_history, False),
+    "get_quiz": (get_quiz, False),
+    "quiz_evaluate": (quiz_evaluate, False),
+    "chat": (chat, False),
+    "flashcards": (flashcards, True),
+    "quiz": (quiz, True),
+    "flashcards_stream": (flashcards_stream, True),
+    "quiz_stream": (quiz_stream, True),
+    "process_video": (process_video, True),
+    **{f"process_pdf_{size}": (process_pdf(size), True) for size in fixtures.PDF_SIZES},
+    "job_pdf": (job_pdf, True),
+}
+
+
+# --- Measurement
+
+def percentile(sorted_values: list[float], q: float) -> float | None:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(math.ceil(q / 100 * len(sorted_values)) - 1, 0))]
+
+
+def rss_mb(pid: int) -> float | None:
+    """Resident memory of a process and its direct children (e.g. the PDF pool), from /proc. None off Linux."""
+    pids = [pid]
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                pids.extend(int(child) for child in f.read().split())
+    except OSError:
+        return None
+    total_kb = 0
+    for p in pids:
+        try:
+            with open(f"/proc/{p}/status") as f:
+                total_kb += next((int(line.split()[1]) for line in f if line.startswith("VmRSS:")), 0)
+        except OSError:
+            continue  # exited meanwhile
+    return total_kb / 1024
+
+
+async def _sample_rss(pid: int, samples: list[float]):
+    while True:
+        value = rss_mb(pid)
+        if value is not None:
+            samples.append(value)
+        await asyncio.sleep(RSS_SAMPLE_SECS)
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario, ctx: dict, requests: int, concurrency: int,
+                       pid: int) -> dict:
+    latencies, extras, errors = [], {}, []
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                extra = await scenario(client, ctx) or {}
+            except Exception as e:
+                errors.append(str(e))
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+            for key, value in extra.items():
+                extras.setdefault(key, []).append(value)
+
+    rss_samples = []
+    sampler = asyncio.create_task(_sample_rss(pid, rss_samples))
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, requests))))
+    elapsed = time.perf_counter() - started
+    sampler.cancel()
+
+    result = {"requests": requests, "concurrency": concurrency, "errors": len(errors),
+              "rps": round(len(latencies) / elapsed, 2), "seconds": round(elapsed, 2)}
+    for name, values in {"": latencies, **extras}.items():
+        prefix = name.removesuffix("_ms") + "_" if name else ""
+        values.sort()
+        for q in (50, 95, 99):
+            value = percentile(values, q)
+            result[f"{prefix}p{q}_ms"] = round(value, 1) if value is not None else None
+    result["peak_rss_mb"] = round(max(rss_samples), 1) if rss_samples else None
+    if errors:
+        result["first_error"] = errors[0]
+    return result
+
+
+# --- Servers
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start(module_args: list[str], env: dict, log) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", *module_args], cwd=BACKEND_DIR, env=env,
+                            stdout=log, stderr=subprocess.STDOUT)
+
+
+async def _wait_for(url: str, process: subprocess.Popen, timeout: float, log_path: str):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{url} exited with {process.returncode}; see {log_path}")
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout:.0f}s; see {log_path}")
+
+
+async def _setup(client: httpx.AsyncClient, ctx: dict):
+    """A session with a quiz for the read, chat and generation scenarios."""
+    files = {"file": ("lecture-medium.pdf", fixtures.unique_pdf("medium"), "application/pdf")}
+    ctx["session_id"] = _check(await client.post("/api/process-pdf", files=files)).json()["session_id"]
+    ctx["sessions"].append(ctx["session_id"])
+    _check(await client.post("/api/generate-quiz", json={"session_id": ctx["session_id"]}))
+    questions = _check(await client.get(f"/api/quiz/{ctx['session_id']}")).json()["questions"]
+    ctx["question_ids"] = [q["id"] for q in questions]
+
+
+def _cleanup(ctx: dict):
+    from utils.database import db_cursor
+
+    with db_cursor() as cur:
+        cur.execute("DELETE FROM sessions WHERE id = ANY(%s::uuid[])", (ctx["sessions"],))
+        cur.execute("DELETE FROM ingest_jobs WHERE id = ANY(%s::uuid[])", (ctx["jobs"],))
+
+
+async def run(args) -> dict:
+    names = list(SCENARIOS) if args.scenarios == "all" else args.scenarios.split(",")
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+
+    groq_port, youtube_port, api_port = _free_port(), _free_port(), _free_port()
+    log = tempfile.NamedTemporaryFile("w", prefix="load-test-", suffix=".log", delete=False)
+    env = {
+        **os.environ,
+        "LLM_PROVIDER": "groq",
+        "GROQ_API_KEY": "load-test",
+        "GROQ_BASE_URL": f"http://127.0.0.1:{groq_port}",
+    }
+    if args.video_server:
+        env.update(VIDEO_PROVIDER="youtube", YOUTUBE_BASE_URL=f"http://127.0.0.1:{youtube_port}")
+    else:
+        env.update(VIDEO_PROVIDER="fake", VIDEO_FAKE_LATENCY_MS=str(args.video_latency_ms))
+    servers = [
+        (_start(["benchmarks.fake_groq", "--port", str(groq_port), "--latency-ms", str(args.llm_latency_ms),
+                 "--tokens-per-sec", str(args.llm_tokens_per_sec)], env, log), groq_port),
+    ]
+    if args.video_server:
+        # The watch page, player and caption requests run one after another, oEmbed alongside
+        servers.append((_start(["benchmarks.fake_youtube", "--port", str(youtube_port),
+                                "--latency-ms", str(args.video_latency_ms / 3)], env, log), youtube_port))
+    api = _start(["uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(api_port), "--log-level", "warning"],
+                 env, log)
+    ctx = {"sessions": [], "jobs": [], "turns": itertools.count()}
+    results = {}
+    try:
+        for server, port in servers:
+            await _wait_for(f"http://127.0.0.1:{port}/health", server, 30, log.name)
+        await _wait_for(f"http://127.0.0.1:{api_port}/ready", api, READY_TIMEOUT_SECS, log.name)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{api_port}", limits=limits,
+                                     timeout=httpx.Timeout(300.0)) as client:
+            await _setup(client, ctx)
+            print(f"API pid {api.pid}, log {log.name}, idle RSS {rss_mb(api.pid) or 0:.0f} MB\n")
+            print(f"{'scenario':<20} {'reqs':>5} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+                  f" {'req/s':>8} {'TTFT p50':>9} {'peak RSS':>9}")
+            for name in names:
+                scenario, heavy = SCENARIOS[name]
+                requests = args.heavy_requests if heavy else args.requests
+                result = await run_scenario(client, scenario, ctx, requests, args.concurrency, api.pid)
+                results[name] = result
+                print(f"{name:<20} {requests:>5} {result['errors']:>6} {_ms(result['p50_ms']):>9}"
+                      f" {_ms(result['p95_ms']):>9} {_ms(result['p99_ms']):>9} {result['rps']:>8.2f}"
+                      f" {_ms(result.get('ttft_p50_ms')):>9} {_ms(result['peak_rss_mb'], ' MB'):>9}")
+                if result["errors"]:
+                    print(f"  first error: {result['first_error']}")
+    finally:
+        for process in (api, *(server for server, _ in servers)):
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        log.close()
+        if ctx["sessions"] or ctx["jobs"]:
+            _cleanup(ctx)
+    return results
+
+
+def _ms(value: float | None, unit: str = "") -> str:
+    return "-" if value is None else f"{value:.1f}{unit}"
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions against a saved baseline: latency or memory up, or throughput down, by more than `tolerance`."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline["results"].get(name)
+        if not base:
+            continue
+        if result["errors"] > base["errors"]:
+            regressions.append(f"{name}: errors {base['errors']} -> {result['errors']}")
+        for key, higher_is_worse in COMPARED:
+            old, new = base.get(key), result.get(key)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if change > tolerance if higher_is_worse else change < -tolerance:
+                regressions.append(f"{name}: {key} {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default="all", help=f"comma-separated, from: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=200, help="requests per light scenario")
+    parser.add_argument("--heavy-requests", type=int, default=16, help="requests per ingest / generation scenario")
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="fake Groq time to first token")
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=250, help="fake Groq streaming rate")
+    parser.add_argument("--video-latency-ms", type=float, default=200, help="canned transcript fetch time")
+    parser.add_argument("--video-server", action="store_true",
+                        help="fetch transcripts and titles over HTTP from benchmarks/fake_youtube.py")
+    parser.add_argument("--save", help="write the results to this JSON baseline")
+    parser.add_argument("--compare", help="compare against this JSON baseline; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative change before it's a regression")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "settings": {key: getattr(args, key) for key in ("concurrency", "requests", "heavy_requests",
+                                                         "llm_latency_ms", "llm_tokens_per_sec", "video_latency_ms",
+                                                         "video_server")},
+        "results": results,
+    }
+    if args.save:
+        Path(args.save).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.save).write_text(json.dumps(report, indent=2) + "\n")
+        print(f"\nSaved baseline to {args.save}")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if baseline.get("settings") != report["settings"]:
+            print(f"\n⚠️ Baseline was recorded with different settings: {baseline.get('settings')}")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) against {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\n✅ No regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Fixture corpus for bench_hybrid_retrieval: lecture-note chunks, each with queries
+whose answer is that chunk. "exact" queries hinge on a formula, name or acronym
+from the text; "paraphrase" queries share few words with it.
+"""
+
+# (chunk, [(kind, query), ...])
+DOCUMENTS = [
+    ("The Adam optimizer keeps exponential moving averages of the gradient and its square, "
+     "with defaults beta1 = 0.9 and beta2 = 0.999, and divides each step by the square root of the second moment.",
+     [("exact", "What are Adam's default beta1 and beta2?"),
+      ("paraphrase", "Which optimiser rescales updates using running averages of squared gradients?")]),
+    ("Shannon entropy H(X) = -sum p(x) log p(x) measures the average information content of a random variable, "
+     "and is maximised by the uniform distribution.",
+     [("exact", "Formula for H(X)"),
+      ("paraphrase", "How do we quantify the average surprise of an outcome?")]),
+    ("The Kullback-Leibler divergence D_KL(P || Q) is not symmetric and is zero only when P and Q are identical; "
+     "it appears in the ELBO used to train variational autoencoders.",
+     [("exact", "Is KL divergence symmetric?"),
+      ("paraphrase", "How far apart are two probability distributions, measured asymmetrically?")]),
+    ("HNSW builds a multi-layer proximity graph; the ef_construction parameter controls graph quality at build "
+     "time and ef_search trades recall for latency at query time.",
+     [("exact", "What does ef_search do in HNSW?"),
+      ("paraphrase", "How do graph-based nearest-neighbour indexes balance speed and accuracy?")]),
+    ("BM25 ranks documents by term frequency saturated with parameter k1 and length-normalised with parameter b, "
+     "typically k1 = 1.2 and b = 0.75.",
+     [("exact", "Typical BM25 k1 and b values"),
+      ("paraphrase", "How does a classic keyword ranking function stop repeated words from dominating?")]),
+    ("Dijkstra's algorithm finds single-source shortest paths in graphs with non-negative edge weights in "
+     "O((V + E) log V) time using a binary heap.",
+     [("exact", "Complexity of Dijkstra with a binary heap"),
+      ("paraphrase", "How do you compute the cheapest route from one node to every other node?")]),
+    ("The CAP theorem, stated by Eric Brewer, says a distributed data store cannot simultaneously guarantee "
+     "consistency, availability and partition tolerance.",
+     [("exact", "Who stated the CAP theorem?"),
+      ("paraphrase", "Why must a replicated database give something up when the network splits?")]),
+    ("Michaelis-Menten kinetics describe enzyme reaction rates as v = Vmax [S] / (Km + [S]), where Km is the "
+     "substrate concentration at half of the maximum rate.",
+     [("exact", "What is Km in Michaelis-Menten?"),
+      ("paraphrase", "How does reaction speed depend on how much substrate is available to an enzyme?")]),
+    ("The Krebs cycle, also called the TCA cycle, oxidises acetyl-CoA in the mitochondrial matrix, producing NADH, "
+     "FADH2 and GTP for each turn.",
+     [("exact", "What does the TCA cycle produce per turn?"),
+      ("paraphrase", "Where in the cell is acetyl-CoA broken down, and what carriers does it charge?")]),
+    ("PCR amplifies DNA through repeated cycles of denaturation at about 95 C, primer annealing, and extension by "
+     "Taq polymerase at 72 C.",
+     [("exact", "Why is Taq polymerase used in PCR?"),
+      ("paraphrase", "How can a tiny DNA sample be copied millions of times?")]),
+    ("The Treaty of Westphalia in 1648 ended the Thirty Years' War and is often cited as the origin of the modern "
+     "principle of state sovereignty.",
+     [("exact", "What did the 1648 Treaty of Westphalia end?"),
+      ("paraphrase", "Which peace settlement is credited with the idea that states govern themselves?")]),
+    ("Keynes argued in the General Theory that aggregate demand determines output in the short run, so government "
+     "spending can close a recessionary gap via the multiplier.",
+     [("exact", "Keynes multiplier argument"),
+      ("paraphrase", "Why might public spending lift an economy out of a slump?")]),
+    ("Ohm's law V = I R relates voltage, current and resistance; resistors in series add, while in parallel their "
+     "reciprocals add.",
+     [("exact", "V = I R"),
+      ("paraphrase", "How do you combine resistances placed side by side in a circuit?")]),
+    ("The Schrodinger equation i hbar d/dt psi = H psi governs how a quantum state evolves; stationary states are "
+     "eigenfunctions of the Hamiltonian H.",
+     [("exact", "What is the Hamiltonian's role in the Schrodinger equation?"),
+      ("paraphrase", "What law describes how a wavefunction changes over time?")]),
+    ("TCP uses a three-way handshake, SYN, SYN-ACK, ACK, to open a connection, and congestion control such as "
+     "AIMD to share bandwidth fairly.",
+     [("exact", "TCP SYN SYN-ACK ACK"),
+      ("paraphrase", "How do two hosts agree to start a reliable byte stream?")]),
+    ("Mitosis produces two genetically identical diploid cells, while meiosis produces four haploid gametes and "
+     "shuffles alleles through crossing over.",
+     [("exact", "How many haploid cells does meiosis produce?"),
+      ("paraphrase", "How does sexual reproduction create genetic variety in offspring?")]),
+    ("The Black-Scholes model prices a European call option from the spot price, strike, volatility sigma, "
+     "risk-free rate r and time to expiry.",
+     [("exact", "Black-Scholes inputs"),
+      ("paraphrase", "What do you need to know to value a contract giving the right to buy a stock later?")]),
+    ("LSTM cells add input, forget and output gates to a recurrent network so gradients can flow across long "
+     "sequences without vanishing.",
+     [("exact", "What gates does an LSTM have?"),
+      ("paraphrase", "How do recurrent models remember information over many time steps?")]),
+    ("Photosynthesis in the Calvin cycle fixes CO2 using the enzyme RuBisCO, consuming ATP and NADPH made by the "
+     "light-dependent reactions.",
+     [("exact", "What does RuBisCO do?"),
+      ("paraphrase", "How do plants turn carbon dioxide from the air into sugar?")]),
+    ("Amdahl's law bounds parallel speedup at 1 / ((1 - p) + p / n), so the serial fraction of a program limits "
+     "how much adding processors helps.",
+     [("exact", "Amdahl's law formula"),
+      ("paraphrase", "Why doesn't doubling the number of cores halve the running time?")]),
+]
+
+FILLER_TOPICS = [
+    "study habits", "the course schedule", "exam logistics", "reading assignments", "office hours",
+    "group projects", "lab safety", "citation style", "late submissions", "grading policy",
+]
+
+
+def corpus(filler: int) -> tuple[list[str], list[tuple[str, str, int]]]:
+    """(chunks, [(kind, query, index of the answering chunk)]) with `filler` distractor chunks mixed in."""
+    chunks = [text for text, _ in DOCUMENTS]
+    queries = [(kind, query, i) for i, (_, qs) in enumerate(DOCUMENTS) for kind, query in qs]
+    for i in range(filler):
+        topic = FILLER_TOPICS[i % len(FILLER_TOPICS)]
+        chunks.append(f"Note {i} on {topic}: remember to review the lecture slides, ask questions early and "
+                      f"keep a summary of each week's material about {topic}.")
+    return chunks, queries
@@ -1,22 +1,45 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import os
 from dotenv import load_dotenv
 
-from routers import video, pdf, flashcards, quiz, chat
-from utils.database import init_db
+load_dotenv()  # before the app modules, which read their settings at import
 
-load_dotenv()
+from routers import video, pdf, flashcards, quiz, chat, jobs
+from services.job_queue import start_workers, stop_workers
+from services.pdf_service import shutdown_pool as shutdown_pdf_pool
+from services.index_maintenance import run_index_maintenance
+from services import embedding_service, llm_gateway, conversation_memory, video_service
+from services.warmup import warm_up, readiness, is_ready
+from utils.database import init_db, close_pool
+from utils import session_vectors, semantic_cache, metrics
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    # Same size as asyncio's own default executor, but ours so /metrics can report its backlog
+    executor = ThreadPoolExecutor(thread_name_prefix="worker")
+    asyncio.get_running_loop().set_default_executor(executor)
+    metrics.track_executor("default", executor)
     await init_db()
+    # The embedding model loads in the background so /health answers immediately
+    warmup_task = asyncio.create_task(warm_up())
+    await start_workers()
+    index_task = asyncio.create_task(run_index_maintenance())
     yield
     # Shutdown
-    pass
+    index_task.cancel()
+    warmup_task.cancel()
+    await stop_workers()
+    shutdown_pdf_pool()
+    await llm_gateway.close()
+    await video_service.close()
+    close_pool()
 
 
 app = FastAPI(
@@ -34,6 +57,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so request timings include CORS handling
+app.add_middleware(metrics.MetricsMiddleware)
 
 # Routers
 app.include_router(video.router, prefix="/api", tags=["Video"])
@@ -41,6 +66,7 @@ app.include_router(pdf.router, prefix="/api", tags=["PDF"])
 app.include_router(flashcards.router, prefix="/api", tags=["Flashcards"])
 app.include_router(quiz.router, prefix="/api", tags=["Quiz"])
 app.include_router(chat.router, prefix="/api", tags=["Chat"])
+app.include_router(jobs.router, prefix="/api", tags=["Jobs"])
 
 
 @app.get("/")
@@ -50,4 +76,30 @@ async def root():
 
 @app.get("/health")
 async def health():
+    """Liveness: the process is up, even while the model is still loading."""
     return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness: the embedding model is loaded and the schema matches it."""
+    state = readiness()
+    return JSONResponse(state, status_code=200 if is_ready() else 503)
+
+
+@app.get("/stats")
+async def stats():
+    """In-process cache and batching statistics."""
+    return {
+        "query_embeddings": embedding_service.stats(),
+        "vector_cache": session_vectors.stats(),
+        "llm": llm_gateway.stats(),
+        "conversation_memory": conversation_memory.stats(),
+        "answer_cache": semantic_cache.stats(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint: per-stage latency, DB, embedding, LLM and queue metrics."""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
@@ -1,11 +1,18 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import asyncio
 import json
+import time
 
 from services.rag_service import chat_with_rag
-from utils.database import get_session, save_chat_message, get_chat_history
+from services import conversation_memory
+from services.warmup import require_ready
+from utils.database import (
+    session_exists, save_chat_message, save_user_message, get_chat_history, run_db,
+)
+from utils.pagination import encode_cursor, decode_cursor
+from utils.streaming import SSE_HEADERS, stream_metrics
+from utils.tokens import count_tokens
 
 router = APIRouter()
 
@@ -13,49 +20,68 @@ router = APIRouter()
 class ChatRequest(BaseModel):
     session_id: str
     message: str
+    lexical_weight: float | None = None  # 0–1 share of full-text search in retrieval; None = server default
+    regenerate: bool = False  # skip the answer cache and generate a fresh answer
 
 
-@router.post("/chat")
+def _stream_metrics(started: float, first_token_at: float | None, token_count: int) -> dict:
+    """Time-to-first-token and generation throughput (answer tokens, not SSE deltas) for one streamed answer."""
+    timing = stream_metrics(started, first_token_at)
+    if first_token_at is None:
+        return {"ttft_ms": None, "tokens": 0, "tokens_per_sec": 0.0, "total_ms": timing["total_ms"]}
+    gen_secs = (timing["total_ms"] - timing["first_item_ms"]) / 1000
+    return {
+        "ttft_ms": timing["first_item_ms"],
+        "tokens": token_count,
+        "tokens_per_sec": round(token_count / gen_secs, 1) if gen_secs > 0 else 0.0,
+        "total_ms": timing["total_ms"],
+    }
+
+
+@router.post("/chat", dependencies=[Depends(require_ready)])
 async def chat(request: ChatRequest):
     """
     RAG-powered chat with streaming SSE response.
     Retrieves relevant context from vector store, then streams Groq response.
     """
-    loop = asyncio.get_event_loop()
-
-    session = await loop.run_in_executor(None, get_session, request.session_id)
-    if not session:
+    if not await run_db(session_exists, request.session_id):
         raise HTTPException(status_code=404, detail="Session not found.")
 
     user_message = request.message.strip()
     if not user_message:
         raise HTTPException(status_code=400, detail="Message cannot be empty.")
 
-    # Save user message to history
-    await loop.run_in_executor(None, save_chat_message, request.session_id, "user", user_message)
+    # Save user message to history (and read the session's current answer cache setting)
+    answer_cache = await run_db(save_user_message, request.session_id, user_message)
 
     async def event_generator():
         full_response = []
+        started = time.perf_counter()
+        first_token_at = None
+        usage = {}
         try:
-            # Run the sync generator entirely in a thread to avoid blocking the event loop
-            def run_gen():
-                return list(chat_with_rag(request.session_id, user_message))
-
-            chunks = await loop.run_in_executor(None, run_gen)
-
-            for chunk in chunks:
+            # Forward each delta as soon as it arrives from the LLM
+            async for chunk in chat_with_rag(request.session_id, user_message, usage, request.lexical_weight,
+                                             answer_cache, request.regenerate):
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
                 full_response.append(chunk)
                 data = json.dumps({"type": "chunk", "content": chunk})
                 yield f"data: {data}\n\n"
 
-            # Save complete response to history
             complete_response = "".join(full_response)
-            await loop.run_in_executor(
-                None, save_chat_message, request.session_id, "assistant", complete_response
-            )
+            metrics = _stream_metrics(started, first_token_at, count_tokens(complete_response))
+            metrics["prompt_tokens"] = usage.get("prompt_tokens")
+            metrics["cached"] = usage.get("cached", False)
+            if metrics["ttft_ms"] is not None and metrics["prompt_tokens"] is not None:
+                conversation_memory.record_ttft(metrics["prompt_tokens"], metrics["ttft_ms"])
+
+            # Save complete response to history
+            await run_db(save_chat_message, request.session_id, "assistant", complete_response)
+            conversation_memory.schedule_summary(request.session_id)
 
             # Send done event
-            yield f"data: {json.dumps({'type': 'done'})}\n\n"
+            yield f"data: {json.dumps({'type': 'done', 'metrics': metrics})}\n\n"
 
         except Exception as e:
             error_data = json.dumps({"type": "error", "message": str(e)})
@@ -64,21 +90,28 @@ async def chat(request: ChatRequest):
     return StreamingResponse(
         event_generator(),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        }
+        headers=SSE_HEADERS,
     )
 
 
 @router.get("/chat/history/{session_id}")
-async def get_history(session_id: str, limit: int = 20):
-    """Retrieve chat history for a session."""
-    loop = asyncio.get_event_loop()
-    session = await loop.run_in_executor(None, get_session, session_id)
-    if not session:
+async def get_history(session_id: str, limit: int = 20, cursor: str | None = None):
+    """
+    Retrieve a session's most recent chat messages (oldest first). Pass
+    `next_cursor` back as `cursor` to page further back in the conversation.
+    """
+    if not await run_db(session_exists, session_id):
         raise HTTPException(status_code=404, detail="Session not found.")
 
-    history = await loop.run_in_executor(None, get_chat_history, session_id, limit)
-    return {"session_id": session_id, "messages": history}
+    limit = max(1, min(100, limit))
+    try:
+        before = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    history = await run_db(get_chat_history, session_id, limit, before)
+    return {
+        "session_id": session_id,
+        "messages": history,
+        "next_cursor": encode_cursor(history[0]) if len(history) == limit else None,
+    }
@@ -1,9 +1,15 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import asyncio
+import json
+import time
+from contextlib import aclosing
 
-from services.ai_service import generate_flashcards
-from utils.database import get_session, save_flashcards, get_flashcards
+from services.study_generation import generate_flashcards_for_session, stream_flashcards_for_session
+from services.llm_gateway import LLMError
+from services.warmup import require_ready
+from utils.database import get_session, get_session_text, session_exists, save_flashcards, get_flashcards, run_db
+from utils.streaming import SSE_HEADERS, stream_metrics
 
 router = APIRouter()
 
@@ -11,25 +17,25 @@ router = APIRouter()
 class FlashcardsRequest(BaseModel):
     session_id: str
     count: int = 12
+    regenerate: bool = False  # skip the generation cache
 
 
-@router.post("/generate-flashcards")
+@router.post("/generate-flashcards", dependencies=[Depends(require_ready)])
 async def create_flashcards(request: FlashcardsRequest):
     """Generate flashcards for a processed session."""
-    loop = asyncio.get_event_loop()
-
     # Get session
-    session = await loop.run_in_executor(None, get_session, request.session_id)
+    session = await run_db(get_session, request.session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found.")
 
     count = max(10, min(15, request.count))  # clamp to 10–15
+    raw_text = await run_db(get_session_text, request.session_id)
 
     # Generate flashcards
     try:
-        cards = await loop.run_in_executor(
-            None, generate_flashcards, session["raw_text"], count
-        )
+        cards, cached = await generate_flashcards_for_session(request.session_id, raw_text, count, request.regenerate)
+    except LLMError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers())
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate flashcards: {str(e)}")
 
@@ -37,23 +43,68 @@ async def create_flashcards(request: FlashcardsRequest):
         raise HTTPException(status_code=500, detail="AI returned no flashcards. Try again.")
 
     # Save to DB
-    await loop.run_in_executor(None, save_flashcards, request.session_id, cards)
+    await run_db(save_flashcards, request.session_id, cards)
 
     return {
         "session_id": request.session_id,
         "session_title": session["title"],
         "flashcards": cards,
         "count": len(cards),
+        "cached": cached,
     }
 
 
+@router.post("/generate-flashcards/stream", dependencies=[Depends(require_ready)])
+async def stream_flashcards(request: FlashcardsRequest):
+    """
+    Generate flashcards with an SSE response: each card is saved and sent as soon
+    as the model finishes writing it, instead of after the whole set.
+    """
+    if not await run_db(session_exists, request.session_id):
+        raise HTTPException(status_code=404, detail="Session not found.")
+
+    count = max(10, min(15, request.count))  # clamp to 10–15
+    raw_text = await run_db(get_session_text, request.session_id)
+
+    async def event_generator():
+        started = time.perf_counter()
+        first_card_at = None
+        info = {}
+        index = 0
+        try:
+            # aclosing: a client that goes away stops the generation too
+            cards = stream_flashcards_for_session(request.session_id, raw_text, count, request.regenerate, info)
+            async with aclosing(cards):
+                async for card in cards:
+                    if first_card_at is None:
+                        first_card_at = time.perf_counter()
+                    card_id, = await run_db(save_flashcards, request.session_id, [card])
+                    data = json.dumps({"type": "flashcard", "index": index,
+                                       "flashcard": {"id": card_id, "front": card["front"], "back": card["back"]}})
+                    yield f"data: {data}\n\n"
+                    index += 1
+
+            if not index:
+                raise RuntimeError("AI returned no flashcards. Try again.")
+            metrics = stream_metrics(started, first_card_at)
+            yield f"data: {json.dumps({'type': 'done', 'count': index, 'cached': info.get('cached', False), 'metrics': metrics})}\n\n"
+
+        except Exception as e:
+            error_data = json.dumps({"type": "error", "message": str(e)})
+            yield f"data: {error_data}\n\n"
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
 @router.get("/flashcards/{session_id}")
 async def get_session_flashcards(session_id: str):
     """Retrieve previously generated flashcards for a session."""
-    loop = asyncio.get_event_loop()
-    session = await loop.run_in_executor(None, get_session, session_id)
-    if not session:
+    if not await run_db(session_exists, session_id):
         raise HTTPException(status_code=404, detail="Session not found.")
 
-    cards = await loop.run_in_executor(None, get_flashcards, session_id)
+    cards = await run_db(get_flashcards, session_id)
     return {"session_id": session_id, "flashcards": cards, "count": len(cards)}
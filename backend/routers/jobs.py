@@ -0,0 +1,50 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+import json
+
+from services.job_queue import get_job_status, wait_for_update
+from utils.streaming import SSE_HEADERS
+
+router = APIRouter()
+
+EVENT_POLL_SECS = 1.0  # re-check persisted state at least this often (jobs running in another process)
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Current status and per-stage progress of an ingestion job."""
+    job = await get_job_status(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    SSE stream of ingestion progress. Emits a `progress` event whenever the stage or
+    progress changes and ends with a `done` or `failed` event carrying the result.
+    """
+    job = await get_job_status(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+
+    async def event_generator():
+        current = job
+        last_sent = None
+        while True:
+            snapshot = (current["status"], current["stage"], current["progress"])
+            if snapshot != last_sent:
+                last_sent = snapshot
+                if current["status"] in ("done", "failed"):
+                    yield f"data: {json.dumps({'type': current['status'], 'job': current})}\n\n"
+                    return
+                yield f"data: {json.dumps({'type': 'progress', 'job': current})}\n\n"
+            await wait_for_update(job_id, EVENT_POLL_SECS)
+            current = await get_job_status(job_id) or current
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
@@ -1,21 +1,21 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from pathlib import Path
 import asyncio
+import os
 
-from services.pdf_service import extract_pdf_text
-from utils.embeddings import process_text_to_chunks
-from utils.database import create_session, store_chunks_with_embeddings
+from services.ingest_service import ingest_pdf
+from services.pdf_service import spool_upload
+from services.job_queue import enqueue
+from services.warmup import require_ready
+from utils.database import create_ingest_job, run_db
 
 router = APIRouter()
 
 MAX_FILE_SIZE = 20 * 1024 * 1024  # 20 MB
 
 
-@router.post("/process-pdf")
-async def process_pdf(file: UploadFile = File(...)):
-    """
-    Accept a PDF file upload, extract text, chunk, embed, and store.
-    Returns session_id for subsequent flashcard/quiz/chat requests.
-    """
+async def _spool_pdf_upload(file: UploadFile) -> tuple[str, str]:
+    """Validate the upload and spool it to a temp file. Returns (path, sha256)."""
     # Validate file type
     if not file.filename or not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files are accepted.")
@@ -24,33 +24,43 @@ async def process_pdf(file: UploadFile = File(...)):
     if file.size and file.size > MAX_FILE_SIZE:
         raise HTTPException(status_code=413, detail=f"File too large. Maximum size is 20MB.")
 
-    # Extract text from PDF
     try:
-        text, title = await extract_pdf_text(file)
-    except ValueError as e:
-        raise HTTPException(status_code=422, detail=str(e))
+        return await spool_upload(file, MAX_FILE_SIZE)
+    except ValueError:
+        raise HTTPException(status_code=413, detail=f"File too large. Maximum size is 20MB.")
 
-    if len(text.split()) < 50:
-        raise HTTPException(status_code=422, detail="PDF contains too little text to process.")
 
-    loop = asyncio.get_event_loop()
+@router.post("/process-pdf", dependencies=[Depends(require_ready)])
+async def process_pdf(file: UploadFile = File(...)):
+    """
+    Accept a PDF file upload, extract text, chunk, embed, and store.
+    Returns session_id for subsequent flashcard/quiz/chat requests.
+    """
+    pdf_path, pdf_sha256 = await _spool_pdf_upload(file)
+
+    try:
+        result = await ingest_pdf(pdf_path, file.filename, pdf_sha256=pdf_sha256)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    finally:
+        os.unlink(pdf_path)
 
-    # Create session
-    session_id = await loop.run_in_executor(
-        None, create_session, title, "pdf", file.filename, text
-    )
+    return {**result, "message": "PDF processed successfully. Ready for flashcards, quiz, and chat."}
 
-    # Generate chunks + embeddings
-    chunks = await loop.run_in_executor(None, process_text_to_chunks, text)
 
-    # Store in DB
-    await loop.run_in_executor(None, store_chunks_with_embeddings, session_id, chunks)
+@router.post("/jobs/process-pdf", status_code=202)
+async def enqueue_pdf(file: UploadFile = File(...)):
+    """
+    Queue a PDF upload for background ingestion and return immediately.
+    Track it via GET /jobs/{job_id} or the SSE stream at /jobs/{job_id}/events.
+    """
+    pdf_path, _ = await _spool_pdf_upload(file)
+    try:
+        # The job row carries the PDF, so any worker can run (or resume) it; read it off the event loop
+        pdf_data = await asyncio.get_running_loop().run_in_executor(None, Path(pdf_path).read_bytes)
+    finally:
+        os.unlink(pdf_path)
 
-    return {
-        "session_id": session_id,
-        "title": title,
-        "filename": file.filename,
-        "word_count": len(text.split()),
-        "chunk_count": len(chunks),
-        "message": "PDF processed successfully. Ready for flashcards, quiz, and chat.",
-    }
+    job_id = await run_db(create_ingest_job, "pdf", file.filename, pdf_data)
+    enqueue(job_id)
+    return {"job_id": job_id, "status": "queued"}
@@ -1,9 +1,19 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import asyncio
-
-from services.ai_service import generate_quiz
-from utils.database import get_session, save_quiz_questions, get_quiz_questions
+import json
+import time
+from contextlib import aclosing
+
+from services.study_generation import generate_quiz_for_session, stream_quiz_for_session
+from services.llm_gateway import LLMError
+from services.warmup import require_ready
+from utils.database import (
+    get_session, get_session_text, session_exists, save_quiz_questions, get_quiz_questions,
+    get_quiz_answer, get_quiz_answer_key, run_db,
+)
+from utils import answer_keys
+from utils.streaming import SSE_HEADERS, stream_metrics
 
 router = APIRouter()
 
@@ -11,6 +21,7 @@ router = APIRouter()
 class QuizRequest(BaseModel):
     session_id: str
     count: int = 8
+    regenerate: bool = False  # skip the generation cache
 
 
 class AnswerSubmission(BaseModel):
@@ -19,21 +30,30 @@ class AnswerSubmission(BaseModel):
     selected_answer: int  # 0-indexed
 
 
-@router.post("/generate-quiz")
+class QuizAnswer(BaseModel):
+    question_id: str
+    selected_answer: int  # 0-indexed
+
+
+class QuizSubmission(BaseModel):
+    session_id: str
+    answers: list[QuizAnswer]
+
+
+@router.post("/generate-quiz", dependencies=[Depends(require_ready)])
 async def create_quiz(request: QuizRequest):
     """Generate quiz questions for a processed session."""
-    loop = asyncio.get_event_loop()
-
-    session = await loop.run_in_executor(None, get_session, request.session_id)
+    session = await run_db(get_session, request.session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found.")
 
     count = max(5, min(10, request.count))  # clamp to 5–10
+    raw_text = await run_db(get_session_text, request.session_id)
 
     try:
-        questions = await loop.run_in_executor(
-            None, generate_quiz, session["raw_text"], count
-        )
+        questions, cached = await generate_quiz_for_session(request.session_id, raw_text, count, request.regenerate)
+    except LLMError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers())
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate quiz: {str(e)}")
 
@@ -41,7 +61,7 @@ async def create_quiz(request: QuizRequest):
         raise HTTPException(status_code=500, detail="AI returned no questions. Try again.")
 
     # Save to DB
-    await loop.run_in_executor(None, save_quiz_questions, request.session_id, questions)
+    await run_db(save_quiz_questions, request.session_id, questions)
 
     # Return without correct_answer (for frontend quiz mode)
     questions_for_client = [
@@ -58,39 +78,110 @@ async def create_quiz(request: QuizRequest):
         "session_title": session["title"],
         "questions": questions_for_client,
         "count": len(questions),
+        "cached": cached,
     }
 
 
+@router.post("/generate-quiz/stream", dependencies=[Depends(require_ready)])
+async def stream_quiz(request: QuizRequest):
+    """
+    Generate quiz questions with an SSE response: each question is saved and sent
+    (without its answer) as soon as the model finishes writing it.
+    """
+    if not await run_db(session_exists, request.session_id):
+        raise HTTPException(status_code=404, detail="Session not found.")
+
+    count = max(5, min(10, request.count))  # clamp to 5–10
+    raw_text = await run_db(get_session_text, request.session_id)
+
+    async def event_generator():
+        started = time.perf_counter()
+        first_question_at = None
+        info = {}
+        index = 0
+        try:
+            # aclosing: a client that goes away stops the generation too
+            questions = stream_quiz_for_session(request.session_id, raw_text, count, request.regenerate, info)
+            async with aclosing(questions):
+                async for q in questions:
+                    if first_question_at is None:
+                        first_question_at = time.perf_counter()
+                    question_id, = await run_db(save_quiz_questions, request.session_id, [q])
+                    data = json.dumps({"type": "question", "index": index,
+                                       "question": {"id": question_id, "question": q["question"], "options": q["options"]}})
+                    yield f"data: {data}\n\n"
+                    index += 1
+
+            if not index:
+                raise RuntimeError("AI returned no questions. Try again.")
+            metrics = stream_metrics(started, first_question_at)
+            yield f"data: {json.dumps({'type': 'done', 'count': index, 'cached': info.get('cached', False), 'metrics': metrics})}\n\n"
+
+        except Exception as e:
+            error_data = json.dumps({"type": "error", "message": str(e)})
+            yield f"data: {error_data}\n\n"
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
 @router.post("/quiz/evaluate")
 async def evaluate_answer(submission: AnswerSubmission):
     """Evaluate a single quiz answer and return feedback."""
-    loop = asyncio.get_event_loop()
-
-    questions = await loop.run_in_executor(None, get_quiz_questions, submission.session_id)
-    question = next((q for q in questions if q["id"] == submission.question_id), None)
+    answer = answer_keys.lookup(submission.session_id, submission.question_id)
+    if answer is None:
+        answer = await run_db(get_quiz_answer, submission.session_id, submission.question_id)
 
-    if not question:
+    if not answer:
         raise HTTPException(status_code=404, detail="Question not found.")
 
-    is_correct = submission.selected_answer == question["correct_answer"]
+    return _feedback(answer, submission.selected_answer)
+
+
+@router.post("/quiz/evaluate-batch")
+async def evaluate_quiz(submission: QuizSubmission):
+    """Evaluate a whole submitted quiz and return per-question feedback plus the score."""
+    key = answer_keys.get(submission.session_id)
+    if key is None or any(a.question_id not in key for a in submission.answers):
+        key = await run_db(get_quiz_answer_key, submission.session_id)
+
+    missing = [a.question_id for a in submission.answers if a.question_id not in key]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Questions not found: {', '.join(missing)}")
 
+    results = [
+        {"question_id": a.question_id, **_feedback(key[a.question_id], a.selected_answer)}
+        for a in submission.answers
+    ]
+    correct = sum(r["is_correct"] for r in results)
+    return {
+        "session_id": submission.session_id,
+        "results": results,
+        "correct": correct,
+        "total": len(results),
+        "score": round(100 * correct / len(results)) if results else 0,
+    }
+
+
+def _feedback(answer: dict, selected_answer: int) -> dict:
     return {
-        "is_correct": is_correct,
-        "correct_answer": question["correct_answer"],
-        "explanation": question["explanation"],
-        "selected_answer": submission.selected_answer,
+        "is_correct": selected_answer == answer["correct_answer"],
+        "correct_answer": answer["correct_answer"],
+        "explanation": answer["explanation"],
+        "selected_answer": selected_answer,
     }
 
 
 @router.get("/quiz/{session_id}")
 async def get_session_quiz(session_id: str):
     """Retrieve previously generated quiz for a session (without answers)."""
-    loop = asyncio.get_event_loop()
-    session = await loop.run_in_executor(None, get_session, session_id)
-    if not session:
+    if not await run_db(session_exists, session_id):
         raise HTTPException(status_code=404, detail="Session not found.")
 
-    questions = await loop.run_in_executor(None, get_quiz_questions, session_id)
+    questions = await run_db(get_quiz_questions, session_id)
     questions_for_client = [
         {"id": q["id"], "question": q["question"], "options": q["options"]}
         for q in questions
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, HttpUrl
-import asyncio
 
-from services.video_service import extract_video_id, fetch_transcript, get_video_title
-from utils.embeddings import process_text_to_chunks
-from utils.database import create_session, store_chunks_with_embeddings, get_all_sessions
+from services.video_service import extract_video_id
+from services.ingest_service import ingest_video
+from services.job_queue import enqueue
+from services.warmup import require_ready
+from utils.database import get_sessions_page, create_ingest_job, set_session_answer_cache, run_db
+from utils import semantic_cache
+from utils.pagination import encode_cursor, decode_cursor
 
 router = APIRouter()
 
@@ -13,56 +16,70 @@ class VideoRequest(BaseModel):
     url: str
 
 
-@router.post("/process-video")
+class SessionSettings(BaseModel):
+    answer_cache: bool  # serve repeated chat questions from the semantic answer cache
+
+
+def _video_id_or_400(url: str) -> str:
+    video_id = extract_video_id(url)
+    if not video_id:
+        raise HTTPException(status_code=400, detail="Invalid YouTube URL. Could not extract video ID.")
+    return video_id
+
+
+@router.post("/process-video", dependencies=[Depends(require_ready)])
 async def process_video(request: VideoRequest):
     """
     Accept a YouTube URL, fetch transcript, chunk it, embed, and store.
     Returns session_id for subsequent flashcard/quiz/chat requests.
     """
     url = str(request.url)
+    video_id = _video_id_or_400(url)
 
-    # Extract video ID
-    video_id = extract_video_id(url)
-    if not video_id:
-        raise HTTPException(status_code=400, detail="Invalid YouTube URL. Could not extract video ID.")
-
-    # Fetch transcript (run in thread since it's sync)
     try:
-        loop = asyncio.get_event_loop()
-        transcript = await loop.run_in_executor(None, fetch_transcript, video_id)
+        result = await ingest_video(url, video_id)
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
 
-    if len(transcript.split()) < 50:
-        raise HTTPException(status_code=422, detail="Transcript too short to process meaningfully.")
+    return {**result, "message": "Video processed successfully. Ready for flashcards, quiz, and chat."}
 
-    # Get title
-    title = await loop.run_in_executor(None, get_video_title, video_id)
 
-    # Create session
-    session_id = await loop.run_in_executor(
-        None, create_session, title, "youtube", url, transcript
-    )
+@router.post("/jobs/process-video", status_code=202)
+async def enqueue_video(request: VideoRequest):
+    """
+    Queue a YouTube URL for background ingestion and return immediately.
+    Track it via GET /jobs/{job_id} or the SSE stream at /jobs/{job_id}/events.
+    """
+    url = str(request.url)
+    _video_id_or_400(url)
 
-    # Generate chunks + embeddings
-    chunks = await loop.run_in_executor(None, process_text_to_chunks, transcript)
+    job_id = await run_db(create_ingest_job, "youtube", url)
+    enqueue(job_id)
+    return {"job_id": job_id, "status": "queued"}
 
-    # Store in DB
-    await loop.run_in_executor(None, store_chunks_with_embeddings, session_id, chunks)
 
+@router.get("/sessions")
+async def list_sessions(limit: int = 50, cursor: str | None = None):
+    """List processed sessions, newest first. Pass `next_cursor` back as `cursor` for the next page."""
+    limit = max(1, min(200, limit))
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    sessions = await run_db(get_sessions_page, limit, after)
     return {
-        "session_id": session_id,
-        "title": title,
-        "video_id": video_id,
-        "word_count": len(transcript.split()),
-        "chunk_count": len(chunks),
-        "message": "Video processed successfully. Ready for flashcards, quiz, and chat.",
+        "sessions": sessions,
+        "next_cursor": encode_cursor(sessions[-1]) if len(sessions) == limit else None,
     }
 
 
-@router.get("/sessions")
-async def list_sessions():
-    """List all processed sessions."""
-    loop = asyncio.get_event_loop()
-    sessions = await loop.run_in_executor(None, get_all_sessions)
-    return {"sessions": sessions}
+@router.patch("/sessions/{session_id}")
+async def update_session(session_id: str, settings: SessionSettings):
+    """Change a session's settings. Opting out of the answer cache drops its cached answers."""
+    session = await run_db(set_session_answer_cache, session_id, settings.answer_cache)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found.")
+    if not settings.answer_cache:
+        semantic_cache.invalidate(session_id)
+    return session
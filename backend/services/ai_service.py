@@ -1,25 +1,58 @@
-import os
 import json
-from groq import Groq
-from dotenv import load_dotenv
+from contextlib import aclosing
+from typing import AsyncIterator
 
-load_dotenv()
+from services import llm_gateway
+from utils.json_stream import JsonItemStream
 
-
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
 MODEL = "llama-3.3-70b-versatile"  # updated model name
+SINGLE_CALL_WORDS = 6000  # content sent in one generation call, to stay within token limits
+PROMPT_VERSION = 1  # bump when the flashcard / quiz prompts change, so cached generations are not reused
 
 
-def generate_flashcards(text: str, count: int = 12) -> list[dict]:
+async def generate_flashcards(text: str, count: int = 12) -> list[dict]:
     """
-    Generate flashcards from content text.
+    Generate flashcards from content text (its first SINGLE_CALL_WORDS words).
     Returns list of {front, back} dicts.
     """
-    # Use first ~6000 words to stay within token limits
+    parsed = await _complete_json(_flashcards_prompt(text, count), route="flashcards")
+
+    # Validate structure
+    validated = [card for card in map(validate_flashcard, _cards_in(parsed)) if card]
+    return validated[:count]
+
+
+async def stream_flashcards(text: str, count: int = 12) -> AsyncIterator[dict]:
+    """Like generate_flashcards, but yields each validated card as soon as the model has written it."""
+    yielded = 0
+    async with aclosing(_stream_json_items(_flashcards_prompt(text, count), "flashcards", _cards_in)) as items:
+        async for item in items:
+            card = validate_flashcard(item)
+            if card:
+                yield card
+                yielded += 1
+                if yielded == count:
+                    return  # closing `items` ends the completion early
+
+
+def validate_flashcard(card) -> dict | None:
+    if isinstance(card, dict) and "front" in card and "back" in card:
+        return {"front": str(card["front"]), "back": str(card["back"])}
+    return None
+
+
+def _cards_in(parsed) -> list:
+    # Handle both {"flashcards": [...]} and [...] formats
+    if isinstance(parsed, list):
+        return parsed
+    return parsed.get("flashcards", parsed.get("cards", list(parsed.values())[0]))
+
+
+def _flashcards_prompt(text: str, count: int) -> str:
     words = text.split()
-    sample = " ".join(words[:6000])
+    sample = " ".join(words[:SINGLE_CALL_WORDS])
 
-    prompt = f"""You are an expert educator. Generate exactly {count} high-quality flashcards from the following content.
+    return f"""You are an expert educator. Generate exactly {count} high-quality flashcards from the following content.
 
 Rules:
 - Each flashcard should test a KEY concept, term, or fact from the content
@@ -37,42 +70,62 @@ Return ONLY a valid JSON array with this exact structure:
 Content:
 {sample}"""
 
-    response = client.chat.completions.create(
-        model=MODEL,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.3,
-        response_format={"type": "json_object"},
-        max_tokens=3000,
-    )
-
-    raw = response.choices[0].message.content
-    parsed = json.loads(raw)
 
-    # Handle both {"flashcards": [...]} and [...] formats
-    if isinstance(parsed, list):
-        cards = parsed
-    else:
-        cards = parsed.get("flashcards", parsed.get("cards", list(parsed.values())[0]))
-
-    # Validate structure
-    validated = []
-    for card in cards:
-        if isinstance(card, dict) and "front" in card and "back" in card:
-            validated.append({"front": str(card["front"]), "back": str(card["back"])})
-
-    return validated[:count]
-
-
-def generate_quiz(text: str, count: int = 8) -> list[dict]:
+async def generate_quiz(text: str, count: int = 8) -> list[dict]:
     """
     Generate multiple-choice quiz questions from content text.
     Returns list of {question, options, correct_answer, explanation} dicts.
     correct_answer is 0-indexed.
     """
+    parsed = await _complete_json(_quiz_prompt(text, count), route="quiz")
+
+    # Validate structure
+    validated = [q for q in map(validate_question, _questions_in(parsed)) if q]
+    return validated[:count]
+
+
+async def stream_quiz(text: str, count: int = 8) -> AsyncIterator[dict]:
+    """Like generate_quiz, but yields each validated question as soon as the model has written it."""
+    yielded = 0
+    async with aclosing(_stream_json_items(_quiz_prompt(text, count), "quiz", _questions_in)) as items:
+        async for item in items:
+            question = validate_question(item)
+            if question:
+                yield question
+                yielded += 1
+                if yielded == count:
+                    return  # closing `items` ends the completion early
+
+
+def validate_question(q) -> dict | None:
+    if (isinstance(q, dict)
+            and "question" in q
+            and "options" in q
+            and "correct_answer" in q
+            and isinstance(q["options"], list)
+            and len(q["options"]) == 4):
+        try:
+            correct_answer = int(q["correct_answer"])
+        except (TypeError, ValueError):
+            return None
+        return {
+            "question": str(q["question"]),
+            "options": [str(o) for o in q["options"]],
+            "correct_answer": correct_answer,
+            "explanation": str(q.get("explanation", "")),
+        }
+    return None
+
+
+def _questions_in(parsed) -> list:
+    return parsed.get("questions", []) if isinstance(parsed, dict) else parsed
+
+
+def _quiz_prompt(text: str, count: int) -> str:
     words = text.split()
-    sample = " ".join(words[:6000])
+    sample = " ".join(words[:SINGLE_CALL_WORDS])
 
-    prompt = f"""You are an expert quiz creator. Generate exactly {count} multiple-choice questions from the following content.
+    return f"""You are an expert quiz creator. Generate exactly {count} multiple-choice questions from the following content.
 
 Rules:
 - Each question should test understanding of an important concept
@@ -97,32 +150,43 @@ Return ONLY a valid JSON object with this structure:
 Content:
 {sample}"""
 
-    response = client.chat.completions.create(
+
+async def _complete_json(prompt: str, route: str):
+    content = await llm_gateway.complete(
+        [{"role": "user", "content": prompt}],
+        route=route,
         model=MODEL,
-        messages=[{"role": "user", "content": prompt}],
         temperature=0.3,
-        response_format={"type": "json_object"},
         max_tokens=3000,
+        json_mode=True,
     )
+    return json.loads(content)
 
-    raw = response.choices[0].message.content
-    parsed = json.loads(raw)
 
-    questions = parsed.get("questions", [])
-
-    # Validate structure
-    validated = []
-    for q in questions:
-        if (isinstance(q, dict)
-                and "question" in q
-                and "options" in q
-                and "correct_answer" in q
-                and len(q["options"]) == 4):
-            validated.append({
-                "question": str(q["question"]),
-                "options": [str(o) for o in q["options"]],
-                "correct_answer": int(q["correct_answer"]),
-                "explanation": str(q.get("explanation", "")),
-            })
-
-    return validated[:count]
+async def _stream_json_items(prompt: str, route: str, items_in) -> AsyncIterator:
+    """
+    Stream a completion and yield the objects in its item array as each one closes.
+    JSON mode isn't available for streamed completions, so the prompt alone asks
+    for JSON; if no item could be picked out as it streamed, the whole reply is
+    parsed at the end with `items_in` (as the non-streaming path does).
+    """
+    scanner = JsonItemStream()
+    found = False
+    async with aclosing(llm_gateway.stream(
+        [{"role": "user", "content": prompt}], route=route, model=MODEL, temperature=0.3, max_tokens=3000,
+    )) as deltas:
+        async for delta in deltas:
+            for item in scanner.feed(delta):
+                found = True
+                yield item
+    if not found:
+        for item in items_in(json.loads(_strip_fences(scanner.text))):
+            yield item
+
+
+def _strip_fences(text: str) -> str:
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0]
+    return text
@@ -0,0 +1,200 @@
+import os
+import asyncio
+import threading
+from collections import deque
+
+from services import llm_gateway
+from utils.database import (
+    get_conversation_memory, get_chat_summary, get_unsummarized_messages, save_chat_summary, run_db,
+)
+from utils.tokens import count_tokens, message_tokens, truncate_to_tokens
+from utils import metrics
+
+# Chat prompts are fitted to a token budget: the system prompt and question always
+# go in, recent turns take up to CHAT_HISTORY_SHARE of the rest, and retrieved
+# chunks fill what's left. Older turns are folded into a rolling per-session
+# summary in the background, so they're sent as a few hundred tokens instead of in full.
+CHAT_PROMPT_TOKEN_BUDGET = int(os.getenv("CHAT_PROMPT_TOKEN_BUDGET", "5000"))  # excludes the reply
+CHAT_HISTORY_SHARE = float(os.getenv("CHAT_HISTORY_SHARE", "0.35"))  # of the budget left after system prompt + question
+CHAT_HISTORY_MESSAGES = int(os.getenv("CHAT_HISTORY_MESSAGES", "20"))  # unsummarised messages considered per request
+CHAT_SUMMARY_TRIGGER_TOKENS = int(os.getenv("CHAT_SUMMARY_TRIGGER_TOKENS", "1200"))  # summarise once older turns exceed this
+CHAT_SUMMARY_KEEP_MESSAGES = int(os.getenv("CHAT_SUMMARY_KEEP_MESSAGES", "4"))  # latest messages always sent verbatim
+CHAT_SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "300"))
+CHAT_SUMMARY_MODEL = os.getenv("CHAT_SUMMARY_MODEL", "llama-3.1-8b-instant")
+
+CONTEXT_HEADER = "RELEVANT CONTENT FROM THE DOCUMENT:\n\n"
+MIN_CHUNK_TOKENS = 100  # a chunk cut shorter than this is dropped instead
+SUMMARY_BATCH_MESSAGES = 50  # messages folded into the summary per pass
+SUMMARY_MESSAGE_TOKENS = 600  # each message is cut to this in the summariser's input
+TTFT_BUCKETS = (1000, 2000, 4000, 8000)  # prompt-token buckets for time-to-first-token
+SAMPLES = 1000
+
+_summarizing: set[str] = set()
+_tasks: set[asyncio.Task] = set()
+_lock = threading.Lock()
+_prompt_tokens: deque[int] = deque(maxlen=SAMPLES)
+_unbudgeted_tokens: deque[int] = deque(maxlen=SAMPLES)
+_ttft = {bucket: [0, 0.0] for bucket in TTFT_BUCKETS + (None,)}  # bucket -> [count, total ms]
+_counters = {"requests": 0, "summaries": 0, "summary_failures": 0, "messages_dropped": 0, "chunks_dropped": 0}
+
+
+async def build_messages(session_id: str, system_prompt: str, context_parts: list[str],
+                         user_message: str) -> tuple[list[dict], dict]:
+    """
+    The chat prompt for `user_message` within CHAT_PROMPT_TOKEN_BUDGET, and a
+    breakdown of its token use. `context_parts` are retrieved chunks, best first.
+    """
+    memory = await run_db(get_conversation_memory, session_id, CHAT_HISTORY_MESSAGES)
+    history = memory["messages"]
+    # The route saves the question before answering; it goes last, not in the history
+    if history and history[-1]["role"] == "user" and history[-1]["content"] == user_message:
+        history = history[:-1]
+
+    system = {"role": "system", "content": system_prompt}
+    question = {"role": "user", "content": user_message}
+    available = max(CHAT_PROMPT_TOKEN_BUDGET - message_tokens([system, question]), 0)
+
+    # History: the summary, then as many recent turns as fit, newest first
+    history_budget = int(available * CHAT_HISTORY_SHARE)
+    summary_message = None
+    if memory["summary"]:
+        summary_text = truncate_to_tokens(memory["summary"]["summary"], history_budget)
+        summary_message = {"role": "system", "content": f"SUMMARY OF THE EARLIER CONVERSATION:\n\n{summary_text}"}
+        history_budget -= message_tokens([summary_message])
+    kept = []
+    for msg in reversed(history):
+        turn = {"role": msg["role"], "content": msg["content"]}
+        cost = message_tokens([turn])
+        if cost > history_budget:
+            break
+        kept.append(turn)
+        history_budget -= cost
+    kept.reverse()
+    history_tokens = message_tokens(kept) + (message_tokens([summary_message]) if summary_message else 0)
+
+    # Context: chunks in rank order until the rest of the budget is used
+    context_budget = available - history_tokens - message_tokens([{"content": CONTEXT_HEADER}])
+    chunks = []
+    for part in context_parts:
+        cost = count_tokens(part)
+        if cost > context_budget:
+            if context_budget >= MIN_CHUNK_TOKENS:
+                chunks.append(truncate_to_tokens(part, context_budget))
+            break
+        chunks.append(part)
+        context_budget -= cost
+
+    messages = [system]
+    if chunks:
+        messages.append({"role": "system", "content": CONTEXT_HEADER + "\n\n".join(chunks)})
+    if summary_message:
+        messages.append(summary_message)
+    messages.extend(kept)
+    messages.append(question)
+
+    usage = {
+        "prompt_tokens": message_tokens(messages),
+        "context_tokens": message_tokens(messages[1:2]) if chunks else 0,
+        "history_tokens": history_tokens,
+        "history_messages": len(kept),
+        "summarized": summary_message is not None,
+        # Everything available sent verbatim, as before budgeting
+        "unbudgeted_tokens": message_tokens([system, question, *history]) + sum(count_tokens(p) for p in context_parts),
+    }
+    with _lock:
+        _counters["requests"] += 1
+        _counters["messages_dropped"] += len(history) - len(kept)
+        _counters["chunks_dropped"] += len(context_parts) - len(chunks)
+        _prompt_tokens.append(usage["prompt_tokens"])
+        _unbudgeted_tokens.append(usage["unbudgeted_tokens"])
+    return messages, usage
+
+
+def record_ttft(prompt_tokens: int, ttft_ms: float):
+    """Time to first token, bucketed by prompt size."""
+    bucket = next((b for b in TTFT_BUCKETS if prompt_tokens <= b), None)
+    with _lock:
+        _ttft[bucket][0] += 1
+        _ttft[bucket][1] += ttft_ms
+
+
+def schedule_summary(session_id: str):
+    """Fold older turns into the session's summary in the background, if enough have built up."""
+    if session_id in _summarizing:
+        return
+    _summarizing.add(session_id)
+    task = asyncio.create_task(_summarize(session_id))
+    _tasks.add(task)
+    task.add_done_callback(lambda t: (_tasks.discard(t), _summarizing.discard(session_id)))
+
+
+async def _summarize(session_id: str):
+    with metrics.stage("chat", "summarize"):
+        await _update_summary(session_id)
+
+
+async def _update_summary(session_id: str):
+    try:
+        previous = await run_db(get_chat_summary, session_id)
+        messages = await run_db(get_unsummarized_messages, session_id,
+                                previous["covered"] if previous else None, SUMMARY_BATCH_MESSAGES)
+        # Keep the latest turns verbatim, unless the batch was cut short and more follow
+        if len(messages) < SUMMARY_BATCH_MESSAGES:
+            messages = messages[:-CHAT_SUMMARY_KEEP_MESSAGES] if CHAT_SUMMARY_KEEP_MESSAGES else messages
+        if not messages or sum(count_tokens(m["content"]) for m in messages) < CHAT_SUMMARY_TRIGGER_TOKENS:
+            return
+
+        transcript = "\n\n".join(
+            f"{m['role'].upper()}: {truncate_to_tokens(m['content'], SUMMARY_MESSAGE_TOKENS)}" for m in messages
+        )
+        prompt = f"""Update the running summary of a tutoring conversation about a document.
+Keep what the student asked, what was explained, conclusions reached and anything they found confusing.
+Write plain prose, at most {CHAT_SUMMARY_MAX_TOKENS * 3 // 4} words.
+
+CURRENT SUMMARY:
+{previous["summary"] if previous else "(none yet)"}
+
+NEW MESSAGES:
+{transcript}
+
+UPDATED SUMMARY:"""
+        summary = await llm_gateway.complete(
+            [{"role": "user", "content": prompt}], route="summary", model=CHAT_SUMMARY_MODEL,
+            temperature=0.2, max_tokens=CHAT_SUMMARY_MAX_TOKENS,
+        )
+        last = messages[-1]
+        await run_db(save_chat_summary, session_id, summary.strip(), (last["created_at"], last["id"]))
+        with _lock:
+            _counters["summaries"] += 1
+    except Exception as e:
+        with _lock:
+            _counters["summary_failures"] += 1
+        print(f"⚠️ Chat summary failed for session {session_id}: {e}")
+
+
+def stats() -> dict:
+    """Prompt-token percentiles vs. the unbudgeted prompt, and TTFT by prompt size."""
+    with _lock:
+        prompts = sorted(_prompt_tokens)
+        unbudgeted = sum(_unbudgeted_tokens)
+        return {
+            **_counters,
+            "summaries_in_flight": len(_summarizing),
+            "prompt_tokens": {
+                "p50": _percentile(prompts, 0.50),
+                "p95": _percentile(prompts, 0.95),
+                "mean": round(sum(prompts) / len(prompts)) if prompts else 0,
+            },
+            "unbudgeted_mean": round(unbudgeted / len(_unbudgeted_tokens)) if _unbudgeted_tokens else 0,
+            "saved_ratio": round(1 - sum(prompts) / unbudgeted, 3) if unbudgeted else 0.0,
+            "ttft_ms_by_prompt_tokens": {
+                (f"<={bucket}" if bucket else f">{TTFT_BUCKETS[-1]}"): round(total / count, 1) if count else None
+                for bucket, (count, total) in _ttft.items()
+            },
+        }
+
+
+def _percentile(sorted_values: list[int], q: float) -> int:
+    if not sorted_values:
+        return 0
+    return sorted_values[min(int(q * len(sorted_values)), len(sorted_values) - 1)]
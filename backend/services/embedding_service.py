@@ -0,0 +1,147 @@
+import os
+import time
+import queue
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+from utils import metrics
+from utils.embeddings import encode_batch, lowercases_input
+
+# Query embeddings: an LRU cache in front of a micro-batcher. Concurrent chat
+# requests wait a few ms on a shared queue and are encoded as one batch.
+EMBED_QUERY_CACHE_SIZE = int(os.getenv("EMBED_QUERY_CACHE_SIZE", "2048"))  # 0 disables the cache
+EMBED_BATCH_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", "5"))
+EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", "32"))
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+LATENCY_SAMPLES = 1000  # recent queue latencies kept for percentiles
+
+_cache: OrderedDict[str, list[float]] = OrderedDict()
+_pending: dict[str, Future] = {}  # in-flight queries, so identical concurrent queries share one encode
+_queue: queue.Queue = queue.Queue()
+_lock = threading.Lock()
+_worker: threading.Thread | None = None
+_case_insensitive: bool | None = None  # the model lowercases its input; set on first use
+
+_hits = 0
+_misses = 0
+_coalesced = 0
+_batch_sizes = {size: 0 for size in BATCH_SIZE_BUCKETS}
+_oversized_batches = 0
+_queue_latencies_ms: deque[float] = deque(maxlen=LATENCY_SAMPLES)
+
+metrics.track_queue("embed_query", _queue.qsize)
+
+
+def normalize_query(text: str) -> str:
+    """Cache key for a query: whitespace never changes its embedding, case only for cased models."""
+    global _case_insensitive
+    if _case_insensitive is None:
+        _case_insensitive = lowercases_input()
+    text = " ".join(text.split())
+    return text.lower() if _case_insensitive else text
+
+
+def embed_query(text: str) -> list[float]:
+    """
+    Embedding for a chat query. Blocking — call it from a worker thread.
+    Served from the LRU cache when possible, otherwise batched with other
+    queries arriving within EMBED_BATCH_WAIT_MS.
+    """
+    global _hits, _misses, _coalesced
+    key = normalize_query(text)
+    with _lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            _hits += 1
+            return cached
+        _misses += 1
+        future = _pending.get(key)
+        if future is None:
+            future = Future()
+            _pending[key] = future
+            _queue.put((key, text, time.perf_counter(), future))
+            _ensure_worker()
+        else:
+            _coalesced += 1
+    return future.result()
+
+
+def _ensure_worker():
+    global _worker
+    if _worker is None or not _worker.is_alive():
+        _worker = threading.Thread(target=_run, name="embed-batcher", daemon=True)
+        _worker.start()
+
+
+def _run():
+    while True:
+        batch = [_queue.get()]
+        deadline = time.perf_counter() + EMBED_BATCH_WAIT_MS / 1000
+        while len(batch) < EMBED_BATCH_MAX:
+            try:
+                batch.append(_queue.get(timeout=max(deadline - time.perf_counter(), 0)))
+            except queue.Empty:
+                break
+        _encode(batch)
+
+
+def _encode(batch: list[tuple[str, str, float, Future]]):
+    global _oversized_batches
+    started = time.perf_counter()
+    try:
+        matrix = encode_batch([text for _, text, _, _ in batch])  # the original text; the key is only for lookups
+    except Exception as e:
+        with _lock:
+            for key, _, _, _ in batch:
+                _pending.pop(key, None)
+        for _, _, _, future in batch:
+            future.set_exception(e)
+        return
+
+    embeddings = [row.tolist() for row in matrix]
+    with _lock:
+        bucket = next((size for size in BATCH_SIZE_BUCKETS if len(batch) <= size), None)
+        if bucket is None:
+            _oversized_batches += 1
+        else:
+            _batch_sizes[bucket] += 1
+        for (key, _, enqueued, _), embedding in zip(batch, embeddings):
+            _queue_latencies_ms.append((started - enqueued) * 1000)
+            _pending.pop(key, None)
+            if EMBED_QUERY_CACHE_SIZE > 0:
+                _cache[key] = embedding
+                if len(_cache) > EMBED_QUERY_CACHE_SIZE:
+                    _cache.popitem(last=False)
+    for (_, _, _, future), embedding in zip(batch, embeddings):
+        future.set_result(embedding)
+
+
+def stats() -> dict:
+    """Cache hit rate, batch-size histogram and queue latency percentiles."""
+    with _lock:
+        lookups = _hits + _misses
+        latencies = sorted(_queue_latencies_ms)
+        histogram = {f"<={size}": count for size, count in _batch_sizes.items()}
+        histogram[f">{BATCH_SIZE_BUCKETS[-1]}"] = _oversized_batches
+        return {
+            "cache_size": len(_cache),
+            "hits": _hits,
+            "misses": _misses,
+            "coalesced": _coalesced,
+            "hit_rate": round(_hits / lookups, 3) if lookups else 0.0,
+            "batch_sizes": histogram,
+            "queue_latency_ms": {
+                "p50": _percentile(latencies, 0.50),
+                "p95": _percentile(latencies, 0.95),
+                "max": round(latencies[-1], 2) if latencies else 0.0,
+            },
+        }
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return round(sorted_values[min(int(q * len(sorted_values)), len(sorted_values) - 1)], 2)
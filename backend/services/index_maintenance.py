@@ -0,0 +1,41 @@
+import asyncio
+
+from utils.embeddings import get_embeddings_batch
+from utils.database import ensure_vector_index, get_chunks_missing_embeddings, update_chunk_embeddings
+from utils.vector_index import VECTOR_INDEX_CHECK_SECS
+from services.warmup import wait_ready
+from utils import metrics
+
+REEMBED_BATCH_SIZE = 256
+
+
+def reembed_missing() -> int:
+    """Embed chunks whose vectors were cleared by a model change. Returns how many."""
+    total = 0
+    while rows := get_chunks_missing_embeddings(REEMBED_BATCH_SIZE):
+        embeddings = get_embeddings_batch([content for _, content in rows])
+        update_chunk_embeddings([(chunk_id, emb) for (chunk_id, _), emb in zip(rows, embeddings)])
+        total += len(rows)
+    return total
+
+
+async def run_index_maintenance():
+    """
+    Background task: fill in missing embeddings, then keep the ANN index in line
+    with the configured kind and the table size, re-checking periodically.
+    """
+    loop = asyncio.get_running_loop()
+    await wait_ready()
+    while True:
+        try:
+            with metrics.stage("index", "reembed"):
+                reembedded = await loop.run_in_executor(None, reembed_missing)
+            if reembedded:
+                print(f"Re-embedded {reembedded} chunks with the current model")
+            with metrics.stage("index", "ensure_index"):
+                action = await loop.run_in_executor(None, ensure_vector_index)
+            if action not in ("ok", "none", "busy"):
+                print(f"Vector index: {action}")
+        except Exception as e:
+            print(f"❌ Vector index maintenance failed: {e}")
+        await asyncio.sleep(VECTOR_INDEX_CHECK_SECS)
@@ -0,0 +1,211 @@
+import asyncio
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+
+from services.pdf_service import iter_pdf_pages, pdf_page_count, pdf_title, file_sha256, PDF_PAGES_PER_TASK
+from services.video_service import fetch_video
+from utils.embeddings import iter_embedded_batches
+from utils.chunking import iter_chunks, estimate_chunk_count
+from utils.ingest_cache import pdf_content_hash, video_content_hash
+from utils.database import (
+    create_pending_session, store_chunk_batch, finish_session, delete_session,
+    find_session_by_content_hash, clone_session, run_db,
+)
+from utils.streaming import iterate_in_thread
+from utils import metrics
+
+PIPELINE_DEPTH = 2  # embedded batches buffered ahead of the DB writer
+VALIDATE_WORDS = 50  # words extracted before the text is validated; nothing is embedded until then
+
+# Ingestion stages in order, with their share of overall progress
+STAGES = {"extract": 0.2, "chunk": 0.05, "embed": 0.6, "store": 0.15}
+
+
+def _no_progress(stage: str, fraction: float):
+    pass
+
+
+def overall_progress(stage: str, fraction: float) -> float:
+    """Map (stage, fraction within stage) to overall 0..1 progress."""
+    done = 0.0
+    for name, weight in STAGES.items():
+        if name == stage:
+            return round(done + weight * fraction, 3)
+        done += weight
+    return 1.0
+
+
+@contextmanager
+def _traced(source_type: str):
+    """A StageTimer for one ingest (see utils/metrics.py), observed when it ends."""
+    timer = metrics.StageTimer("ingest")
+    with metrics.span("ingest", source_type=source_type) as current:
+        try:
+            yield timer
+        finally:
+            timer.observe(current)
+
+
+async def ingest_video(url: str, video_id: str, progress=_no_progress) -> dict:
+    """
+    Fetch a YouTube transcript, chunk, embed and store it as a new session.
+    Raises ValueError for videos that can't be processed.
+    `progress(stage, fraction)` may be called from worker threads.
+    """
+    with _traced("youtube") as timer:
+        return await _ingest_video(url, video_id, progress, timer)
+
+
+async def _ingest_video(url: str, video_id: str, progress, timer: metrics.StageTimer) -> dict:
+    progress("extract", 0.0)
+    with timer("extract"):
+        transcript, title = await fetch_video(video_id)
+    if len(transcript.split()) < 50:
+        raise ValueError("Transcript too short to process meaningfully.")
+
+    # Same video + transcript already ingested? Reuse its chunks and embeddings
+    content_hash = video_content_hash(video_id, transcript)
+    with timer("dedupe"):
+        cached = await _clone_cached(content_hash, url, progress)
+    if cached:
+        return {**cached, "video_id": video_id}
+
+    result = await _chunk_embed_store(title, "youtube", url, [transcript], content_hash, progress, timer)
+    return {**result, "video_id": video_id}
+
+
+async def ingest_pdf(pdf_path: str, filename: str, progress=_no_progress, pdf_sha256: str | None = None) -> dict:
+    """
+    Extract text from a PDF on disk, chunk, embed and store it as a new session.
+    Raises ValueError for PDFs that can't be processed.
+    `progress(stage, fraction)` may be called from worker threads.
+    """
+    with _traced("pdf") as timer:
+        return await _ingest_pdf(pdf_path, filename, progress, pdf_sha256, timer)
+
+
+async def _ingest_pdf(pdf_path: str, filename: str, progress, pdf_sha256: str | None,
+                      timer: metrics.StageTimer) -> dict:
+    loop = asyncio.get_running_loop()
+
+    # Identical PDF already ingested? Reuse its chunks and embeddings
+    with timer("dedupe"):
+        if pdf_sha256 is None:
+            pdf_sha256 = await loop.run_in_executor(None, file_sha256, pdf_path)
+        content_hash = pdf_content_hash(pdf_sha256)
+        cached = await _clone_cached(content_hash, filename, progress)
+    if cached:
+        return {**cached, "filename": filename}
+
+    progress("extract", 0.0)
+    with timer("extract"):
+        title = await loop.run_in_executor(None, pdf_title, pdf_path) or filename
+        page_count = await loop.run_in_executor(None, pdf_page_count, pdf_path)
+
+    def pages() -> Iterator[str]:
+        for i, page_text in enumerate(iter_pdf_pages(pdf_path), 1):
+            if i % PDF_PAGES_PER_TASK == 0 or i == page_count:
+                progress("extract", i / page_count)
+            yield page_text
+
+    result = await _chunk_embed_store(
+        title, "pdf", filename, pages(), content_hash, progress, timer, validate=_validate_pdf_text
+    )
+    return {**result, "filename": filename}
+
+
+def _validate_pdf_text(text: str):
+    if not text.strip():
+        raise ValueError("No readable text found in PDF. The file may be scanned or image-based.")
+    if len(text.split()) < 50:
+        raise ValueError("PDF contains too little text to process.")
+
+
+async def _clone_cached(content_hash: str, source_url: str, progress) -> dict | None:
+    cached = await run_db(find_session_by_content_hash, content_hash)
+    if not cached:
+        return None
+    clone = await run_db(clone_session, cached["id"], source_url)
+    progress("store", 1.0)
+    return {
+        "session_id": clone["session_id"],
+        "title": cached["title"],
+        "word_count": clone["word_count"],
+        "chunk_count": clone["chunk_count"],
+        "cached": True,
+    }
+
+
+async def _chunk_embed_store(title: str, source_type: str, source_url: str, pieces: Iterable[str],
+                             content_hash: str, progress, timer: metrics.StageTimer, validate=None) -> dict:
+    """
+    Streaming extract -> chunk -> embed -> store. Text pieces are chunked lazily and
+    embedded in fixed-size batches on a default-executor thread, and each batch is
+    COPYed as it arrives, holding a DB connection only for that COPY. The session
+    stays hidden until its last batch is stored and is deleted if the ingest fails.
+    Memory stays bounded by a few batches. `validate(text)` sees the first
+    VALIDATE_WORDS words (or the whole text, if shorter) before anything is embedded.
+    `timer` gets each stage's own share of the time, though the stages overlap.
+    """
+    text_parts = []
+    extracted = {"words": 0, "done": False}
+
+    def collected() -> Iterator[str]:
+        held = None if validate is None else []  # pieces held back until the text is validated
+        for piece in timer.iterate(pieces, "extract"):
+            text_parts.append(piece)
+            extracted["words"] += len(piece.split())
+            if held is None:
+                yield piece
+                continue
+            held.append(piece)
+            if extracted["words"] >= VALIDATE_WORDS:
+                validate("\n\n".join(p for p in text_parts if p))
+                yield from held
+                held = None
+        extracted["done"] = True
+        progress("extract", 1.0)
+        progress("chunk", 1.0)
+        if held is not None:
+            validate("\n\n".join(p for p in text_parts if p))
+            yield from held
+
+    def batches():
+        embedded = 0
+        chunks_iter = timer.iterate(iter_chunks(collected()), "chunk")
+        for chunks, embeddings in timer.iterate(iter_embedded_batches(chunks_iter), "embed"):
+            embedded += len(chunks)
+            if extracted["done"]:
+                progress("embed", min(embedded / max(estimate_chunk_count(extracted["words"]), 1), 1.0))
+            yield chunks, embeddings
+        progress("embed", 1.0)
+
+    def store(session_id: str, chunks: list[dict], embeddings, start_index: int) -> int:
+        with timer("store"):
+            return store_chunk_batch(session_id, chunks, embeddings, start_index)
+
+    session_id = None
+    chunk_count = 0
+    try:
+        async for chunks, embeddings in iterate_in_thread(batches, PIPELINE_DEPTH):
+            if session_id is None:  # only once the text has been validated
+                session_id = await run_db(create_pending_session, title, source_type, source_url, content_hash)
+            chunk_count += await run_db(store, session_id, chunks, embeddings, chunk_count)
+        progress("store", 0.5)
+        if session_id is None:
+            session_id = await run_db(create_pending_session, title, source_type, source_url, content_hash)
+        with timer("store"):
+            await run_db(finish_session, session_id, "\n\n".join(p for p in text_parts if p))
+    except BaseException:
+        if session_id is not None:
+            await run_db(delete_session, session_id)
+        raise
+    progress("store", 1.0)
+
+    return {
+        "session_id": session_id,
+        "title": title,
+        "word_count": extracted["words"],
+        "chunk_count": chunk_count,
+        "cached": False,
+    }
@@ -0,0 +1,166 @@
+import asyncio
+import os
+import tempfile
+
+from services.ingest_service import ingest_video, ingest_pdf, overall_progress
+from services.video_service import extract_video_id
+from services.warmup import wait_ready
+from utils.database import (
+    claim_ingest_job, get_ingest_job, get_ingest_job_payload, update_ingest_job,
+    heartbeat_ingest_jobs, requeue_stale_ingest_jobs, run_db,
+)
+from utils import metrics
+
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "2"))
+# Running jobs are heartbeated; a job without a heartbeat for INGEST_JOB_STALE_SECS lost its
+# process and is requeued (by any process), so live jobs of other workers / instances are never taken
+INGEST_HEARTBEAT_SECS = float(os.getenv("INGEST_HEARTBEAT_SECS", "30"))
+INGEST_JOB_STALE_SECS = float(os.getenv("INGEST_JOB_STALE_SECS", "300"))
+
+_queue: asyncio.Queue | None = None
+_workers: list[asyncio.Task] = []
+_live: dict[str, dict] = {}  # progress of jobs running in this process
+_pending: set[str] = set()  # job IDs in _queue
+_updates: dict[str, asyncio.Event] = {}
+_watchers: dict[str, int] = {}  # wait_for_update() callers per job
+_background: set[asyncio.Task] = set()
+
+metrics.track_queue("ingest_jobs", lambda: _queue.qsize() if _queue is not None else 0)
+metrics.Gauge("ingest_jobs_running", "Ingestion jobs being processed by this worker", function=lambda: len(_live))
+
+
+async def start_workers(concurrency: int = INGEST_CONCURRENCY):
+    """Start the ingestion workers and enqueue queued jobs, and jobs whose process went away."""
+    global _queue
+    _queue = asyncio.Queue()
+    for job_id in await run_db(requeue_stale_ingest_jobs, INGEST_JOB_STALE_SECS):
+        enqueue(job_id)
+    _workers.extend(asyncio.create_task(_worker()) for _ in range(max(concurrency, 1)))
+    _workers.append(asyncio.create_task(_heartbeat()))
+    print(f"Ingestion workers started (concurrency={concurrency}, pending={_queue.qsize()})")
+
+
+async def stop_workers():
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+
+def enqueue(job_id: str):
+    if job_id not in _pending:
+        _pending.add(job_id)
+        _queue.put_nowait(job_id)
+
+
+async def get_job_status(job_id: str) -> dict | None:
+    """Live progress for jobs running here, otherwise the persisted row."""
+    if job_id in _live:
+        return dict(_live[job_id])
+    return await run_db(get_ingest_job, job_id)
+
+
+async def wait_for_update(job_id: str, timeout: float):
+    """Wait until the job reports progress or `timeout` seconds pass."""
+    event = _updates.setdefault(job_id, asyncio.Event())
+    _watchers[job_id] = _watchers.get(job_id, 0) + 1
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        _watchers[job_id] -= 1
+        if not _watchers[job_id]:
+            # Last watcher gone (e.g. the job runs in another process): forget its event
+            del _watchers[job_id]
+            _updates.pop(job_id, None)
+
+
+def _notify(job_id: str):
+    event = _updates.pop(job_id, None)
+    if event:
+        event.set()
+
+
+async def _worker():
+    await wait_ready()  # jobs need the embedding model and the chunks table
+    while True:
+        job_id = await _queue.get()
+        _pending.discard(job_id)
+        try:
+            await _run_job(job_id)
+        except Exception as e:
+            print(f"❌ Ingestion job {job_id} crashed: {e}")
+        finally:
+            _queue.task_done()
+
+
+async def _heartbeat():
+    """Keep this process's running jobs fresh, and pick up jobs whose process stopped doing so."""
+    while True:
+        await asyncio.sleep(INGEST_HEARTBEAT_SECS)
+        try:
+            if _live:
+                await run_db(heartbeat_ingest_jobs, list(_live))
+            for job_id in await run_db(requeue_stale_ingest_jobs, INGEST_JOB_STALE_SECS, INGEST_JOB_STALE_SECS):
+                enqueue(job_id)
+        except Exception as e:
+            print(f"⚠️ Ingestion job heartbeat failed: {e}")
+
+
+async def _run_job(job_id: str):
+    job = await run_db(claim_ingest_job, job_id)
+    if not job:
+        return  # already picked up elsewhere
+
+    loop = asyncio.get_running_loop()
+    _live[job_id] = await run_db(get_ingest_job, job_id)
+
+    def on_progress(stage: str, fraction: float):
+        # Called from the event loop and from executor threads
+        loop.call_soon_threadsafe(_record_progress, job_id, stage, fraction)
+
+    try:
+        if job["source_type"] == "youtube":
+            video_id = extract_video_id(job["source_url"])
+            if not video_id:
+                raise ValueError("Invalid YouTube URL. Could not extract video ID.")
+            result = await ingest_video(job["source_url"], video_id, on_progress)
+        else:
+            pdf_data = await run_db(get_ingest_job_payload, job_id)
+            if pdf_data is None:
+                raise ValueError("Uploaded PDF is no longer available.")
+            fd, pdf_path = tempfile.mkstemp(suffix=".pdf")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    await loop.run_in_executor(None, f.write, pdf_data)
+                del pdf_data
+                result = await ingest_pdf(pdf_path, job["source_url"], on_progress)
+            finally:
+                os.unlink(pdf_path)
+    except Exception as e:
+        await _finish(job_id, status="failed", error=str(e))
+    else:
+        await _finish(job_id, status="done", result=result)
+
+
+def _record_progress(job_id: str, stage: str, fraction: float):
+    live = _live.get(job_id)
+    if live is None:
+        return
+    stage_changed = live["stage"] != stage
+    live.update(status="running", stage=stage, progress=overall_progress(stage, fraction))
+    if stage_changed:
+        # Persist stage transitions; finer-grained progress stays in memory
+        task = asyncio.create_task(run_db(update_ingest_job, job_id, "running", stage, live["progress"]))
+        _background.add(task)
+        task.add_done_callback(_background.discard)
+    _notify(job_id)
+
+
+async def _finish(job_id: str, status: str, result: dict | None = None, error: str | None = None):
+    progress = 1.0 if status == "done" else None
+    metrics.INGEST_JOBS.inc(status=status)
+    await run_db(update_ingest_job, job_id, status, None, progress, result, error)
+    _live.pop(job_id, None)
+    _notify(job_id)
@@ -0,0 +1,97 @@
+import os
+import re
+import json
+import random
+import asyncio
+from typing import AsyncIterator, Mapping
+
+from services.llm_gateway import ProviderError
+from utils.tokens import message_tokens
+
+# Local stand-in for the LLM provider (LLM_PROVIDER=fake), for load tests without
+# API keys or quota. Latency, throughput and 429s are configurable.
+LLM_FAKE_LATENCY_MS = float(os.getenv("LLM_FAKE_LATENCY_MS", "300"))  # until the first token
+LLM_FAKE_TOKENS_PER_SEC = float(os.getenv("LLM_FAKE_TOKENS_PER_SEC", "250"))
+LLM_FAKE_PREFILL_TOKENS_PER_SEC = float(os.getenv("LLM_FAKE_PREFILL_TOKENS_PER_SEC", "0"))  # prompt processing; 0 = free
+LLM_FAKE_429_RATE = float(os.getenv("LLM_FAKE_429_RATE", "0"))  # fraction of calls answered with 429
+
+WORDS = ("retrieval", "embedding", "context", "chunk", "index", "gradient", "entropy", "protocol",
+         "latency", "throughput", "cache", "schema", "vector", "token", "model", "summary")
+
+HEADERS = {
+    "x-ratelimit-limit-requests": "14400",
+    "x-ratelimit-remaining-requests": "14399",
+    "x-ratelimit-reset-requests": "6s",
+    "x-ratelimit-limit-tokens": "1000000",
+    "x-ratelimit-remaining-tokens": "999000",
+    "x-ratelimit-reset-tokens": "60ms",
+}
+
+
+class FakeProvider:
+    async def complete(self, messages: list[dict], response_format: dict | None = None,
+                       max_tokens: int = 3000, **params) -> tuple[str, Mapping]:
+        self._maybe_rate_limit()
+        prompt = messages[-1]["content"]
+        content = fake_json(prompt) if response_format else fake_text(max_tokens)
+        await asyncio.sleep(_first_token_secs(messages) + len(content.split()) / LLM_FAKE_TOKENS_PER_SEC)
+        return content, HEADERS
+
+    async def stream(self, messages: list[dict], max_tokens: int = 1500, **params) -> tuple[AsyncIterator[str], Mapping]:
+        self._maybe_rate_limit()
+        await asyncio.sleep(_first_token_secs(messages))
+
+        prompt = messages[-1]["content"]
+        content = fake_json(prompt) if asks_for_json(prompt) else fake_text(max_tokens)
+
+        async def deltas():
+            for word in content.split(" "):
+                await asyncio.sleep(1 / LLM_FAKE_TOKENS_PER_SEC)
+                yield word + " "
+
+        return deltas(), HEADERS
+
+    async def close(self):
+        pass
+
+    def _maybe_rate_limit(self):
+        if LLM_FAKE_429_RATE and random.random() < LLM_FAKE_429_RATE:
+            raise ProviderError("Rate limit reached (fake)", status=429, retry_after=1.0, headers=HEADERS)
+
+
+def _first_token_secs(messages: list[dict]) -> float:
+    prefill = message_tokens(messages) / LLM_FAKE_PREFILL_TOKENS_PER_SEC if LLM_FAKE_PREFILL_TOKENS_PER_SEC else 0.0
+    return LLM_FAKE_LATENCY_MS / 1000 + prefill
+
+
+def fake_text(max_tokens: int) -> str:
+    return " ".join(random.choice(WORDS) for _ in range(min(max_tokens, random.randint(80, 200))))
+
+
+def asks_for_json(prompt: str) -> bool:
+    """Whether the prompt is a flashcard / quiz request, which is answered with JSON even when streamed."""
+    return "valid JSON" in prompt
+
+
+def fake_json(prompt: str) -> str:
+    """A well-formed flashcard or quiz payload for the requested count."""
+    match = re.search(r"exactly (\d+)", prompt)
+    count = int(match.group(1)) if match else 5
+    if "multiple-choice" in prompt:
+        return json.dumps({"questions": [
+            {
+                "question": f"Which statement about {_topic()} is correct?",
+                "options": [f"Option {letter}: {_topic()}" for letter in "ABCD"],
+                "correct_answer": random.randrange(4),
+                "explanation": f"Because of {_topic()}.",
+            }
+            for _ in range(count)
+        ]})
+    return json.dumps({"flashcards": [
+        {"front": f"What is {_topic()}?", "back": f"It relates {_topic()} to {_topic()}."}
+        for _ in range(count)
+    ]})
+
+
+def _topic() -> str:
+    return " ".join(random.sample(WORDS, 3))
@@ -0,0 +1,453 @@
+import os
+import re
+import heapq
+import random
+import asyncio
+import itertools
+from typing import AsyncIterator, Mapping
+
+from utils import metrics
+from utils.tokens import count_tokens, message_tokens
+
+# Shared gateway for every LLM call: one async client with keep-alive, global and
+# per-route concurrency limits, a limiter fed by the provider's rate-limit headers,
+# jittered retries and per-call deadlines. Chat outranks bulk generation.
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "groq")  # "fake" = local stand-in for load tests (services/llm_fake.py)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_ROUTE_CONCURRENCY = os.getenv("LLM_ROUTE_CONCURRENCY", "chat=6,flashcards=3,quiz=3,summary=2")
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_SECS = float(os.getenv("LLM_RETRY_BASE_SECS", "0.5"))
+LLM_RETRY_MAX_SECS = float(os.getenv("LLM_RETRY_MAX_SECS", "8"))
+LLM_TIMEOUT_SECS = float(os.getenv("LLM_TIMEOUT_SECS", "30"))  # per attempt, between bytes
+LLM_CHAT_DEADLINE_SECS = float(os.getenv("LLM_CHAT_DEADLINE_SECS", "60"))
+LLM_GENERATE_DEADLINE_SECS = float(os.getenv("LLM_GENERATE_DEADLINE_SECS", "120"))
+LLM_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_KEEPALIVE_CONNECTIONS", "20"))
+
+# route -> (priority, lower runs first; deadline for the whole call including retries)
+ROUTES = {
+    "chat": (0, LLM_CHAT_DEADLINE_SECS),
+    "flashcards": (1, LLM_GENERATE_DEADLINE_SECS),
+    "quiz": (1, LLM_GENERATE_DEADLINE_SECS),
+    "summary": (2, LLM_GENERATE_DEADLINE_SECS),
+}
+
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+class LLMError(Exception):
+    """An LLM call that failed for good; status_code is what the API should answer with."""
+
+    def __init__(self, message: str, status_code: int = 502, retry_after: float | None = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    def headers(self) -> dict | None:
+        if self.retry_after is None:
+            return None
+        return {"Retry-After": str(max(1, round(self.retry_after)))}
+
+
+class ProviderError(Exception):
+    """Raised by providers. status is None for connection errors and timeouts."""
+
+    def __init__(self, message: str, status: int | None = None, retry_after: float | None = None,
+                 headers: Mapping | None = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        self.headers = headers or {}
+
+    @property
+    def retryable(self) -> bool:
+        return self.status is None or self.status in RETRYABLE_STATUS or self.status >= 500
+
+
+class PrioritySemaphore:
+    """Semaphore that hands free slots to the lowest priority value first (FIFO within a priority)."""
+
+    def __init__(self, value: int):
+        self._value = value
+        self._waiters: list = []
+        self._order = itertools.count()
+
+    async def acquire(self, priority: int):
+        if self._value > 0 and not self._waiters:
+            self._value -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # the slot was handed to us just as we were cancelled
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._value += 1
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for _, _, f in self._waiters if not f.done())
+
+
+class TokenBucket:
+    """
+    Client-side view of one provider quota (requests or tokens). Unlimited until
+    the first response reports the limit; every response resyncs it.
+    """
+
+    def __init__(self):
+        self.capacity: float | None = None
+        self.available = 0.0
+        self.refill_per_sec = 0.0
+        self._updated = 0.0
+
+    def sync(self, limit: float, remaining: float, reset_secs: float, now: float):
+        self.capacity = limit
+        self.available = remaining
+        # The quota refills from `remaining` to `limit` over `reset_secs`
+        self.refill_per_sec = (limit - remaining) / reset_secs if reset_secs > 0 else limit
+        self._updated = now
+
+    def take(self, amount: float, now: float) -> float:
+        """Take `amount` if available and return 0, else return seconds to wait."""
+        if self.capacity is None:
+            return 0.0
+        self.available = min(self.capacity, self.available + (now - self._updated) * self.refill_per_sec)
+        self._updated = now
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            self.available -= amount
+            return 0.0
+        if self.refill_per_sec <= 0:
+            return 1.0
+        return (amount - self.available) / self.refill_per_sec
+
+
+_provider = None
+_global_slots: PrioritySemaphore | None = None
+_route_slots: dict[str, asyncio.Semaphore] = {}
+_in_flight: dict[str, int] = {}
+_buckets = {"requests": TokenBucket(), "tokens": TokenBucket()}
+_paused_until = 0.0  # set by a 429's retry-after; every call waits it out
+_stats = {"calls": 0, "retries": 0, "rate_limited": 0, "failures": 0}
+
+metrics.Gauge("llm_requests_waiting", "LLM calls queued for a global slot",
+              function=lambda: _global_slots.waiting if _global_slots else 0)
+metrics.Gauge("llm_requests_in_flight", "LLM calls holding a slot", ("route",),
+              function=lambda: {(route,): count for route, count in _in_flight.items()})
+
+
+def _route_limits() -> dict[str, int]:
+    limits = {}
+    for part in LLM_ROUTE_CONCURRENCY.split(","):
+        name, _, value = part.partition("=")
+        if value.strip():
+            limits[name.strip()] = int(value)
+    return limits
+
+
+def get_provider():
+    global _provider
+    if _provider is None:
+        if LLM_PROVIDER == "fake":
+            from services.llm_fake import FakeProvider
+            _provider = FakeProvider()
+        else:
+            _provider = GroqProvider()
+    return _provider
+
+
+async def close():
+    global _provider
+    if _provider is not None:
+        await _provider.close()
+        _provider = None
+
+
+async def complete(messages: list[dict], *, route: str, model: str, temperature: float = 0.3,
+                   max_tokens: int = 3000, json_mode: bool = False) -> str:
+    """One non-streaming completion. Raises LLMError once retries or the deadline run out."""
+    params = {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens}
+    if json_mode:
+        params["response_format"] = {"type": "json_object"}
+    deadline = _deadline(route)
+    started = asyncio.get_running_loop().time()
+    outcome = "error"
+    with metrics.span(f"llm.{route}", model=model, stream=False):
+        try:
+            async with _Slot(route):
+                content, _ = await _call_with_retries(get_provider().complete, params, route, deadline)
+            outcome = "ok"
+            metrics.LLM_TOKENS.inc(message_tokens(messages), route=route, kind="prompt")
+            metrics.LLM_TOKENS.inc(count_tokens(content or ""), route=route, kind="completion")
+            return content
+        finally:
+            metrics.LLM_CALL_SECONDS.observe(asyncio.get_running_loop().time() - started, route=route, outcome=outcome)
+
+
+async def stream(messages: list[dict], *, route: str, model: str, temperature: float = 0.7,
+                 max_tokens: int = 1500) -> AsyncIterator[str]:
+    """
+    Stream a completion's text deltas. Opening the stream is retried; once text
+    has been yielded a failure is final. Closing the generator early (client went
+    away) closes the upstream HTTP stream and frees the slot.
+    """
+    params = {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens}
+    deadline = _deadline(route)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    # Not a current span: this generator yields to the caller while it's open
+    span = metrics.start_span(f"llm.{route}", model=model, stream=True)
+    outcome, completion_tokens = "error", 0
+    try:
+        async with _Slot(route):
+            deltas, _ = await _call_with_retries(get_provider().stream, params, route, deadline)
+            metrics.LLM_TOKENS.inc(message_tokens(messages), route=route, kind="prompt")
+            try:
+                while True:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        raise LLMError("The model took too long to answer.", status_code=504)
+                    try:
+                        delta = await asyncio.wait_for(deltas.__anext__(), remaining)
+                    except StopAsyncIteration:
+                        outcome = "ok"
+                        return
+                    except asyncio.TimeoutError:
+                        raise LLMError("The model took too long to answer.", status_code=504)
+                    except ProviderError as e:
+                        _stats["failures"] += 1
+                        raise LLMError(f"The model stream failed: {e}")
+                    if not completion_tokens:
+                        metrics.LLM_TTFT_SECONDS.observe(loop.time() - started, route=route)
+                    completion_tokens += 1  # providers stream about one token per delta
+                    yield delta
+            finally:
+                await deltas.aclose()
+    except (GeneratorExit, asyncio.CancelledError):
+        outcome = "cancelled"
+        raise
+    finally:
+        metrics.LLM_TOKENS.inc(completion_tokens, route=route, kind="completion")
+        metrics.LLM_CALL_SECONDS.observe(loop.time() - started, route=route, outcome=outcome)
+        metrics.end_span(span, outcome=outcome, completion_tokens=completion_tokens)
+
+
+def _deadline(route: str) -> float:
+    _, deadline_secs = ROUTES.get(route, (1, LLM_GENERATE_DEADLINE_SECS))
+    return asyncio.get_running_loop().time() + deadline_secs
+
+
+class _Slot:
+    """Per-route slot, then a global slot handed out by route priority."""
+
+    def __init__(self, route: str):
+        self.route = route
+        self.priority = ROUTES.get(route, (1, 0))[0]
+
+    async def __aenter__(self):
+        global _global_slots
+        if _global_slots is None:
+            _global_slots = PrioritySemaphore(max(LLM_MAX_CONCURRENCY, 1))
+        if self.route not in _route_slots:
+            _route_slots[self.route] = asyncio.Semaphore(_route_limits().get(self.route, LLM_MAX_CONCURRENCY))
+        await _route_slots[self.route].acquire()
+        try:
+            await _global_slots.acquire(self.priority)
+        except BaseException:
+            _route_slots[self.route].release()
+            raise
+        _in_flight[self.route] = _in_flight.get(self.route, 0) + 1
+
+    async def __aexit__(self, *exc):
+        _in_flight[self.route] -= 1
+        _global_slots.release()
+        _route_slots[self.route].release()
+
+
+async def _call_with_retries(call, params: dict, route: str, deadline: float):
+    loop = asyncio.get_running_loop()
+    estimated_tokens = sum(len(m["content"]) for m in params["messages"]) / 4  # ~4 chars per token
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        await _wait_for_quota(estimated_tokens, deadline)
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            raise LLMError("The model took too long to answer.", status_code=504)
+        _stats["calls"] += 1
+        try:
+            result, headers = await asyncio.wait_for(call(**params), remaining)
+            _sync_quota(headers)
+            return result, headers
+        except asyncio.TimeoutError:
+            _stats["failures"] += 1
+            raise LLMError("The model took too long to answer.", status_code=504)
+        except ProviderError as e:
+            _sync_quota(e.headers)
+            if e.status == 429:
+                _stats["rate_limited"] += 1
+                _pause(e.retry_after)
+            if not e.retryable or attempt == LLM_MAX_RETRIES:
+                _stats["failures"] += 1
+                raise _final_error(e)
+            delay = e.retry_after if e.retry_after is not None else _backoff(attempt)
+            if loop.time() + delay >= deadline:
+                _stats["failures"] += 1
+                raise _final_error(e)
+            _stats["retries"] += 1
+            print(f"LLM {route} call failed ({e.status or 'connection'}): retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+def _backoff(attempt: int) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(LLM_RETRY_MAX_SECS, LLM_RETRY_BASE_SECS * 2 ** attempt))
+
+
+def _final_error(e: ProviderError) -> LLMError:
+    if e.status == 429:
+        return LLMError("The AI provider is rate limiting requests. Try again shortly.",
+                        status_code=429, retry_after=e.retry_after or LLM_RETRY_MAX_SECS)
+    if e.status is None or e.status >= 500:
+        return LLMError(f"The AI provider is unavailable: {e}", status_code=503, retry_after=LLM_RETRY_MAX_SECS)
+    return LLMError(f"The AI provider rejected the request: {e}", status_code=502)
+
+
+def _pause(retry_after: float | None):
+    global _paused_until
+    now = asyncio.get_running_loop().time()
+    _paused_until = max(_paused_until, now + (retry_after if retry_after is not None else _backoff(0)))
+
+
+async def _wait_for_quota(estimated_tokens: float, deadline: float):
+    loop = asyncio.get_running_loop()
+    while True:
+        now = loop.time()
+        wait = _paused_until - now
+        if wait <= 0:
+            wait = _buckets["requests"].take(1, now)
+            if wait <= 0:
+                wait = _buckets["tokens"].take(estimated_tokens, now)
+                if wait <= 0:
+                    return
+                _buckets["requests"].available += 1  # give back the request we just took
+        if now + wait >= deadline:
+            raise LLMError("The AI provider's rate limit is exhausted. Try again shortly.",
+                           status_code=429, retry_after=wait)
+        await asyncio.sleep(wait)
+
+
+def _sync_quota(headers: Mapping):
+    now = asyncio.get_running_loop().time()
+    for kind in ("requests", "tokens"):
+        limit = headers.get(f"x-ratelimit-limit-{kind}")
+        remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+        reset = headers.get(f"x-ratelimit-reset-{kind}")
+        if limit is None or remaining is None or reset is None:
+            continue
+        try:
+            _buckets[kind].sync(float(limit), float(remaining), parse_duration(reset), now)
+        except ValueError:
+            pass
+
+
+def parse_duration(value: str) -> float:
+    """Seconds in a rate-limit reset header: "7.66s", "2m59.56s", "1h2m", "120ms" or a plain number."""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    if not parts:
+        raise ValueError(f"Unrecognised duration: {value!r}")
+    return sum(float(amount) * units[unit] for amount, unit in parts)
+
+
+def stats() -> dict:
+    limits = _route_limits()
+    return {
+        **_stats,
+        "waiting": _global_slots.waiting if _global_slots else 0,
+        "routes": {
+            route: {"limit": limits.get(route, LLM_MAX_CONCURRENCY), "in_flight": count}
+            for route, count in _in_flight.items()
+        },
+        "quota": {kind: {"capacity": b.capacity, "available": round(b.available, 1)} for kind, b in _buckets.items()},
+    }
+
+
+class GroqProvider:
+    """Groq's async SDK over one pooled keep-alive HTTP client; retries are left to the gateway."""
+
+    def __init__(self):
+        import httpx
+        from groq import AsyncGroq, DefaultAsyncHttpxClient
+
+        self.client = AsyncGroq(
+            api_key=os.getenv("GROQ_API_KEY"),
+            max_retries=0,
+            timeout=httpx.Timeout(LLM_TIMEOUT_SECS, connect=10.0),
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=max(LLM_MAX_CONCURRENCY, LLM_KEEPALIVE_CONNECTIONS),
+                    max_keepalive_connections=LLM_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=60,
+                ),
+            ),
+        )
+
+    async def complete(self, **params) -> tuple[str, Mapping]:
+        async with _GroqErrors():
+            raw = await self.client.chat.completions.with_raw_response.create(**params)
+            completion = await raw.parse()
+        return completion.choices[0].message.content, raw.headers
+
+    async def stream(self, **params) -> tuple[AsyncIterator[str], Mapping]:
+        async with _GroqErrors():
+            raw = await self.client.chat.completions.with_raw_response.create(stream=True, **params)
+            upstream = await raw.parse()
+
+        async def deltas():
+            try:
+                async with _GroqErrors():
+                    async for chunk in upstream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            yield chunk.choices[0].delta.content
+            finally:
+                await upstream.close()
+
+        return deltas(), raw.headers
+
+    async def close(self):
+        await self.client.close()
+
+
+class _GroqErrors:
+    """Translate SDK exceptions into ProviderError."""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        import httpx
+        import groq
+
+        if isinstance(exc, groq.APIStatusError):
+            headers = exc.response.headers
+            retry_after = headers.get("retry-after")
+            try:
+                retry_after = float(retry_after) if retry_after is not None else None
+            except ValueError:
+                retry_after = None
+            raise ProviderError(exc.message, status=exc.status_code, retry_after=retry_after, headers=headers) from exc
+        if isinstance(exc, (groq.APIConnectionError, httpx.HTTPError)):
+            raise ProviderError(str(exc) or type(exc).__name__) from exc
+        return False
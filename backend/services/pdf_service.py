@@ -1,33 +1,195 @@
-import io
-import pdfplumber
+import os
+import asyncio
+import hashlib
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+
 from fastapi import UploadFile
 
+from utils import metrics
+
+# Extraction backend: "pdfplumber" (default), or the faster "pymupdf" / "pypdfium2"
+PDF_BACKEND = os.getenv("PDF_BACKEND", "pdfplumber")
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))  # processes; 1 = extract in-process
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+
+SPOOL_READ_SIZE = 1024 * 1024  # bytes per read while spooling uploads to disk
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+metrics.Gauge("pdf_extract_tasks_pending", "Page ranges queued or being extracted in the PDF process pool",
+              function=lambda: len(_pool._pending_work_items) if _pool is not None else 0)
 
-async def extract_pdf_text(file: UploadFile) -> tuple[str, str]:
+
+async def spool_upload(file: UploadFile, max_bytes: int) -> tuple[str, str]:
     """
-    Extract text from an uploaded PDF file.
-    Returns (text, title) tuple.
+    Copy an upload to a temp file in fixed-size reads instead of holding it in RAM.
+    Returns (path, sha256 of the bytes). The caller deletes the file.
+    Raises ValueError if the upload is larger than max_bytes.
     """
-    contents = await file.read()
-    pdf_bytes = io.BytesIO(contents)
+    loop = asyncio.get_running_loop()
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await file.read(SPOOL_READ_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError("File too large.")
+                digest.update(chunk)
+                await loop.run_in_executor(None, out.write, chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, digest.hexdigest()
 
-    text_parts = []
-    title = file.filename or "Uploaded PDF"
 
-    with pdfplumber.open(pdf_bytes) as pdf:
-        # Try to get title from metadata
-        if pdf.metadata:
-            meta_title = pdf.metadata.get("Title", "")
-            if meta_title and meta_title.strip():
-                title = meta_title.strip()
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(SPOOL_READ_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
 
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text_parts.append(page_text)
+
+def extract_pdf_text(pdf_path: str, filename: str | None = None, progress=None) -> tuple[str, str]:
+    """
+    Extract text from a PDF file on disk. Blocking — run it in an executor.
+    Returns (text, title) tuple.
+    If given, progress("extract", fraction) is called as pages complete.
+    """
+    title = pdf_title(pdf_path) or filename or "Uploaded PDF"
+    page_count = pdf_page_count(pdf_path)
+
+    text_parts = []
+    for i, page_text in enumerate(iter_pdf_pages(pdf_path), 1):
+        if page_text:
+            text_parts.append(page_text)
+        if progress and (i % PDF_PAGES_PER_TASK == 0 or i == page_count):
+            progress("extract", i / page_count)
 
     full_text = "\n\n".join(text_parts)
     if not full_text.strip():
         raise ValueError("No readable text found in PDF. The file may be scanned or image-based.")
 
     return full_text, title
+
+
+def iter_pdf_pages(pdf_path: str, backend: str = PDF_BACKEND, parallel: bool = PDF_WORKERS > 1) -> Iterator[str]:
+    """
+    Yield each page's text in page order ("" for pages without text).
+
+    With `parallel`, page ranges are extracted across the PDF_WORKERS process pool; pages are yielded
+    as soon as their range (and every range before it) is done, so consumers can
+    start on the first pages while later ones are still being parsed.
+    """
+    page_count = pdf_page_count(pdf_path, backend)
+    ranges = [(start, min(start + PDF_PAGES_PER_TASK, page_count))
+              for start in range(0, page_count, PDF_PAGES_PER_TASK)]
+
+    if not parallel or len(ranges) <= 1:
+        for start, end in ranges:
+            yield from _extract_range(pdf_path, backend, start, end)
+        return
+
+    futures = [_get_pool().submit(_extract_range, pdf_path, backend, start, end)
+               for start, end in ranges]
+    try:
+        for future in futures:
+            yield from future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def pdf_page_count(pdf_path: str, backend: str = PDF_BACKEND) -> int:
+    if backend == "pymupdf":
+        import pymupdf
+        with pymupdf.open(pdf_path) as doc:
+            return doc.page_count
+    if backend == "pypdfium2":
+        import pypdfium2
+        pdf = pypdfium2.PdfDocument(pdf_path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    import pdfplumber
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+
+def pdf_title(pdf_path: str, backend: str = PDF_BACKEND) -> str | None:
+    """Document title from the PDF metadata, if set."""
+    if backend == "pymupdf":
+        import pymupdf
+        with pymupdf.open(pdf_path) as doc:
+            meta_title = (doc.metadata or {}).get("title", "")
+    elif backend == "pypdfium2":
+        import pypdfium2
+        pdf = pypdfium2.PdfDocument(pdf_path)
+        try:
+            meta_title = pdf.get_metadata_dict().get("Title", "")
+        finally:
+            pdf.close()
+    else:
+        import pdfplumber
+        with pdfplumber.open(pdf_path) as pdf:
+            meta_title = (pdf.metadata or {}).get("Title", "")
+    if isinstance(meta_title, str) and meta_title.strip():
+        return meta_title.strip()
+    return None
+
+
+def _extract_range(pdf_path: str, backend: str, start: int, end: int) -> list[str]:
+    """Text of pages [start, end). Runs in a worker process, so it opens the file itself."""
+    if backend == "pymupdf":
+        import pymupdf
+        with pymupdf.open(pdf_path) as doc:
+            return [doc[i].get_text() or "" for i in range(start, end)]
+
+    if backend == "pypdfium2":
+        import pypdfium2
+        pdf = pypdfium2.PdfDocument(pdf_path)
+        try:
+            texts = []
+            for i in range(start, end):
+                page = pdf[i]
+                textpage = page.get_textpage()
+                texts.append(textpage.get_text_range() or "")
+                textpage.close()
+                page.close()
+            return texts
+        finally:
+            pdf.close()
+
+    import pdfplumber
+    with pdfplumber.open(pdf_path, pages=list(range(start + 1, end + 1))) as pdf:
+        texts = []
+        for page in pdf.pages:
+            texts.append(page.extract_text() or "")
+            page.close()  # drop cached layout objects
+        return texts
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """The process pool shared by all extractions, PDF_WORKERS processes."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the parent holds torch / DB threads that must not be forked
+            _pool = ProcessPoolExecutor(max_workers=max(PDF_WORKERS, 1), mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
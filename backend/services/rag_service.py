@@ -1,43 +1,28 @@
 import os
-from groq import Groq
-from dotenv import load_dotenv
-from utils.embeddings import get_embedding
-from utils.database import similarity_search, get_chat_history
+import time
+import asyncio
+import contextvars
+from utils.database import (
+    similarity_search, hybrid_candidates, lexical_candidates, get_session_chunk_vectors, get_parent_windows,
+)
+from utils.rank_fusion import reciprocal_rank_fusion
+from utils import session_vectors, semantic_cache, metrics
+from services.embedding_service import embed_query
+from services import llm_gateway, conversation_memory
 
-load_dotenv()
-
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
 MODEL = "llama-3.3-70b-versatile"
 
+# Hybrid retrieval: full-text and vector rankings merged with reciprocal rank fusion.
+# The weight is the lexical share (vector gets the rest); 0 means vector search only.
+HYBRID_LEXICAL_WEIGHT = float(os.getenv("HYBRID_LEXICAL_WEIGHT", "0.4"))
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))  # taken from each ranking before fusion
+RRF_K = int(os.getenv("RRF_K", "60"))
 
-def build_rag_context(session_id: str, query: str, top_k: int = 5) -> str:
-    """Retrieve most relevant chunks for the query via vector similarity."""
-    query_embedding = get_embedding(query)
-    results = similarity_search(session_id, query_embedding, top_k=top_k)
-    if not results:
-        return ""
-    context_parts = [f"[Chunk {i+1} (similarity: {r['similarity']:.2f})]:\n{r['content']}"
-                     for i, r in enumerate(results)]
-    return "\n\n".join(context_parts)
-
-
-def chat_with_rag(session_id: str, user_message: str):
-    """
-    Generator that yields SSE-formatted chunks for streaming response.
-    Uses RAG: retrieves relevant context, then streams GPT response.
-    """
-    # 1. Get relevant context via RAG
-    context = build_rag_context(session_id, user_message)
-
-    # 2. Get recent chat history
-    history = get_chat_history(session_id, limit=10)
-    history_messages = [
-        {"role": msg["role"], "content": msg["content"]}
-        for msg in history
-    ]
+# Small child chunks are retrieved, then widened to their parent windows for the prompt
+RAG_CHILD_TOP_K = int(os.getenv("RAG_CHILD_TOP_K", "8"))  # child chunks retrieved per question
+RAG_CONTEXT_WINDOWS = int(os.getenv("RAG_CONTEXT_WINDOWS", "4"))  # parent windows sent to the LLM
 
-    # 3. Build system prompt
-    system_prompt = """You are an intelligent learning assistant helping a student understand content they've uploaded or shared.
+SYSTEM_PROMPT = """You are an intelligent learning assistant helping a student understand content they've uploaded or shared.
 
 Your capabilities:
 - Answer questions about the provided content accurately
@@ -48,28 +33,162 @@ Your capabilities:
 
 Always ground your answers in the provided context. If the question cannot be answered from the context, say so clearly but still try to be helpful."""
 
-    # 4. Build messages array
-    messages = [{"role": "system", "content": system_prompt}]
-
-    if context:
-        messages.append({
-            "role": "system",
-            "content": f"RELEVANT CONTENT FROM THE DOCUMENT:\n\n{context}"
-        })
-
-    messages.extend(history_messages)
-    messages.append({"role": "user", "content": user_message})
-
-    # 5. Stream response
-    stream = client.chat.completions.create(
-        model=MODEL,
-        messages=messages,
-        temperature=0.7,
-        max_tokens=1500,
-        stream=True,
-    )
-
-    for chunk in stream:
-        delta = chunk.choices[0].delta
-        if delta.content:
-            yield delta.content
+
+def build_rag_context(session_id: str, query: str, top_k: int = RAG_CHILD_TOP_K,
+                      lexical_weight: float | None = None) -> list[str]:
+    """Retrieve the most relevant passages for the query, formatted, best first."""
+    _, windows = retrieve_context(session_id, query, top_k, lexical_weight)
+    return format_context(windows)
+
+
+def retrieve_context(session_id: str, query: str, top_k: int = RAG_CHILD_TOP_K,
+                     lexical_weight: float | None = None) -> tuple[list[float], list[dict]]:
+    """The query's embedding and the passages (parent windows) retrieved for it, best first."""
+    with metrics.stage("chat", "embed_query"):
+        query_embedding = embed_query(query)
+    with metrics.stage("chat", "search"):
+        results = retrieve_chunks(session_id, query_embedding, top_k=top_k, query_text=query,
+                                  lexical_weight=lexical_weight)
+    with metrics.stage("chat", "expand"):
+        return query_embedding, expand_to_parents(session_id, results, RAG_CONTEXT_WINDOWS)
+
+
+def format_context(windows: list[dict]) -> list[str]:
+    return [f"[Excerpt {i+1} (similarity: {w['similarity']:.2f})]:\n{w['content']}"
+            for i, w in enumerate(windows)]
+
+
+def expand_to_parents(session_id: str, results: list[dict], limit: int) -> list[dict]:
+    """
+    Replace retrieved chunks with their parent windows, best first, as {content, similarity}.
+    Hits in the same window are merged under the best one's similarity; chunks
+    stored without a parent are kept as they are. At most `limit` windows.
+    """
+    windows: dict = {}
+    for r in results:
+        key = ("parent", r["parent"]) if r.get("parent") is not None else ("chunk", r["content"])
+        if key not in windows:
+            windows[key] = r
+    picked = list(windows.items())[:limit]
+
+    parents = [key[1] for key, _ in picked if key[0] == "parent"]
+    entry = session_vectors.peek(session_id)
+    texts = entry.parent_windows(parents) if entry is not None else get_parent_windows(session_id, parents)
+    return [
+        {"content": texts.get(key[1], r["content"]) if key[0] == "parent" else r["content"],
+         "similarity": r["similarity"]}
+        for key, r in picked
+    ]
+
+
+def retrieve_chunks(session_id: str, query_embedding: list[float], top_k: int = 5,
+                    query_text: str | None = None, lexical_weight: float | None = None) -> list[dict]:
+    """
+    Top-k chunks as {content, similarity, parent}. With `query_text` and a lexical weight
+    (HYBRID_LEXICAL_WEIGHT unless given), full-text matches are fused in with RRF;
+    otherwise it's cosine similarity alone. Hot sessions are ranked by vector from
+    the in-process cache; sessions too large for it use pgvector.
+    """
+    weight = HYBRID_LEXICAL_WEIGHT if lexical_weight is None else min(max(lexical_weight, 0.0), 1.0)
+    entry = get_session_vectors(session_id) if session_vectors.is_cacheable(session_id) else None
+    if not query_text or weight == 0:
+        if entry is None:
+            return similarity_search(session_id, query_embedding, top_k=top_k)
+        return entry.search(query_embedding, top_k)
+
+    candidates = max(HYBRID_CANDIDATES, top_k)
+    if entry is None:
+        # One round trip for both rankings
+        ranked = hybrid_candidates(session_id, query_embedding, query_text, candidates)
+        vector = [r["content"] for r in ranked["vector"]]
+        lexical = [r["content"] for r in ranked["lexical"]]
+        found = {r["content"]: r for r in ranked["vector"] + ranked["lexical"]}
+        describe = found.__getitem__
+    else:
+        vector = [r["content"] for r in entry.search(query_embedding, candidates)]
+        lexical = lexical_candidates(session_id, query_text, candidates)
+        scores = entry.scores(query_embedding)
+
+        def describe(content: str) -> dict:
+            i = entry.index_of(content)
+            if i is None:
+                return {"content": content, "similarity": 0.0, "parent": None}
+            return {"content": content, "similarity": float(scores[i]), "parent": entry.parents[i]}
+
+    fused = reciprocal_rank_fusion([(vector, 1 - weight), (lexical, weight)], k=RRF_K)
+    return [describe(content) for content, _ in fused[:top_k]]
+
+
+def get_session_vectors(session_id: str) -> session_vectors.SessionVectors | None:
+    """
+    A session's chunks and normalised embeddings (in chunk order) from the vector
+    cache, loading them on first use. None if the session is too large to cache.
+    """
+    if not session_vectors.enabled():
+        loaded = get_session_chunk_vectors(session_id, session_vectors.VECTOR_CACHE_MAX_CHUNKS)
+        return session_vectors.SessionVectors(*loaded) if loaded else None
+    if not session_vectors.is_cacheable(session_id):
+        return None
+    entry = session_vectors.get(session_id)
+    if entry is None:
+        load_token = session_vectors.token(session_id)
+        loaded = get_session_chunk_vectors(session_id, session_vectors.VECTOR_CACHE_MAX_CHUNKS)
+        if loaded is None:
+            session_vectors.mark_too_large(session_id)
+            return None
+        entry = session_vectors.put(session_id, *loaded, load_token)
+    return entry
+
+
+async def chat_with_rag(session_id: str, user_message: str, usage: dict | None = None,
+                        lexical_weight: float | None = None, answer_cache: bool = True,
+                        regenerate: bool = False):
+    """
+    Async generator that yields the response text as it streams in.
+    Uses RAG: retrieves relevant context, then streams the LLM response.
+    With `answer_cache`, a cached answer to a similar question over the same
+    passages is replayed instead (`regenerate` skips the lookup but still stores).
+    Follow-ups that refer back to the conversation never use the cache.
+    The prompt's token breakdown, or "cached": True, is written into `usage`, if given.
+    """
+    usage = {} if usage is None else usage
+    use_cache = answer_cache and semantic_cache.enabled() and not semantic_cache.refers_back(user_message)
+
+    # 1. Get relevant context via RAG (embedding + search are blocking)
+    loop = asyncio.get_running_loop()
+    with metrics.stage("chat", "retrieve"):
+        query_embedding, windows = await loop.run_in_executor(
+            None, contextvars.copy_context().run, retrieve_context, session_id, user_message, RAG_CHILD_TOP_K,
+            lexical_weight
+        )
+
+    # 2. Same question, same passages? Replay the earlier answer
+    if use_cache:
+        context = semantic_cache.context_keys([w["content"] for w in windows])
+        if not regenerate:
+            cached = semantic_cache.lookup(session_id, query_embedding, context)
+            if cached is not None:
+                usage["cached"] = True
+                for delta in semantic_cache.replay(cached):
+                    yield delta
+                return
+
+    # 3. Fit context, conversation summary and recent turns into the prompt budget
+    with metrics.stage("chat", "prompt"):
+        messages, prompt_usage = await conversation_memory.build_messages(
+            session_id, SYSTEM_PROMPT, format_context(windows), user_message
+        )
+    usage.update(prompt_usage, cached=False)
+
+    # 4. Stream response; closing this generator early (client went away) closes the upstream stream
+    answer = []
+    started = time.perf_counter()
+    try:
+        async for delta in llm_gateway.stream(messages, route="chat", model=MODEL, temperature=0.7, max_tokens=1500):
+            answer.append(delta)
+            yield delta
+    finally:
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - started, pipeline="chat", stage="llm")
+
+    if use_cache:
+        semantic_cache.store(session_id, query_embedding, context, "".join(answer))
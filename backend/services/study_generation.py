@@ -0,0 +1,328 @@
+import os
+import math
+import time
+import asyncio
+from contextlib import aclosing
+from typing import AsyncIterator
+
+import numpy as np
+
+from services.ai_service import (
+    generate_flashcards, generate_quiz, stream_flashcards, stream_quiz, MODEL, PROMPT_VERSION, SINGLE_CALL_WORDS,
+)
+from services.rag_service import get_session_vectors
+from utils.embeddings import encode_batch
+from utils.chunking import CHUNKER_ID
+from utils import generation_cache, metrics
+
+# "auto" generates short documents in one call and long ones map-reduce style;
+# "map_reduce" always samples sections; "single" always uses one call over the
+# first SINGLE_CALL_WORDS words
+GENERATION_MODE = os.getenv("GENERATION_MODE", "auto")
+GEN_SECTIONS = int(os.getenv("GEN_SECTIONS", "6"))  # sections sampled across the document
+GEN_SECTION_WORDS = int(os.getenv("GEN_SECTION_WORDS", "1600"))
+GEN_OVERSAMPLE = float(os.getenv("GEN_OVERSAMPLE", "1.5"))  # items asked for vs. needed, so dedupe can drop some
+GEN_DEDUPE_THRESHOLD = float(os.getenv("GEN_DEDUPE_THRESHOLD", "0.88"))  # cosine above which two items are duplicates
+
+KMEANS_ITERATIONS = 10
+
+# name -> (single-call generator, field compared when deduplicating)
+_KINDS = {
+    "flashcards": (generate_flashcards, "front"),
+    "quiz": (generate_quiz, "question"),
+}
+_STREAMS = {"flashcards": stream_flashcards, "quiz": stream_quiz}
+
+_SECTION_DONE = object()
+
+
+async def generate_flashcards_for_session(session_id: str, text: str, count: int,
+                                          regenerate: bool = False) -> tuple[list[dict], bool]:
+    """Flashcards covering the whole session. Returns (flashcards, served from cache)."""
+    return await _generate_cached("flashcards", session_id, text, count, regenerate)
+
+
+async def generate_quiz_for_session(session_id: str, text: str, count: int,
+                                    regenerate: bool = False) -> tuple[list[dict], bool]:
+    """Quiz questions covering the whole session. Returns (questions, served from cache)."""
+    return await _generate_cached("quiz", session_id, text, count, regenerate)
+
+
+async def _generate_cached(kind: str, session_id: str, text: str, count: int,
+                           regenerate: bool) -> tuple[list[dict], bool]:
+    """
+    Reuse an earlier generation of the same text with the same settings (from any
+    session) unless `regenerate` is set; a fresh result replaces the cached one.
+    """
+    key = generation_cache.generation_key(kind, text, count, _settings())
+    if not regenerate:
+        with metrics.stage(kind, "cache_lookup"):
+            cached = await generation_cache.lookup(key)
+        if cached is not None:
+            return cached, True
+    items, failed = await _generate(kind, session_id, text, count)
+    if not failed:  # a generation missing a section's items is served once, not cached
+        with metrics.stage(kind, "cache_store"):
+            await generation_cache.store(key, kind, items)
+    return items, False
+
+
+def stream_flashcards_for_session(session_id: str, text: str, count: int, regenerate: bool = False,
+                                  info: dict | None = None) -> AsyncIterator[dict]:
+    """
+    Like generate_flashcards_for_session, but yields each card as soon as it is
+    generated. Whether they came from the cache is written into `info["cached"]`, if given.
+    """
+    return _stream_cached("flashcards", session_id, text, count, regenerate, info)
+
+
+def stream_quiz_for_session(session_id: str, text: str, count: int, regenerate: bool = False,
+                            info: dict | None = None) -> AsyncIterator[dict]:
+    """Like generate_quiz_for_session, but yields each question as soon as it is generated (see above)."""
+    return _stream_cached("quiz", session_id, text, count, regenerate, info)
+
+
+async def _stream_cached(kind: str, session_id: str, text: str, count: int, regenerate: bool,
+                         info: dict | None) -> AsyncIterator[dict]:
+    """_generate_cached, streaming: a cached generation is replayed, a fresh one is cached once complete."""
+    info = {} if info is None else info
+    key = generation_cache.generation_key(kind, text, count, _settings())
+    if not regenerate:
+        with metrics.stage(kind, "cache_lookup"):
+            cached = await generation_cache.lookup(key)
+        if cached is not None:
+            info["cached"] = True
+            for item in cached:
+                yield item
+            return
+
+    info["cached"] = False
+    started = time.perf_counter()
+    items, run = [], {}
+    async with aclosing(_stream_generate(kind, session_id, text, count, run)) as generated:
+        async for item in generated:
+            if not items:
+                metrics.STAGE_SECONDS.observe(time.perf_counter() - started, pipeline=kind, stage="first_item")
+            items.append(item)
+            yield item
+    # Reached only if the consumer read to the end
+    if not run["failed"]:
+        with metrics.stage(kind, "cache_store"):
+            await generation_cache.store(key, kind, items)
+
+
+async def _stream_generate(kind: str, session_id: str, text: str, count: int,
+                           run: dict) -> AsyncIterator[dict]:
+    """
+    _generate, streaming. Section calls run concurrently and items are yielded
+    as they arrive, each checked for near-duplicates against those already
+    yielded; if that leaves too few, the least similar skipped items follow.
+    Items come in arrival order rather than document order. The number of
+    failed section calls is written into `run["failed"]` once the items run out.
+    """
+    stream = _STREAMS[kind]
+    field = _KINDS[kind][1]
+    if GENERATION_MODE == "single" or (GENERATION_MODE == "auto" and len(text.split()) <= SINGLE_CALL_WORDS):
+        async with aclosing(stream(text, count)) as items:
+            async for item in items:
+                yield item
+        run["failed"] = 0
+        return
+
+    loop = asyncio.get_running_loop()
+    with metrics.stage(kind, "sections"):
+        sections = await loop.run_in_executor(None, select_sections, session_id, text)
+    quotas = _quotas([weight for _, weight in sections], count)
+
+    arrivals: asyncio.Queue = asyncio.Queue()
+    errors = []
+
+    async def produce(section: str, quota: int):
+        try:
+            async with aclosing(stream(section, quota)) as items:
+                async for item in items:
+                    arrivals.put_nowait(item)
+        except Exception as e:
+            print(f"⚠️ Section {kind} generation failed: {e}")
+            errors.append(e)
+        finally:
+            arrivals.put_nowait(_SECTION_DONE)
+
+    # Section calls run concurrently, within the LLM gateway's per-route limit
+    tasks = [asyncio.create_task(produce(section, quota)) for (section, _), quota in zip(sections, quotas)]
+    picked, skipped = [], []  # unit vectors of yielded items; (similarity, item) of duplicates
+    try:
+        running = len(tasks)
+        while running and len(picked) < count:
+            item = await arrivals.get()
+            if item is _SECTION_DONE:
+                running -= 1
+                continue
+            vector = (await loop.run_in_executor(None, encode_batch, [str(item[field])]))[0]
+            vector /= max(float(np.linalg.norm(vector)), 1e-12)
+            similarity = max(float(v @ vector) for v in picked) if picked else 0.0
+            if similarity < GEN_DEDUPE_THRESHOLD:
+                picked.append(vector)
+                yield item
+            else:
+                skipped.append((similarity, item))
+    finally:
+        # Enough items, or the client went away: stop the remaining section calls
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    if not picked and not skipped and errors:
+        raise errors[0]
+    for _, item in sorted(skipped, key=lambda s: s[0])[:count - len(picked)]:
+        yield item
+    run["failed"] = len(errors)
+
+
+def _settings() -> str:
+    """Everything besides text, type and count that changes what gets generated."""
+    return (f"{MODEL}:v{PROMPT_VERSION}:{GENERATION_MODE}:{SINGLE_CALL_WORDS}:{GEN_SECTIONS}:"
+            f"{GEN_SECTION_WORDS}:{GEN_OVERSAMPLE}:{GEN_DEDUPE_THRESHOLD}:{CHUNKER_ID}")
+
+
+async def _generate(kind: str, session_id: str, text: str, count: int) -> tuple[list[dict], int]:
+    """
+    Map-reduce generation: sample representative sections across the document,
+    generate a share of the items from each section in parallel, then drop
+    near-duplicates and merge down to `count` items in document order.
+    Returns (items, number of section calls that failed).
+    """
+    generate, field = _KINDS[kind]
+    if GENERATION_MODE == "single" or (GENERATION_MODE == "auto" and len(text.split()) <= SINGLE_CALL_WORDS):
+        with metrics.stage(kind, "generate", sections=1):
+            return await generate(text, count), 0
+
+    loop = asyncio.get_running_loop()
+    with metrics.stage(kind, "sections"):
+        sections = await loop.run_in_executor(None, select_sections, session_id, text)
+    quotas = _quotas([weight for _, weight in sections], count)
+    # Section calls run concurrently, within the LLM gateway's per-route limit
+    with metrics.stage(kind, "generate", sections=len(sections)):
+        outcomes = await asyncio.gather(
+            *(generate(section, quota) for (section, _), quota in zip(sections, quotas)),
+            return_exceptions=True,
+        )
+
+    results, errors = [], []
+    for outcome in outcomes:
+        if isinstance(outcome, BaseException):
+            print(f"⚠️ Section {kind} generation failed: {outcome}")
+            errors.append(outcome)
+            results.append([])
+        else:
+            results.append(outcome)
+    if not any(results) and errors:
+        raise errors[0]
+
+    with metrics.stage(kind, "merge"):
+        items = await loop.run_in_executor(None, merge_items, results, quotas, count, field)
+    return items, len(errors)
+
+
+def select_sections(session_id: str, text: str) -> list[tuple[str, float]]:
+    """
+    Representative sections as (text, share of the document) pairs in document order.
+    Chunk embeddings are clustered and each section is built from the parent
+    windows of the chunks closest to a cluster centre, up to GEN_SECTION_WORDS;
+    without embeddings, evenly spaced windows are used.
+    """
+    entry = get_session_vectors(session_id)
+    if entry is None or len(entry.contents) < 2:
+        return _even_sections(text)
+
+    k = min(GEN_SECTIONS, len(entry.contents))
+    labels, centroids = _cluster(entry.matrix, k)
+    windows = entry.parent_windows(sorted({p for p in entry.parents if p is not None}))
+
+    sections = []
+    for cluster in range(k):
+        members = np.flatnonzero(labels == cluster)
+        if len(members) == 0:
+            continue
+        picked, words = {}, 0  # window -> its closest chunk's position, which keeps document order
+        for i in members[np.argsort(-(entry.matrix[members] @ centroids[cluster]))].tolist():
+            parent = entry.parents[i]
+            window = windows.get(parent, entry.contents[i]) if parent is not None else entry.contents[i]
+            if window in picked:
+                continue
+            picked[window] = i
+            words += len(window.split())
+            if words >= GEN_SECTION_WORDS:
+                break
+        ordered = sorted(picked, key=picked.get)
+        sections.append((picked[ordered[0]], "\n\n".join(ordered), len(members) / len(labels)))
+    sections.sort()
+    return [(section, weight) for _, section, weight in sections]
+
+
+def _cluster(matrix: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Spherical k-means with k-means++ seeding on L2-normalised rows. Returns (labels, centroids)."""
+    rng = np.random.default_rng(0)
+    n = len(matrix)
+    centroids = [matrix[rng.integers(n)]]
+    closest = matrix @ centroids[0]
+    for _ in range(1, k):
+        distance = np.clip(1 - closest, 0, None) ** 2
+        total = distance.sum()
+        index = rng.choice(n, p=distance / total) if total > 0 else rng.integers(n)
+        centroids.append(matrix[index])
+        closest = np.maximum(closest, matrix @ matrix[index])
+    centroids = np.stack(centroids)
+
+    for _ in range(KMEANS_ITERATIONS):
+        labels = np.argmax(matrix @ centroids.T, axis=1)
+        for cluster in range(k):
+            members = matrix[labels == cluster]
+            if len(members):
+                centre = members.mean(axis=0)
+                centroids[cluster] = centre / (np.linalg.norm(centre) or 1)
+    return np.argmax(matrix @ centroids.T, axis=1), centroids
+
+
+def _even_sections(text: str) -> list[tuple[str, float]]:
+    words = text.split()
+    starts = sorted(set(np.linspace(0, max(len(words) - GEN_SECTION_WORDS, 0), GEN_SECTIONS).astype(int).tolist()))
+    return [(" ".join(words[start:start + GEN_SECTION_WORDS]), 1 / len(starts)) for start in starts]
+
+
+def _quotas(weights: list[float], count: int) -> list[int]:
+    """Items to request per section: proportional to its share, oversampled for dedupe."""
+    return [max(1, math.ceil(weight * count * GEN_OVERSAMPLE)) for weight in weights]
+
+
+def merge_items(results: list[list[dict]], quotas: list[int], count: int, field: str) -> list[dict]:
+    """
+    Pick `count` items across sections, interleaved in proportion to each
+    section's quota, skipping items too similar to one already picked. Falls back
+    to the least similar skipped items if dedupe leaves too few.
+    """
+    candidates = [(rank / quota, section, rank, item)
+                  for section, (items, quota) in enumerate(zip(results, quotas))
+                  for rank, item in enumerate(items)]
+    candidates.sort(key=lambda c: (c[0], c[1]))
+    if not candidates:
+        return []
+
+    vectors = encode_batch([str(c[3][field]) for c in candidates])
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    picked, skipped = [], []
+    for i in range(len(candidates)):
+        if len(picked) == count:
+            break
+        similarity = float(np.max(vectors[picked] @ vectors[i])) if picked else 0.0
+        if similarity < GEN_DEDUPE_THRESHOLD:
+            picked.append(i)
+        else:
+            skipped.append((similarity, i))
+    for _, i in sorted(skipped)[:count - len(picked)]:
+        picked.append(i)
+
+    # Back to document order: by section, then by position within the section
+    picked.sort(key=lambda i: (candidates[i][1], candidates[i][2]))
+    return [candidates[i][3] for i in picked]
@@ -0,0 +1,38 @@
+import os
+import time
+import random
+
+# Local stand-in for YouTube (VIDEO_PROVIDER=fake), for load tests without network
+# access: every video id gets its own deterministic lecture transcript.
+VIDEO_FAKE_LATENCY_MS = float(os.getenv("VIDEO_FAKE_LATENCY_MS", "200"))  # per transcript fetch
+VIDEO_FAKE_WORDS = int(os.getenv("VIDEO_FAKE_WORDS", "3000"))  # transcript length
+
+SUBJECTS = ("gradient descent", "the attention mechanism", "photosynthesis", "supply and demand",
+            "the French Revolution", "plate tectonics", "binary search", "the immune system",
+            "thermodynamics", "Keynesian economics", "protein folding", "the Krebs cycle")
+VERBS = ("depends on", "explains", "limits", "is driven by", "changes", "is measured by", "balances")
+OBJECTS = ("the learning rate", "energy transfer", "market prices", "local minima", "cell respiration",
+           "the rate of change", "long-range dependencies", "heat flow", "political legitimacy",
+           "the search interval", "antibody production", "continental drift")
+
+
+def lecture_text(seed: str, words: int) -> str:
+    """Deterministic lecture-style prose of about `words` words, in sentences."""
+    rng = random.Random(seed)
+    sentences, count = [], 0
+    while count < words:
+        sentence = (f"In this part of the lecture, {rng.choice(SUBJECTS)} {rng.choice(VERBS)} "
+                    f"{rng.choice(OBJECTS)}, which is why {rng.choice(SUBJECTS)} {rng.choice(VERBS)} "
+                    f"{rng.choice(OBJECTS)}.")
+        sentences.append(sentence)
+        count += len(sentence.split())
+    return " ".join(sentences)
+
+
+def fetch_transcript(video_id: str) -> str:
+    time.sleep(VIDEO_FAKE_LATENCY_MS / 1000)
+    return lecture_text(video_id, VIDEO_FAKE_WORDS)
+
+
+def get_video_title(video_id: str) -> str:
+    return f"Fake lecture {video_id}"
@@ -1,6 +1,21 @@
+import os
 import re
+import asyncio
+import threading
+
+import httpx
+from requests import Session
+from requests.adapters import HTTPAdapter
 from youtube_transcript_api import YouTubeTranscriptApi
-from youtube_transcript_api._errors import TranscriptsDisabled, NoTranscriptFound
+from youtube_transcript_api._errors import TranscriptsDisabled, NoTranscriptFound, VideoUnavailable
+
+from utils import video_cache
+
+VIDEO_PROVIDER = os.getenv("VIDEO_PROVIDER", "youtube")  # "fake" = canned transcripts for load tests (services/video_fake.py)
+YOUTUBE_URL = "https://www.youtube.com"
+YOUTUBE_BASE_URL = os.getenv("YOUTUBE_BASE_URL", YOUTUBE_URL).rstrip("/")  # e.g. benchmarks/fake_youtube.py for tests
+VIDEO_HTTP_CONNECTIONS = int(os.getenv("VIDEO_HTTP_CONNECTIONS", "10"))  # pooled keep-alive connections to YouTube
+VIDEO_HTTP_TIMEOUT_SECS = float(os.getenv("VIDEO_HTTP_TIMEOUT_SECS", "10"))
 
 
 def extract_video_id(url: str) -> str | None:
@@ -15,16 +30,40 @@ def extract_video_id(url: str) -> str | None:
     return None
 
 
-def get_video_title(video_id: str) -> str:
+async def fetch_video(video_id: str) -> tuple[str, str]:
+    """
+    Transcript and title of a video, fetched concurrently.
+    Raises ValueError (like fetch_transcript) for videos that can't be processed.
+    """
+    loop = asyncio.get_running_loop()
+    title = asyncio.create_task(get_video_title(video_id))
+    try:
+        transcript = await loop.run_in_executor(None, fetch_transcript, video_id)
+    except BaseException:
+        title.cancel()
+        raise
+    return transcript, await title
+
+
+async def get_video_title(video_id: str) -> str:
     """Attempt to get video title via oEmbed (no API key required)."""
-    import httpx
+    title = video_cache.get("title", video_id)
+    if title is not None:
+        return title
+    if VIDEO_PROVIDER == "fake":
+        from services.video_fake import get_video_title as fake_title
+        title = fake_title(video_id)
+        video_cache.put("title", video_id, title)
+        return title
     try:
-        response = httpx.get(
-            f"https://www.youtube.com/oembed?url=https://www.youtube.com/watch?v={video_id}&format=json",
-            timeout=10
+        response = await _http().get(
+            "/oembed", params={"url": f"{YOUTUBE_URL}/watch?v={video_id}", "format": "json"},
         )
         if response.status_code == 200:
-            return response.json().get("title", f"YouTube Video {video_id}")
+            title = response.json().get("title")
+            if title:
+                video_cache.put("title", video_id, title)
+                return title
     except Exception:
         pass
     return f"YouTube Video {video_id}"
@@ -32,19 +71,93 @@ def get_video_title(video_id: str) -> str:
 
 def fetch_transcript(video_id: str) -> str:
     """Fetch and concatenate transcript for a YouTube video."""
+    transcript = video_cache.get("transcript", video_id)
+    if transcript is not None:
+        return transcript
+    error = video_cache.get("no_transcript", video_id)
+    if error is not None:
+        raise ValueError(error)
+
+    if VIDEO_PROVIDER == "fake":
+        from services.video_fake import fetch_transcript as fake_transcript
+        full_text = fake_transcript(video_id)
+    else:
+        full_text = _fetch_youtube_transcript(video_id)
+    video_cache.put("transcript", video_id, full_text)
+    return full_text
+
+
+def _fetch_youtube_transcript(video_id: str) -> str:
     try:
-        ytt = YouTubeTranscriptApi()
-        transcript = ytt.fetch(video_id)
+        transcript = _transcript_api().fetch(video_id)
         full_text = " ".join(snippet.text for snippet in transcript)
         # Clean up common transcript artifacts
         full_text = re.sub(r"\[.*?\]", "", full_text)
         full_text = re.sub(r"\s+", " ", full_text).strip()
         return full_text
     except TranscriptsDisabled:
-        raise ValueError("Transcripts are disabled for this video.")
+        _no_transcript(video_id, "Transcripts are disabled for this video.")
     except NoTranscriptFound:
-        raise ValueError("No transcript found for this video.")
+        _no_transcript(video_id, "No transcript found for this video.")
+    except VideoUnavailable:
+        _no_transcript(video_id, "This video is unavailable.")
     except Exception as e:
         raise ValueError(f"Failed to fetch transcript: {str(e)}")
 
-  
+
+def _no_transcript(video_id: str, message: str):
+    """Remember that a video has no usable transcript (not for transient failures) and raise."""
+    video_cache.put("no_transcript", video_id, message, video_cache.VIDEO_NEGATIVE_TTL_SECS)
+    raise ValueError(message)
+
+
+# --- Shared HTTP clients
+
+class _YouTubeAdapter(HTTPAdapter):
+    """One connection pool for all transcript fetches; sends youtube.com requests to YOUTUBE_BASE_URL if set."""
+
+    def send(self, request, **kwargs):
+        if YOUTUBE_BASE_URL != YOUTUBE_URL and request.url.startswith(YOUTUBE_URL):
+            request.url = YOUTUBE_BASE_URL + request.url[len(YOUTUBE_URL):]
+        kwargs["timeout"] = kwargs.get("timeout") or VIDEO_HTTP_TIMEOUT_SECS
+        return super().send(request, **kwargs)
+
+
+_adapter = _YouTubeAdapter(pool_connections=2, pool_maxsize=VIDEO_HTTP_CONNECTIONS)
+_local = threading.local()
+_http_client: httpx.AsyncClient | None = None
+
+
+def _transcript_api() -> YouTubeTranscriptApi:
+    """
+    This thread's YouTubeTranscriptApi. The library keeps per-session state (consent
+    cookie) and isn't thread-safe, so each executor thread gets its own session, but
+    they all share one keep-alive connection pool.
+    """
+    api = getattr(_local, "api", None)
+    if api is None:
+        session = Session()
+        session.mount("https://", _adapter)
+        session.mount("http://", _adapter)
+        api = _local.api = YouTubeTranscriptApi(http_client=session)
+    return api
+
+
+def _http() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            base_url=YOUTUBE_BASE_URL,
+            timeout=VIDEO_HTTP_TIMEOUT_SECS,
+            limits=httpx.Limits(max_connections=VIDEO_HTTP_CONNECTIONS, max_keepalive_connections=VIDEO_HTTP_CONNECTIONS),
+        )
+    return _http_client
+
+
+async def close():
+    """Close the pooled HTTP connections (called on shutdown)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    _adapter.close()
@@ -0,0 +1,60 @@
+import asyncio
+import os
+import time
+
+from fastapi import HTTPException
+
+from utils.embeddings import warm_up as warm_up_model
+from utils.database import init_embedding_schema, run_db
+
+# How long a request that needs the embedding model waits for startup before getting a 503
+READY_WAIT_SECS = float(os.getenv("READY_WAIT_SECS", "20"))
+
+_ready = asyncio.Event()
+_state = {"status": "starting", "error": None, "warmup_secs": None}
+
+
+async def warm_up():
+    """
+    Startup task: load and pre-warm the embedding model, then bring the chunks
+    schema in line with it. The app serves /health while this runs; /ready and
+    model-dependent routes wait for it.
+    """
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    try:
+        await loop.run_in_executor(None, warm_up_model)
+        await run_db(init_embedding_schema)
+    except Exception as e:
+        _state.update(status="failed", error=str(e))
+        print(f"❌ Warm-up failed: {e}")
+        return
+    _state.update(status="ready", warmup_secs=round(time.perf_counter() - started, 2))
+    _ready.set()
+    print(f"✅ Ready after {_state['warmup_secs']}s warm-up")
+
+
+def readiness() -> dict:
+    return dict(_state)
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+async def wait_ready():
+    await _ready.wait()
+
+
+async def require_ready():
+    """Route dependency: wait briefly for warm-up, then answer 503 so clients retry."""
+    if _ready.is_set():
+        return
+    try:
+        await asyncio.wait_for(_ready.wait(), READY_WAIT_SECS)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=503,
+            detail="Service is starting up, please retry shortly.",
+            headers={"Retry-After": "5"},
+        )
@@ -10,23 +10,46 @@ CREATE TABLE IF NOT EXISTS sessions (
     source_type TEXT NOT NULL CHECK (source_type IN ('youtube', 'pdf')),
     source_url TEXT,
     raw_text TEXT,
+    raw_text_z BYTEA,  -- zlib-compressed raw text when RAW_TEXT_COMPRESSION=zlib
+    word_count INTEGER,
+    content_hash TEXT,
+    answer_cache BOOLEAN NOT NULL DEFAULT TRUE,  -- serve repeated chat questions from the semantic answer cache
+    ready BOOLEAN NOT NULL DEFAULT TRUE,  -- FALSE (hidden) while an ingest is still storing its chunks
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Dedup lookup for re-ingesting identical videos / PDFs
+CREATE INDEX IF NOT EXISTS sessions_content_hash_idx ON sessions (content_hash);
+
 -- Chunks with vector embeddings
 CREATE TABLE IF NOT EXISTS chunks (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     session_id UUID REFERENCES sessions(id) ON DELETE CASCADE,
     content TEXT NOT NULL,
     chunk_index INTEGER NOT NULL,
-    embedding vector(1536),
+    parent_index INTEGER,  -- parent window the chunk is expanded to in chat context
+    embedding vector(384),  -- must match the embedding model (all-MiniLM-L6-v2)
+    content_tsv tsvector GENERATED ALWAYS AS (to_tsvector('english', content)) STORED,
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
--- Vector similarity search index
-CREATE INDEX IF NOT EXISTS chunks_embedding_idx
-ON chunks USING ivfflat (embedding vector_cosine_ops)
-WITH (lists = 100);
+CREATE INDEX IF NOT EXISTS chunks_session_id_idx ON chunks (session_id);
+
+-- Full-text index for the lexical half of hybrid retrieval
+CREATE INDEX IF NOT EXISTS chunks_content_tsv_idx ON chunks USING gin (content_tsv);
+
+-- The ANN index (chunks_embedding_idx) is built by the backend, and only when
+-- per-session searches scan it iteratively (VECTOR_SESSION_SCAN, pgvector >= 0.8)
+
+-- Embedding model and ANN index the chunks table was built with (managed by the backend)
+CREATE TABLE IF NOT EXISTS vector_index_state (
+    table_name TEXT PRIMARY KEY,
+    model_name TEXT NOT NULL,
+    dim INTEGER NOT NULL,
+    index_spec JSONB,
+    rows_at_build BIGINT NOT NULL DEFAULT 0,
+    built_at TIMESTAMPTZ
+);
 
 -- Flashcards
 CREATE TABLE IF NOT EXISTS flashcards (
@@ -57,9 +80,55 @@ CREATE TABLE IF NOT EXISTS chat_messages (
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Rolling summary of each chat's older turns, up to the (created_at, id) of the last message it covers
+CREATE TABLE IF NOT EXISTS chat_summaries (
+    session_id UUID PRIMARY KEY REFERENCES sessions(id) ON DELETE CASCADE,
+    summary TEXT NOT NULL,
+    covered_at TIMESTAMPTZ NOT NULL,
+    covered_id UUID NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Keyset pagination: newest sessions, and a session's newest messages
+CREATE INDEX IF NOT EXISTS sessions_created_at_idx ON sessions (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS chat_messages_session_created_at_idx
+ON chat_messages (session_id, created_at DESC, id DESC);
+
+-- Background ingestion jobs (payload holds uploaded PDF bytes until the job finishes)
+CREATE TABLE IF NOT EXISTS ingest_jobs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    source_type TEXT NOT NULL CHECK (source_type IN ('youtube', 'pdf')),
+    source_url TEXT NOT NULL,
+    payload BYTEA,
+    status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'done', 'failed')),
+    stage TEXT,
+    progress REAL NOT NULL DEFAULT 0,
+    result JSONB,
+    error TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS ingest_jobs_unfinished_idx
+ON ingest_jobs (created_at) WHERE status IN ('queued', 'running');
+
+-- Generated flashcards / quizzes keyed by (text hash, type, count, model, prompt version)
+CREATE TABLE IF NOT EXISTS generation_cache (
+    cache_key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    items JSONB NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS generation_cache_created_at_idx ON generation_cache (created_at);
+
 -- Disable RLS for backend access (use service key)
 ALTER TABLE sessions DISABLE ROW LEVEL SECURITY;
 ALTER TABLE chunks DISABLE ROW LEVEL SECURITY;
 ALTER TABLE flashcards DISABLE ROW LEVEL SECURITY;
 ALTER TABLE quiz_questions DISABLE ROW LEVEL SECURITY;
 ALTER TABLE chat_messages DISABLE ROW LEVEL SECURITY;
+ALTER TABLE ingest_jobs DISABLE ROW LEVEL SECURITY;
+ALTER TABLE vector_index_state DISABLE ROW LEVEL SECURITY;
+ALTER TABLE generation_cache DISABLE ROW LEVEL SECURITY;
+ALTER TABLE chat_summaries DISABLE ROW LEVEL SECURITY;
@@ -0,0 +1,48 @@
+import pytest
+
+from utils import chunking
+from utils.chunking import _Packer, split_sentences
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    # One token per word instead of the encoder's tokenizer
+    monkeypatch.setattr(chunking, "token_counts", lambda texts: [len(t.split()) for t in texts])
+
+
+def words(n: int, word: str = "w") -> str:
+    return " ".join([word] * n)
+
+
+def test_sentences_are_packed_up_to_the_limit():
+    packer = _Packer(limit=10, parent_limit=100)
+    chunks = list(packer.add([words(4), words(4), words(4)], paragraph_end=False))
+    assert chunks == [{"content": f"{words(4)} {words(4)}", "parent": 0}]
+    assert list(packer.flush()) == [{"content": words(4), "parent": 0}]
+    assert list(packer.flush()) == []
+
+
+def test_oversized_sentence_is_split_at_word_boundaries():
+    packer = _Packer(limit=4, parent_limit=100)
+    sentence = " ".join(f"w{i}" for i in range(10))
+    chunks = list(packer.add([sentence], paragraph_end=False)) + list(packer.flush())
+    assert [c["content"] for c in chunks] == ["w0 w1 w2 w3", "w4 w5 w6 w7", "w8 w9"]
+
+
+def test_paragraph_end_flushes_unless_the_chunk_is_very_short():
+    packer = _Packer(limit=10, parent_limit=100)
+    assert list(packer.add([words(3)], paragraph_end=True)) == []  # under half the limit: keep filling
+    assert list(packer.add([words(2)], paragraph_end=True)) == [{"content": words(5), "parent": 0}]
+
+
+def test_parents_group_consecutive_children():
+    packer = _Packer(limit=5, parent_limit=10)
+    chunks = list(packer.add([words(5, s) for s in "abcde"], paragraph_end=False)) + list(packer.flush())
+    assert [c["parent"] for c in chunks] == [0, 0, 1, 1, 2]
+    assert chunks[2]["content"] == words(5, "c")
+
+
+def test_split_sentences():
+    text = 'First one. Second?  "Third" ends here!\nFourth line e.g. with 3.5 units.'
+    assert split_sentences(text) == ["First one.", "Second?", '"Third" ends here!', "Fourth line e.g. with 3.5 units."]
+    assert split_sentences("   ") == []
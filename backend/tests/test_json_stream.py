@@ -0,0 +1,63 @@
+import json
+
+from utils.json_stream import JsonItemStream
+
+
+def feed_all(pieces: list[str]) -> list:
+    stream = JsonItemStream()
+    items = []
+    for piece in pieces:
+        items.extend(stream.feed(piece))
+    return items
+
+
+def test_items_are_returned_as_soon_as_they_close():
+    stream = JsonItemStream()
+    assert stream.feed('{"flashcards": [{"front": "A", "back": "1"}, {"fro') == [{"front": "A", "back": "1"}]
+    assert stream.feed('nt": "B", "back": "2"}') == [{"front": "B", "back": "2"}]
+    assert stream.feed("]}") == []
+
+
+def test_top_level_array():
+    assert feed_all(['[{"q": 1},', ' {"q": 2}]']) == [{"q": 1}, {"q": 2}]
+
+
+def test_any_split_gives_the_same_items():
+    reply = json.dumps({"questions": [
+        {"question": 'Is "{" a brace?', "options": ["yes", "no [really]"], "correct_answer": 0},
+        {"question": "Back\\slash}", "options": ["a", "b"], "correct_answer": 1},
+    ]})
+    expected = json.loads(reply)["questions"]
+    assert feed_all(list(reply)) == expected
+    for cut in range(1, len(reply)):
+        assert feed_all([reply[:cut], reply[cut:]]) == expected
+
+
+def test_escape_split_across_pieces():
+    # The backslash ends one piece and the escaped quote starts the next
+    assert feed_all(['[{"front": "say \\', '"hi\\" }"}]']) == [{"front": 'say "hi" }'}]
+    assert feed_all(['[{"front": "C:\\\\', '"}, {"front": "x"}]']) == [{"front": "C:\\"}, {"front": "x"}]
+
+
+def test_nested_arrays_and_objects_stay_part_of_the_item():
+    reply = '{"questions": [{"options": ["a", "b", ["c"]], "meta": {"tags": [{"t": 1}]}}, {"options": []}]}'
+    assert feed_all([reply]) == [
+        {"options": ["a", "b", ["c"]], "meta": {"tags": [{"t": 1}]}},
+        {"options": []},
+    ]
+
+
+def test_prose_and_fence_before_the_json_are_skipped():
+    pieces = ['Sure! Here are "your" cards:\n```json\n{"flashcards": [', '{"front": "A"}]}', "\n```"]
+    assert feed_all(pieces) == [{"front": "A"}]
+
+
+def test_malformed_item_is_skipped():
+    assert feed_all(['[{"a": 1,}, {"b": 2}]']) == [{"b": 2}]
+
+
+def test_text_keeps_everything_fed():
+    stream = JsonItemStream()
+    stream.feed("prose ")
+    stream.feed('[{"a": 1}]')
+    assert stream.text == 'prose [{"a": 1}]'
@@ -0,0 +1,165 @@
+import asyncio
+
+import pytest
+
+from services import llm_gateway
+from services.llm_gateway import LLMError, PrioritySemaphore, ProviderError, TokenBucket
+
+PARAMS = {"model": "m", "messages": [{"role": "user", "content": "Hi"}]}
+
+
+class FakeProvider:
+    """Answers each call with the next scripted outcome: a ProviderError is raised, anything else returned."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    async def complete(self, **params):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, ProviderError):
+            raise outcome
+        return outcome, {}
+
+
+class FakeClock:
+    """Stands in for the event loop's clock: sleeping advances it instantly and records the wait."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def time(self) -> float:
+        return self.now
+
+    async def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += max(delay, 0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fresh gateway state on a fake clock."""
+    clock = FakeClock()
+    monkeypatch.setattr(llm_gateway.asyncio, "sleep", clock.sleep)
+    monkeypatch.setattr(llm_gateway, "_buckets", {"requests": TokenBucket(), "tokens": TokenBucket()})
+    monkeypatch.setattr(llm_gateway, "_paused_until", 0.0)
+    monkeypatch.setattr(llm_gateway, "_stats", dict.fromkeys(llm_gateway._stats, 0))
+    monkeypatch.setattr(llm_gateway, "LLM_MAX_RETRIES", 2)
+    monkeypatch.setattr(llm_gateway, "_backoff", lambda attempt: 0.5 * 2 ** attempt)
+    return clock
+
+
+def call(clock: FakeClock, provider: FakeProvider, deadline_secs: float = 1000):
+    async def run():
+        asyncio.get_running_loop().time = clock.time
+        return await llm_gateway._call_with_retries(provider.complete, PARAMS, "chat", clock.now + deadline_secs)
+    return asyncio.run(run())
+
+
+def test_priority_waiters_are_served_first():
+    async def run():
+        slots = PrioritySemaphore(1)
+        await slots.acquire(1)
+        served = []
+
+        async def wait(name, priority):
+            await slots.acquire(priority)
+            served.append(name)
+
+        tasks = [asyncio.create_task(wait(name, priority))
+                 for name, priority in [("summary", 2), ("quiz", 1), ("chat-1", 0), ("chat-2", 0)]]
+        await asyncio.sleep(0)
+        assert slots.waiting == 4
+        for _ in tasks:
+            slots.release()
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        return served
+
+    assert asyncio.run(run()) == ["chat-1", "chat-2", "quiz", "summary"]
+
+
+def test_cancelled_waiter_does_not_keep_the_slot():
+    async def run():
+        slots = PrioritySemaphore(1)
+        await slots.acquire(0)
+        waiter = asyncio.create_task(slots.acquire(0))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        slots.release()
+        await asyncio.wait_for(slots.acquire(1), 1)
+
+    asyncio.run(run())
+
+
+def test_bucket_is_unlimited_until_synced():
+    assert TokenBucket().take(1_000_000, now=0.0) == 0.0
+
+
+def test_bucket_blocks_until_refill():
+    bucket = TokenBucket()
+    bucket.sync(limit=10, remaining=1, reset_secs=9, now=100.0)  # refills 1 per second
+    assert bucket.take(1, now=100.0) == 0.0
+    assert bucket.take(1, now=100.0) == pytest.approx(1.0)
+    assert bucket.take(1, now=100.5) == pytest.approx(0.5)
+    assert bucket.take(1, now=101.0) == 0.0
+    assert bucket.take(3, now=131.0) == 0.0  # capped at the limit, not 31 tokens
+    assert bucket.take(8, now=131.0) == pytest.approx(1.0)
+
+
+def test_transient_failure_is_retried(clock):
+    provider = FakeProvider(ProviderError("bad gateway", status=502), "Hello")
+    assert call(clock, provider) == ("Hello", {})
+    assert provider.calls == 2
+    assert clock.sleeps == [0.5]
+
+
+def test_retries_stop_at_the_limit(clock):
+    provider = FakeProvider(ProviderError("unavailable", status=503))
+    with pytest.raises(LLMError) as raised:
+        call(clock, provider)
+    assert provider.calls == 3  # the first attempt and LLM_MAX_RETRIES retries
+    assert clock.sleeps == [0.5, 1.0]
+    assert raised.value.status_code == 503
+    assert llm_gateway._stats["failures"] == 1
+
+
+def test_rate_limit_waits_out_retry_after(clock):
+    provider = FakeProvider(ProviderError("slow down", status=429, retry_after=3.0))
+    with pytest.raises(LLMError) as raised:
+        call(clock, provider)
+    assert provider.calls == 3
+    assert clock.sleeps == [3.0, 3.0]
+    assert raised.value.status_code == 429 and raised.value.retry_after == 3.0
+
+
+@pytest.mark.parametrize("status", [400, 401, 404, 422])
+def test_non_retryable_status_propagates(clock, status):
+    provider = FakeProvider(ProviderError("rejected", status=status))
+    with pytest.raises(LLMError) as raised:
+        call(clock, provider)
+    assert provider.calls == 1
+    assert clock.sleeps == []
+    assert raised.value.status_code == 502
+
+
+def test_retry_past_the_deadline_gives_up(clock):
+    provider = FakeProvider(ProviderError("slow down", status=429, retry_after=30.0))
+    with pytest.raises(LLMError) as raised:
+        call(clock, provider, deadline_secs=10)
+    assert provider.calls == 1
+    assert raised.value.status_code == 429
+
+
+def test_call_waits_for_an_exhausted_quota_to_refill(clock):
+    async def run():
+        asyncio.get_running_loop().time = clock.time
+        llm_gateway._sync_quota({"x-ratelimit-limit-requests": "30", "x-ratelimit-remaining-requests": "0",
+                                 "x-ratelimit-reset-requests": "2s"})  # refills 15 requests per second
+        return await llm_gateway._call_with_retries(FakeProvider("Hello").complete, PARAMS, "chat", 1000)
+
+    assert asyncio.run(run()) == ("Hello", {})
+    assert clock.sleeps == [pytest.approx(1 / 15)]
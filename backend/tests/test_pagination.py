@@ -0,0 +1,34 @@
+import base64
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from utils.pagination import encode_cursor, decode_cursor
+
+
+def _cursor(raw: str) -> str:
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def test_round_trip():
+    row = {"created_at": datetime(2026, 3, 1, 12, 30, 5, 123456, tzinfo=timezone.utc), "id": uuid.uuid4()}
+    assert decode_cursor(encode_cursor(row)) == (str(row["created_at"]), str(row["id"]))
+
+
+def test_cursor_is_url_safe_without_padding():
+    cursor = encode_cursor({"created_at": datetime(2026, 3, 1, tzinfo=timezone.utc), "id": uuid.uuid4()})
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not base64!",
+    _cursor("no separator"),
+    _cursor(f"yesterday|{uuid.uuid4()}"),
+    _cursor("2026-03-01 12:00:00+00:00|not-a-uuid"),
+    base64.urlsafe_b64encode(b"\xff\xfe|\x00").decode(),
+])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
@@ -0,0 +1,30 @@
+import pytest
+
+from utils.rank_fusion import reciprocal_rank_fusion
+
+
+def test_scores_sum_weighted_reciprocal_ranks():
+    fused = dict(reciprocal_rank_fusion([(["a", "b"], 1.0), (["b", "c"], 0.5)], k=60))
+    assert fused["a"] == pytest.approx(1 / 61)
+    assert fused["b"] == pytest.approx(1 / 62 + 0.5 / 61)
+    assert fused["c"] == pytest.approx(0.5 / 62)
+
+
+def test_keys_found_by_both_rankings_come_first():
+    fused = reciprocal_rank_fusion([(["a", "b", "c"], 1.0), (["c", "d"], 1.0)])
+    assert [key for key, _ in fused] == ["c", "a", "b", "d"]
+
+
+def test_weight_decides_between_rankings():
+    vector, lexical = ["v1", "v2"], ["l1", "l2"]
+    assert reciprocal_rank_fusion([(vector, 0.6), (lexical, 0.4)])[0][0] == "v1"
+    assert reciprocal_rank_fusion([(vector, 0.4), (lexical, 0.6)])[0][0] == "l1"
+
+
+def test_zero_weight_ranking_is_ignored():
+    assert reciprocal_rank_fusion([(["a"], 1.0), (["b"], 0.0)]) == [("a", pytest.approx(1 / 61))]
+
+
+def test_empty():
+    assert reciprocal_rank_fusion([]) == []
+    assert reciprocal_rank_fusion([([], 1.0)]) == []
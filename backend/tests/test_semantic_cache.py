@@ -0,0 +1,79 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from services import rag_service
+from utils import semantic_cache
+
+PASSAGES = {
+    "What is photosynthesis?": ["Plants turn light into sugar.", "Chlorophyll absorbs light."],
+    "Who discovered penicillin?": ["Fleming noticed mould killing bacteria."],
+}
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    """chat_with_rag over canned retrieval, a growing shared history and a counting fake LLM."""
+    history, llm_calls = [], []
+    vectors = {q: np.random.default_rng(i).standard_normal(8) for i, q in enumerate(PASSAGES)}
+
+    def retrieve_context(session_id, query, top_k, lexical_weight):
+        passages = PASSAGES.get(query, ["Something unrelated."])
+        vector = vectors.get(query, np.ones(8))
+        return vector.tolist(), [{"content": p, "similarity": 0.9} for p in passages]
+
+    async def build_messages(session_id, system_prompt, context_parts, user_message):
+        messages = [{"role": "system", "content": system_prompt}, *history, {"role": "user", "content": user_message}]
+        return messages, {"prompt_tokens": 100, "history_messages": len(history), "summarized": False}
+
+    async def stream(messages, **kwargs):
+        llm_calls.append(messages[-1]["content"])
+        yield f"Answer {len(llm_calls)}"
+
+    monkeypatch.setattr(rag_service, "retrieve_context", retrieve_context)
+    monkeypatch.setattr(rag_service.conversation_memory, "build_messages", build_messages)
+    monkeypatch.setattr(rag_service.llm_gateway, "stream", stream)
+    semantic_cache.invalidate("s1")
+
+    def ask(question: str) -> tuple[str, bool]:
+        async def run():
+            usage = {}
+            answer = "".join([d async for d in rag_service.chat_with_rag("s1", question, usage)])
+            return answer, usage["cached"]
+        answer, cached = asyncio.run(run())
+        history.extend([{"role": "user", "content": question}, {"role": "assistant", "content": answer}])
+        return answer, cached
+
+    yield ask, llm_calls
+    semantic_cache.invalidate("s1")
+
+
+def test_repeated_question_hits_despite_turns_in_between(chat):
+    ask, llm_calls = chat
+    first, cached = ask("What is photosynthesis?")
+    assert not cached
+    assert not ask("Who discovered penicillin?")[1]
+    again, cached = ask("What is photosynthesis?")
+    assert cached and again == first
+    assert llm_calls == ["What is photosynthesis?", "Who discovered penicillin?"]
+
+
+def test_follow_ups_are_neither_served_nor_stored(chat):
+    ask, llm_calls = chat
+    ask("What is photosynthesis?")
+    assert not ask("Explain that again")[1]
+    assert not ask("Explain that again")[1]
+    assert llm_calls.count("Explain that again") == 2
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("What is photosynthesis?", False),
+    ("Who discovered penicillin and when?", False),
+    ("Explain that again", True),
+    ("What about the second one?", True),
+    ("Can you elaborate on it?", True),
+    ("Why?", True),
+])
+def test_refers_back(question, expected):
+    assert semantic_cache.refers_back(question) is expected
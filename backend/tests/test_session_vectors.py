@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from utils import session_vectors
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    session_vectors.invalidate_all()
+    yield
+    session_vectors.invalidate_all()
+
+
+def load(session_id: str, load_token: int, rows: int = 2):
+    return session_vectors.put(session_id, [f"chunk {i}" for i in range(rows)], np.ones((rows, 4)), [0] * rows,
+                               load_token)
+
+
+def test_load_is_cached():
+    load("a", session_vectors.token("a"))
+    assert session_vectors.peek("a") is not None
+
+
+def test_load_overtaken_by_a_write_is_discarded():
+    load_token = session_vectors.token("a")
+    session_vectors.invalidate("a")
+    load("a", load_token)
+    assert session_vectors.peek("a") is None
+    load("a", session_vectors.token("a"))
+    assert session_vectors.peek("a") is not None
+
+
+def test_writes_to_other_sessions_dont_discard_a_load():
+    load_token = session_vectors.token("a")
+    session_vectors.invalidate("b")
+    load("a", load_token)
+    assert session_vectors.peek("a") is not None
+
+
+def test_write_history_is_bounded_and_stays_safe(monkeypatch):
+    monkeypatch.setattr(session_vectors, "WRITES_REMEMBERED", 3)
+    load_token = session_vectors.token("a")
+    session_vectors.invalidate("a")
+    for i in range(10):
+        session_vectors.invalidate(f"other {i}")
+    assert len(session_vectors._writes) == 3
+    load("a", load_token)  # its write was forgotten, so the load can't be trusted
+    assert session_vectors.peek("a") is None
+    load("a", session_vectors.token("a"))
+    assert session_vectors.peek("a") is not None
+
+
+def test_load_started_before_invalidate_all_is_discarded():
+    load_token = session_vectors.token("a")
+    session_vectors.invalidate_all()
+    load("a", load_token)
+    assert session_vectors.peek("a") is None
+
+
+def test_too_large_sessions_are_bounded(monkeypatch):
+    monkeypatch.setattr(session_vectors, "TOO_LARGE_REMEMBERED", 2)
+    for session_id in ("a", "b", "c"):
+        session_vectors.mark_too_large(session_id)
+    assert session_vectors.is_cacheable("a")  # forgotten first
+    assert not session_vectors.is_cacheable("b") and not session_vectors.is_cacheable("c")
+    session_vectors.invalidate("c")  # new chunks: worth another try
+    assert session_vectors.is_cacheable("c")
@@ -0,0 +1,74 @@
+import asyncio
+import zlib
+
+import numpy as np
+import pytest
+
+from services import study_generation
+
+SECTIONS = [("Section about cells.", 0.5), ("Section about orbits.", 0.5)]
+
+
+@pytest.fixture
+def generation(monkeypatch):
+    """Map-reduce generation over two sections, with a switch to make the second one fail."""
+    stored, failing = [], set()
+
+    async def generate(section, quota):
+        if section in failing:
+            raise RuntimeError("rate limited")
+        return [{"question": f"{section} #{i}"} for i in range(quota)]
+
+    async def stream(section, quota):
+        for item in await generate(section, quota):
+            yield item
+
+    async def lookup(key):
+        return None
+
+    async def store(key, kind, items):
+        stored.append(items)
+
+    def encode_batch(texts):
+        return np.array([np.random.default_rng(zlib.crc32(t.encode())).standard_normal(8) for t in texts])
+
+    monkeypatch.setattr(study_generation, "GENERATION_MODE", "map_reduce")
+    monkeypatch.setattr(study_generation, "select_sections", lambda session_id, text: SECTIONS)
+    monkeypatch.setattr(study_generation, "encode_batch", encode_batch)
+    monkeypatch.setattr(study_generation, "_KINDS", {"quiz": (generate, "question")})
+    monkeypatch.setattr(study_generation, "_STREAMS", {"quiz": stream})
+    monkeypatch.setattr(study_generation.generation_cache, "lookup", lookup)
+    monkeypatch.setattr(study_generation.generation_cache, "store", store)
+    return stored, failing
+
+
+def collect(stream) -> list[dict]:
+    async def run():
+        return [item async for item in stream]
+    return asyncio.run(run())
+
+
+def test_complete_generation_is_cached(generation):
+    stored, _ = generation
+    items, cached = asyncio.run(study_generation._generate_cached("quiz", "s1", "text", 4, False))
+    assert not cached and len(items) == 4
+    assert stored == [items]
+
+
+def test_generation_with_a_failed_section_is_not_cached(generation):
+    stored, failing = generation
+    failing.add(SECTIONS[1][0])
+    items, _ = asyncio.run(study_generation._generate_cached("quiz", "s1", "text", 4, False))
+    assert items and all("cells" in item["question"] for item in items)
+    assert stored == []
+
+
+def test_streamed_generation_is_cached_only_without_failures(generation):
+    stored, failing = generation
+    items = collect(study_generation._stream_cached("quiz", "s1", "text", 4, False, None))
+    assert stored == [items]
+
+    stored.clear()
+    failing.add(SECTIONS[1][0])
+    assert collect(study_generation._stream_cached("quiz", "s1", "text", 4, False, None))
+    assert stored == []
@@ -0,0 +1,25 @@
+import pytest
+
+from utils import vector_index
+
+
+@pytest.mark.parametrize("setting, version, resolved", [
+    ("auto", "0.8.0", "iterative"),
+    ("auto", "0.7.4", "exact"),
+    ("iterative", "0.6.2", "exact"),
+    ("iterative", "0.8.1", "iterative"),
+    ("exact", "0.8.1", "exact"),
+])
+def test_session_scan_follows_the_installed_pgvector(monkeypatch, setting, version, resolved):
+    monkeypatch.setattr(vector_index, "VECTOR_SESSION_SCAN", setting)
+    vector_index.check_extension(version)
+    assert vector_index.VECTOR_SESSION_SCAN == resolved
+
+
+def test_ann_index_is_only_built_for_iterative_scans(monkeypatch):
+    monkeypatch.setattr(vector_index, "VECTOR_SESSION_SCAN", "exact")
+    assert vector_index.desired_index(100_000, "hnsw") is None
+    assert vector_index.search_settings("hnsw") == ["SET LOCAL enable_indexscan = off"]
+    monkeypatch.setattr(vector_index, "VECTOR_SESSION_SCAN", "iterative")
+    assert vector_index.desired_index(100_000, "hnsw")["kind"] == "hnsw"
+    assert "SET LOCAL hnsw.iterative_scan = strict_order" in vector_index.search_settings("hnsw")
@@ -0,0 +1,46 @@
+import os
+import threading
+from collections import OrderedDict
+
+# Per-session quiz answer keys (question id -> correct answer and explanation), so
+# grading a click is a dict lookup. Questions are never edited, so an entry can only
+# be missing questions saved by another process; callers fall back to the DB for those.
+ANSWER_KEY_CACHE_SESSIONS = int(os.getenv("ANSWER_KEY_CACHE_SESSIONS", "1024"))  # 0 disables the cache
+
+_keys: OrderedDict[str, dict[str, dict]] = OrderedDict()  # least recently used first
+_lock = threading.Lock()
+
+
+def get(session_id: str) -> dict[str, dict] | None:
+    with _lock:
+        key = _keys.get(session_id)
+        if key is not None:
+            _keys.move_to_end(session_id)
+        return key
+
+
+def lookup(session_id: str, question_id: str) -> dict | None:
+    key = get(session_id)
+    return key.get(question_id) if key is not None else None
+
+
+def put(session_id: str, answers: dict[str, dict]):
+    """Cache a session's complete answer key, replacing any previous entry."""
+    if ANSWER_KEY_CACHE_SESSIONS <= 0:
+        return
+    with _lock:
+        _keys[session_id] = answers
+        _keys.move_to_end(session_id)
+        while len(_keys) > ANSWER_KEY_CACHE_SESSIONS:
+            _keys.popitem(last=False)
+
+
+def merge(session_id: str, answers: dict[str, dict]):
+    """Add newly saved questions to a session's entry, starting one if it is not cached."""
+    if ANSWER_KEY_CACHE_SESSIONS <= 0:
+        return
+    with _lock:
+        _keys[session_id] = {**_keys.get(session_id, {}), **answers}
+        _keys.move_to_end(session_id)
+        while len(_keys) > ANSWER_KEY_CACHE_SESSIONS:
+            _keys.popitem(last=False)
@@ -0,0 +1,61 @@
+import io
+import struct
+import uuid
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+# Binary COPY: header signature + flags + header-extension length, and the end-of-data marker
+COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+COPY_TRAILER = struct.pack("!h", -1)
+
+
+def vector_binary(values) -> bytes:
+    """pgvector's binary wire format: int16 dim, int16 unused, then big-endian float4s."""
+    array = np.asarray(values, dtype=">f4").ravel()
+    return struct.pack("!hh", len(array), 0) + array.tobytes()
+
+
+# Column type -> encoder to that type's binary send/recv format
+ENCODERS = {
+    "uuid": lambda value: uuid.UUID(str(value)).bytes,
+    "text": lambda value: value.encode(),
+    "int4": lambda value: struct.pack("!i", value),
+    "vector": vector_binary,
+}
+
+
+def encode_copy(types: list[str], rows) -> bytes:
+    """A complete binary COPY stream for `rows`, whose values match `types` in order."""
+    encoders = [ENCODERS[t] for t in types]
+    field_count = struct.pack("!h", len(types))
+    buf = io.BytesIO()
+    buf.write(COPY_HEADER)
+    for row in rows:
+        buf.write(field_count)
+        for encode, value in zip(encoders, row):
+            if value is None:
+                buf.write(b"\xff\xff\xff\xff")
+                continue
+            data = encode(value)
+            buf.write(struct.pack("!i", len(data)))
+            buf.write(data)
+    buf.write(COPY_TRAILER)
+    return buf.getvalue()
+
+
+def copy_binary(cur, table: str, columns: list[str], types: list[str], rows) -> int:
+    """COPY rows into `table` in binary format. Returns the bytes sent."""
+    data = encode_copy(types, rows)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT binary)", io.BytesIO(data))
+    return len(data)
+
+
+def insert_returning(cur, sql: str, rows: list[tuple], template: str | None = None) -> list[tuple]:
+    """
+    One multi-row `INSERT ... VALUES %s RETURNING ...` for all rows, instead of a
+    round trip per row. Returned rows come back in insertion order.
+    """
+    if not rows:
+        return []
+    return execute_values(cur, sql, rows, template=template, page_size=len(rows), fetch=True)
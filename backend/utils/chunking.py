@@ -0,0 +1,126 @@
+import os
+import re
+from typing import Iterable, Iterator
+
+from utils.embeddings import get_model
+
+# Text is split on paragraph and sentence boundaries and packed into small "child"
+# chunks sized by the encoder's own tokenizer, so nothing is cut off at embed time.
+# Children are what gets embedded and retrieved; consecutive children are grouped
+# into "parent" windows, and chat context is built from the parents of the hits.
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "128"))  # per child chunk, capped at the encoder's input limit
+PARENT_CHUNK_TOKENS = int(os.getenv("PARENT_CHUNK_TOKENS", "512"))  # per parent window
+
+# Changing either setting yields new ingest dedup keys (utils/ingest_cache.py)
+CHUNKER_ID = f"sentences:{CHUNK_TOKENS}:{PARENT_CHUNK_TOKENS}"
+
+TOKENS_PER_WORD = 1.3  # for progress estimates only
+MAX_CARRY_CHARS = 20000  # an unterminated sentence longer than this isn't held back for the next piece
+
+_PARAGRAPHS = re.compile(r"\n\s*\n")
+# After ., ! or ? (optionally closed by a quote or bracket), before something that starts a sentence
+_SENTENCE_BREAK = re.compile(r"(?:(?<=[.!?])|(?<=[.!?][\"')\]]))\s+(?=[\"'(\[]?[A-Z0-9])")
+
+
+def child_token_limit() -> int:
+    """Tokens per child chunk: CHUNK_TOKENS, or less if the encoder can't take that many."""
+    max_seq_length = getattr(get_model(), "max_seq_length", None)
+    if max_seq_length:
+        return min(CHUNK_TOKENS, max_seq_length - 2)  # room for [CLS] / [SEP]
+    return CHUNK_TOKENS
+
+
+def token_counts(texts: list[str]) -> list[int]:
+    """Encoder tokens in each text, counted in one batched tokenizer call."""
+    if not texts:
+        return []
+    ids = get_model().tokenizer(texts, add_special_tokens=False)["input_ids"]
+    return [len(i) for i in ids]
+
+
+def split_sentences(paragraph: str) -> list[str]:
+    """A paragraph's sentences, with line breaks and runs of whitespace collapsed."""
+    text = " ".join(paragraph.split())
+    return [s for s in _SENTENCE_BREAK.split(text) if s] if text else []
+
+
+def chunk_text(text: str) -> list[dict]:
+    """Split text into child chunks: [{content, parent}] in document order."""
+    return list(iter_chunks([text]))
+
+
+def iter_chunks(pieces: Iterable[str]) -> Iterator[dict]:
+    """
+    Lazily split a stream of text pieces (e.g. PDF pages) into child chunks,
+    yielding {content, parent}, where `parent` numbers the parent window.
+    A sentence cut off at the end of a piece is completed from the next one.
+    """
+    packer = _Packer(child_token_limit(), PARENT_CHUNK_TOKENS)
+    carry = ""
+    for piece in pieces:
+        paragraphs = _PARAGRAPHS.split(f"{carry} {piece}" if carry else piece)
+        for paragraph in paragraphs[:-1]:
+            yield from packer.add(split_sentences(paragraph), paragraph_end=True)
+        sentences = split_sentences(paragraphs[-1])
+        carry = sentences.pop() if sentences else ""
+        if len(carry) > MAX_CARRY_CHARS:
+            sentences.append(carry)
+            carry = ""
+        yield from packer.add(sentences, paragraph_end=False)
+    yield from packer.add(split_sentences(carry), paragraph_end=True)
+    yield from packer.flush()
+
+
+def estimate_chunk_count(word_count: int) -> int:
+    """Rough number of child chunks iter_chunks() produces for `word_count` words (for progress)."""
+    return max(1, round(word_count * TOKENS_PER_WORD / (CHUNK_TOKENS * 0.85)))
+
+
+class _Packer:
+    """Packs sentences into child chunks of at most `limit` tokens and numbers their parents."""
+
+    def __init__(self, limit: int, parent_limit: int):
+        self.limit = limit
+        self.parent_limit = parent_limit
+        self.sentences: list[str] = []
+        self.tokens = 0
+        self.parent = 0
+        self.parent_tokens = 0
+
+    def add(self, sentences: list[str], paragraph_end: bool) -> Iterator[dict]:
+        for sentence, tokens in self._fitted(sentences):
+            if self.tokens + tokens > self.limit:
+                yield from self.flush()
+            self.sentences.append(sentence)
+            self.tokens += tokens
+        # Prefer to end a chunk with its paragraph, unless it would be very short
+        if paragraph_end and self.tokens >= self.limit // 2:
+            yield from self.flush()
+
+    def flush(self) -> Iterator[dict]:
+        if not self.sentences:
+            return
+        if self.parent_tokens and self.parent_tokens + self.tokens > self.parent_limit:
+            self.parent += 1
+            self.parent_tokens = 0
+        yield {"content": " ".join(self.sentences), "parent": self.parent}
+        self.parent_tokens += self.tokens
+        self.sentences = []
+        self.tokens = 0
+
+    def _fitted(self, sentences: list[str]) -> Iterator[tuple[str, int]]:
+        """(text, tokens) pairs, with sentences over the limit split at word boundaries."""
+        for sentence, tokens in zip(sentences, token_counts(sentences)):
+            if tokens <= self.limit:
+                yield sentence, tokens
+                continue
+            words = sentence.split(" ")
+            piece, piece_tokens = [], 0
+            for word, word_tokens in zip(words, token_counts(words)):
+                if piece and piece_tokens + word_tokens > self.limit:
+                    yield " ".join(piece), piece_tokens
+                    piece, piece_tokens = [], 0
+                piece.append(word)
+                piece_tokens += word_tokens
+            if piece:
+                yield " ".join(piece), piece_tokens
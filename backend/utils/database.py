@@ -1,20 +1,157 @@
 import os
+import sys
+import json
+import time
 import asyncio
+import threading
+import contextvars
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import numpy as np
 import psycopg2
-from psycopg2.extras import execute_values
 from dotenv import load_dotenv
 from pathlib import Path
 
-# Force load .env from the backend folder regardless of where you run from
+from utils.db_pool import ConnectionPool, connect_kwargs
+from utils.bulk_write import copy_binary, insert_returning
+from utils.vector_index import INDEX_NAME, desired_index, needs_rebuild, index_ddl, search_settings, check_extension
+from utils import session_vectors, session_cache, answer_keys, metrics
+
+# Load .env from the backend folder regardless of where you run from; variables
+# already set in the environment (e.g. by the load test) take precedence
 env_path = Path(__file__).resolve().parent.parent / ".env"
-load_dotenv(dotenv_path=env_path, override=True)
+load_dotenv(dotenv_path=env_path)
 
 DATABASE_URL = os.getenv("DATABASE_URL")
-print(f"DEBUG: Connecting to → {DATABASE_URL}")  # temporary debug line
+
+
+# Connection pool settings (DB_POOL_MAX=0 disables pooling: one connection per call)
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
+DB_HEALTHCHECK_IDLE_SECS = float(os.getenv("DB_HEALTHCHECK_IDLE_SECS", "30"))
+
+# Sessions still hidden (being ingested) after this long belong to a crashed ingest and are deleted at startup
+INGEST_ABANDONED_SECS = float(os.getenv("INGEST_ABANDONED_SECS", str(6 * 3600)))
+
+# "zlib" stores new sessions' raw text compressed in sessions.raw_text_z instead of raw_text
+RAW_TEXT_COMPRESSION = os.getenv("RAW_TEXT_COMPRESSION", "none")
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+# Dedicated threads for DB calls, sized to the pool so they never wait on a connection
+# and never compete with embedding / LLM work in the default executor
+_db_executor = ThreadPoolExecutor(max_workers=max(DB_POOL_MAX, 1), thread_name_prefix="db")
+metrics.track_executor("db", _db_executor)
+metrics.Gauge("db_pool_connections_in_use", "Pooled connections currently borrowed",
+              function=lambda: _pool.stats()["in_use"] if _pool is not None else 0)
+
+
+class _TimedCursor(psycopg2.extensions.cursor):
+    """Records each statement in db_query_duration_seconds, labelled by the function in this module that ran it."""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            metrics.DB_QUERY_SECONDS.observe(time.perf_counter() - started, query=_caller())
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            metrics.DB_QUERY_SECONDS.observe(time.perf_counter() - started, query=_caller())
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            metrics.DB_QUERY_SECONDS.observe(time.perf_counter() - started, query=_caller())
+
+
+def _caller() -> str:
+    frame = sys._getframe(2)
+    while frame is not None:
+        if frame.f_globals.get("__name__") == __name__ and frame.f_code.co_name not in ("_run_cursor", "db_cursor"):
+            return frame.f_code.co_name
+        frame = frame.f_back
+    return "other"
 
 
 def get_connection():
-    return psycopg2.connect(DATABASE_URL)
+    """Open a dedicated, unpooled connection (schema setup, benchmarks)."""
+    return psycopg2.connect(DATABASE_URL, **connect_kwargs(DB_STATEMENT_TIMEOUT_MS))
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    DATABASE_URL,
+                    minconn=DB_POOL_MIN,
+                    maxconn=DB_POOL_MAX,
+                    statement_timeout_ms=DB_STATEMENT_TIMEOUT_MS,
+                    healthcheck_idle_secs=DB_HEALTHCHECK_IDLE_SECS,
+                )
+    return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+@contextmanager
+def db_cursor():
+    """
+    Borrow a connection and yield a cursor. The transaction is committed when the
+    block exits cleanly and rolled back otherwise, so the connection always goes
+    back to the pool idle.
+    """
+    if DB_POOL_MAX <= 0:
+        conn = get_connection()
+        try:
+            yield from _run_cursor(conn)
+        finally:
+            conn.close()
+        return
+
+    started = time.perf_counter()
+    with get_pool().connection() as conn:
+        metrics.DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - started)
+        yield from _run_cursor(conn)
+
+
+def _run_cursor(conn):
+    cur = conn.cursor(cursor_factory=_TimedCursor)
+    try:
+        yield cur
+        conn.commit()
+    except BaseException:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+async def run_db(fn, *args):
+    """Run a blocking database function on the DB executor and await its result."""
+    loop = asyncio.get_running_loop()
+    # Carry the caller's context (the current trace span) into the DB thread
+    return await loop.run_in_executor(_db_executor, contextvars.copy_context().run, fn, *args)
+
 
 async def init_db():
     """Initialize database tables and pgvector extension."""
@@ -41,24 +178,19 @@ def _init_db_sync():
             );
         """)
 
-        # Chunks table - stores text chunks with embeddings
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS chunks (
-                id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-                session_id UUID REFERENCES sessions(id) ON DELETE CASCADE,
-                content TEXT NOT NULL,
-                chunk_index INTEGER NOT NULL,
-                embedding vector(1536),
-                created_at TIMESTAMPTZ DEFAULT NOW()
-            );
-        """)
+        # Content hash of the ingested source, used to reuse chunks for identical uploads
+        cur.execute("ALTER TABLE sessions ADD COLUMN IF NOT EXISTS content_hash TEXT;")
+        cur.execute("CREATE INDEX IF NOT EXISTS sessions_content_hash_idx ON sessions (content_hash);")
 
-        # Create index for fast similarity search
-        cur.execute("""
-            CREATE INDEX IF NOT EXISTS chunks_embedding_idx
-            ON chunks USING ivfflat (embedding vector_cosine_ops)
-            WITH (lists = 100);
-        """)
+        # Optionally compressed raw text, and its word count so it needn't be read to report it
+        cur.execute("ALTER TABLE sessions ADD COLUMN IF NOT EXISTS raw_text_z BYTEA;")
+        cur.execute("ALTER TABLE sessions ADD COLUMN IF NOT EXISTS word_count INTEGER;")
+
+        # Per-session opt-out of the semantic chat answer cache
+        cur.execute("ALTER TABLE sessions ADD COLUMN IF NOT EXISTS answer_cache BOOLEAN NOT NULL DEFAULT TRUE;")
+
+        # FALSE while an ingest is still storing the session's chunks; such sessions are invisible
+        cur.execute("ALTER TABLE sessions ADD COLUMN IF NOT EXISTS ready BOOLEAN NOT NULL DEFAULT TRUE;")
 
         # Flashcards table
         cur.execute("""
@@ -95,6 +227,62 @@ def _init_db_sync():
             );
         """)
 
+        # Keyset pagination: newest sessions, and a session's newest messages
+        cur.execute("CREATE INDEX IF NOT EXISTS sessions_created_at_idx ON sessions (created_at DESC, id DESC);")
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS chat_messages_session_created_at_idx
+            ON chat_messages (session_id, created_at DESC, id DESC);
+        """)
+
+        # Background ingestion jobs (payload holds uploaded PDF bytes until the job finishes)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS ingest_jobs (
+                id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                source_type TEXT NOT NULL CHECK (source_type IN ('youtube', 'pdf')),
+                source_url TEXT NOT NULL,
+                payload BYTEA,
+                status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'done', 'failed')),
+                stage TEXT,
+                progress REAL NOT NULL DEFAULT 0,
+                result JSONB,
+                error TEXT,
+                created_at TIMESTAMPTZ DEFAULT NOW(),
+                updated_at TIMESTAMPTZ DEFAULT NOW()
+            );
+        """)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS ingest_jobs_unfinished_idx
+            ON ingest_jobs (created_at) WHERE status IN ('queued', 'running');
+        """)
+
+        # Generated flashcards / quizzes keyed by (text hash, type, count, model, prompt version)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS generation_cache (
+                cache_key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                items JSONB NOT NULL,
+                created_at TIMESTAMPTZ DEFAULT NOW()
+            );
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS generation_cache_created_at_idx ON generation_cache (created_at);")
+
+        # Rolling summary of each chat's older turns, up to the (created_at, id) of the last message it covers
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS chat_summaries (
+                session_id UUID PRIMARY KEY REFERENCES sessions(id) ON DELETE CASCADE,
+                summary TEXT NOT NULL,
+                covered_at TIMESTAMPTZ NOT NULL,
+                covered_id UUID NOT NULL,
+                updated_at TIMESTAMPTZ DEFAULT NOW()
+            );
+        """)
+
+        # Hidden sessions left behind by ingests that crashed (live ones are much younger)
+        cur.execute(
+            "DELETE FROM sessions WHERE NOT ready AND created_at < NOW() - make_interval(secs => %s)",
+            (INGEST_ABANDONED_SECS,)
+        )
+
         conn.commit()
         print("✅ Database initialized successfully")
     except Exception as e:
@@ -106,181 +294,791 @@ def _init_db_sync():
         conn.close()
 
 
-def store_chunks_with_embeddings(session_id: str, chunks: list[dict]):
-    """Store text chunks with their embeddings in the database."""
+def init_embedding_schema():
+    """
+    Create the chunks table and reconcile it with the embedding model. Needs the
+    model's dimension, so it runs once the model is loaded (services/warmup.py).
+
+    Adding a stored column or changing the model rewrites chunks under an ACCESS
+    EXCLUSIVE lock (chat and ingest wait for it), which can take minutes on a large
+    table, so this runs on its own connection without the statement timeout.
+    """
+    from utils.embeddings import MODEL_ID, embedding_dim
+
+    dim = embedding_dim()
     conn = get_connection()
     cur = conn.cursor()
     try:
-        values = [
-            (session_id, chunk["content"], chunk["index"], chunk["embedding"])
-            for chunk in chunks
-        ]
-        execute_values(
-            cur,
-            """INSERT INTO chunks (session_id, content, chunk_index, embedding)
-               VALUES %s""",
-            values,
-            template="(%s, %s, %s, %s::vector)"
-        )
+        cur.execute("SET statement_timeout = 0")
+        # Chunks table - stores text chunks with embeddings (dimension follows the embedding model)
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS chunks (
+                id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                session_id UUID REFERENCES sessions(id) ON DELETE CASCADE,
+                content TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                parent_index INTEGER,
+                embedding vector({dim}),
+                created_at TIMESTAMPTZ DEFAULT NOW()
+            );
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS chunks_session_id_idx ON chunks (session_id);")
+        # Full-text index for the lexical half of hybrid retrieval (adding it rewrites the table once).
+        # Columns are checked first: even a no-op ADD COLUMN IF NOT EXISTS takes the table lock
+        if not _has_column(cur, "chunks", "content_tsv"):
+            print("Adding chunks.content_tsv (rewrites the chunks table; chat and ingest wait until done)")
+            cur.execute("""
+                ALTER TABLE chunks ADD COLUMN IF NOT EXISTS content_tsv tsvector
+                GENERATED ALWAYS AS (to_tsvector('english', content)) STORED;
+            """)
+        cur.execute("CREATE INDEX IF NOT EXISTS chunks_content_tsv_idx ON chunks USING gin (content_tsv);")
+        # Parent window of each child chunk (NULL for chunks stored before parent windows existed)
+        if not _has_column(cur, "chunks", "parent_index"):
+            cur.execute("ALTER TABLE chunks ADD COLUMN IF NOT EXISTS parent_index INTEGER;")
+        _migrate_embedding_model(cur, MODEL_ID, dim)
+        cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        check_extension(cur.fetchone()[0])
         conn.commit()
+        # The ANN index itself is built / rebuilt by services/index_maintenance.py
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         cur.close()
         conn.close()
 
 
-def similarity_search(session_id: str, query_embedding: list[float], top_k: int = 5) -> list[dict]:
-    """Find most similar chunks to the query embedding."""
+def _has_column(cur, table: str, column: str) -> bool:
+    cur.execute(
+        """SELECT 1 FROM information_schema.columns
+           WHERE table_schema = current_schema() AND table_name = %s AND column_name = %s""",
+        (table, column)
+    )
+    return cur.fetchone() is not None
+
+
+def _migrate_embedding_model(cur, model_name: str, dim: int):
+    """
+    Record which model produced the stored embeddings. If the model (or its
+    dimension) changed, resize the column and clear the old vectors; the index
+    maintenance task re-embeds them from chunk content.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS vector_index_state (
+            table_name TEXT PRIMARY KEY,
+            model_name TEXT NOT NULL,
+            dim INTEGER NOT NULL,
+            index_spec JSONB,
+            rows_at_build BIGINT NOT NULL DEFAULT 0,
+            built_at TIMESTAMPTZ
+        );
+    """)
+    cur.execute(
+        "SELECT atttypmod FROM pg_attribute WHERE attrelid = 'chunks'::regclass AND attname = 'embedding'"
+    )
+    column_dim = cur.fetchone()[0]
+    cur.execute("SELECT model_name FROM vector_index_state WHERE table_name = 'chunks'")
+    row = cur.fetchone()
+
+    if column_dim != dim:
+        print(f"Embedding dimension changed ({column_dim} → {dim}); clearing embeddings for re-embedding")
+        cur.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+        cur.execute(f"ALTER TABLE chunks ALTER COLUMN embedding TYPE vector({dim}) USING NULL")
+        cur.execute("UPDATE vector_index_state SET index_spec = NULL WHERE table_name = 'chunks'")
+    elif row and row[0] != model_name:
+        print(f"Embedding model changed ({row[0]} → {model_name}); clearing embeddings for re-embedding")
+        cur.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+        cur.execute("UPDATE chunks SET embedding = NULL")
+        cur.execute("UPDATE vector_index_state SET index_spec = NULL WHERE table_name = 'chunks'")
+
+    cur.execute(
+        """INSERT INTO vector_index_state (table_name, model_name, dim) VALUES ('chunks', %s, %s)
+           ON CONFLICT (table_name) DO UPDATE SET model_name = EXCLUDED.model_name, dim = EXCLUDED.dim""",
+        (model_name, dim)
+    )
+
+
+def ensure_vector_index() -> str:
+    """
+    Create, rebuild or drop the ANN index on chunks.embedding so it matches the
+    configured kind / parameters and the current table size. Builds run
+    CONCURRENTLY under a temporary name and are swapped in, so searches keep
+    working meanwhile. Returns a short description of what was done.
+    """
     conn = get_connection()
+    conn.autocommit = True
     cur = conn.cursor()
     try:
+        # One builder at a time across processes
+        cur.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (INDEX_NAME,))
+        if not cur.fetchone()[0]:
+            return "busy"
+        cur.execute("SET statement_timeout = 0")
+        cur.execute("SELECT count(*) FROM chunks WHERE embedding IS NOT NULL")
+        row_count = cur.fetchone()[0]
+        cur.execute("SELECT index_spec, rows_at_build FROM vector_index_state WHERE table_name = 'chunks'")
+        state = cur.fetchone()
+        current, rows_at_build = (state[0], state[1]) if state else (None, 0)
+        cur.execute("SELECT 1 FROM pg_indexes WHERE indexname = %s", (INDEX_NAME,))
+        exists = cur.fetchone() is not None
+
+        desired = desired_index(row_count)
+        if desired is None:
+            if exists:  # including one created by setup.sql
+                cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}")
+                cur.execute("UPDATE vector_index_state SET index_spec = NULL WHERE table_name = 'chunks'")
+                return "dropped"
+            return "none"
+        if exists and not needs_rebuild(current, rows_at_build, desired, row_count):
+            return "ok"
+
+        tmp_name = f"{INDEX_NAME}_new"
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {tmp_name}")
+        cur.execute(index_ddl(desired, name=tmp_name))
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}")
+        cur.execute(f"ALTER INDEX {tmp_name} RENAME TO {INDEX_NAME}")
+        cur.execute(
+            """UPDATE vector_index_state SET index_spec = %s, rows_at_build = %s, built_at = NOW()
+               WHERE table_name = 'chunks'""",
+            (json.dumps(desired), row_count)
+        )
+        return f"built {desired} over {row_count} rows"
+    finally:
+        cur.close()
+        conn.close()  # also releases the advisory lock
+
+
+def get_chunks_missing_embeddings(limit: int) -> list[tuple[str, str]]:
+    with db_cursor() as cur:
+        cur.execute("SELECT id, content FROM chunks WHERE embedding IS NULL LIMIT %s", (limit,))
+        return [(str(r[0]), r[1]) for r in cur.fetchall()]
+
+
+CHUNK_COLUMNS = (
+    ["session_id", "content", "chunk_index", "parent_index", "embedding"],
+    ["uuid", "text", "int4", "int4", "vector"],
+)
+
+
+def update_chunk_embeddings(rows: list[tuple[str, list[float]]]):
+    """Set embeddings by chunk id: binary COPY into a temp table, then one joined UPDATE."""
+    with db_cursor() as cur:
+        cur.execute("CREATE TEMP TABLE chunk_embeddings_in (id UUID, embedding vector) ON COMMIT DROP")
+        copy_binary(cur, "chunk_embeddings_in", ["id", "embedding"], ["uuid", "vector"], rows)
+        cur.execute(
+            """UPDATE chunks AS c SET embedding = v.embedding
+               FROM chunk_embeddings_in AS v WHERE c.id = v.id"""
+        )
+    session_vectors.invalidate_all()
+
+
+def store_chunks_with_embeddings(session_id: str, chunks: list[dict]):
+    """Store text chunks with their embeddings in the database."""
+    with db_cursor() as cur:
+        copy_binary(cur, "chunks", *CHUNK_COLUMNS, (
+            (session_id, chunk["content"], chunk["index"], chunk.get("parent"), chunk["embedding"])
+            for chunk in chunks
+        ))
+    session_vectors.invalidate(session_id)
+
+
+def create_pending_session(title: str, source_type: str, source_url: str, content_hash: str | None) -> str:
+    """
+    Insert a session that stays hidden (ready = FALSE) while an ingest stores its
+    chunks batch by batch with store_chunk_batch(). finish_session() makes it
+    visible; delete_session() drops it if the ingest fails.
+    """
+    with db_cursor() as cur:
+        cur.execute(
+            """INSERT INTO sessions (title, source_type, source_url, content_hash, ready)
+               VALUES (%s, %s, %s, %s, FALSE) RETURNING id""",
+            (title, source_type, source_url, content_hash)
+        )
+        return str(cur.fetchone()[0])
+
+
+def store_chunk_batch(session_id: str, chunks: list[dict], embeddings, start_index: int) -> int:
+    """COPY one batch of chunks ({content, parent}) and their embeddings, in its own short transaction."""
+    with db_cursor() as cur:
+        copy_binary(cur, "chunks", *CHUNK_COLUMNS, (
+            (session_id, chunk["content"], start_index + i, chunk.get("parent"), embedding)
+            for i, (chunk, embedding) in enumerate(zip(chunks, embeddings))
+        ))
+    return len(chunks)
+
+
+def finish_session(session_id: str, raw_text: str):
+    """Store a pending session's raw text and make it visible."""
+    with db_cursor() as cur:
+        cur.execute(
+            "UPDATE sessions SET raw_text = %s, raw_text_z = %s, word_count = %s, ready = TRUE WHERE id = %s",
+            (*_text_columns(raw_text), session_id)
+        )
+    session_vectors.invalidate(session_id)
+
+
+def delete_session(session_id: str):
+    """Delete a session with its chunks (e.g. a pending one whose ingest failed)."""
+    with db_cursor() as cur:
+        cur.execute("DELETE FROM sessions WHERE id = %s", (session_id,))
+    session_cache.invalidate(session_id)
+    session_vectors.invalidate(session_id)
+
+
+def similarity_search(session_id: str, query_embedding: list[float], top_k: int = 5) -> list[dict]:
+    """Find most similar chunks to the query embedding, as {content, similarity, parent}."""
+    with db_cursor() as cur:
+        for setting in search_settings():
+            cur.execute(setting)
         cur.execute("""
-            SELECT content, 1 - (embedding <=> %s::vector) AS similarity
+            SELECT content, 1 - (embedding <=> %s::vector) AS similarity, parent_index
             FROM chunks
-            WHERE session_id = %s
+            WHERE session_id = %s AND embedding IS NOT NULL
             ORDER BY embedding <=> %s::vector
             LIMIT %s
         """, (query_embedding, session_id, query_embedding, top_k))
         rows = cur.fetchall()
-        return [{"content": row[0], "similarity": row[1]} for row in rows]
-    finally:
-        cur.close()
-        conn.close()
+        return [{"content": row[0], "similarity": row[1], "parent": row[2]} for row in rows]
+
+
+# Any of the question's terms may match; plainto_tsquery alone would require all of them
+_TERMS_SQL = "(SELECT replace(plainto_tsquery('english', %(text)s)::text, '&', '|')::tsquery AS terms) AS q"
+
+
+def hybrid_candidates(session_id: str, query_embedding, query_text: str, limit: int) -> dict[str, list[dict]]:
+    """
+    Vector and full-text candidates for a query in one round trip:
+    {"vector": [...], "lexical": [...]}, each best first, as {content, similarity, parent}.
+    """
+    params = {"embedding": query_embedding, "text": query_text, "session_id": session_id, "limit": limit}
+    with db_cursor() as cur:
+        for setting in search_settings():
+            cur.execute(setting)
+        cur.execute(f"""
+            (SELECT 'vector', content, 1 - (embedding <=> %(embedding)s::vector), parent_index,
+                    embedding <=> %(embedding)s::vector
+             FROM chunks
+             WHERE session_id = %(session_id)s AND embedding IS NOT NULL
+             ORDER BY embedding <=> %(embedding)s::vector
+             LIMIT %(limit)s)
+            UNION ALL
+            (SELECT 'lexical', content, 1 - (embedding <=> %(embedding)s::vector), parent_index,
+                    -ts_rank_cd(content_tsv, terms)
+             FROM chunks, {_TERMS_SQL}
+             WHERE session_id = %(session_id)s AND embedding IS NOT NULL AND content_tsv @@ terms
+             ORDER BY ts_rank_cd(content_tsv, terms) DESC
+             LIMIT %(limit)s)
+        """, params)
+        rows = cur.fetchall()
+    return _split_candidates(rows)
+
+
+def lexical_candidates(session_id: str, query_text: str, limit: int) -> list[str]:
+    """Chunk texts matching the query's terms, best first (the vector half is served from memory)."""
+    with db_cursor() as cur:
+        cur.execute(f"""
+            SELECT content FROM chunks, {_TERMS_SQL}
+            WHERE session_id = %(session_id)s AND embedding IS NOT NULL AND content_tsv @@ terms
+            ORDER BY ts_rank_cd(content_tsv, terms) DESC
+            LIMIT %(limit)s
+        """, {"text": query_text, "session_id": session_id, "limit": limit})
+        return [row[0] for row in cur.fetchall()]
+
+
+def _split_candidates(rows) -> dict[str, list[dict]]:
+    # UNION ALL doesn't promise to keep each branch's order, so sort on the returned score
+    ranked = {"vector": [], "lexical": []}
+    for source, content, similarity, parent, order in sorted(rows, key=lambda r: r[4]):
+        ranked[source].append({"content": content, "similarity": similarity, "parent": parent})
+    return ranked
+
+
+def get_session_chunk_vectors(session_id: str, limit: int) -> tuple[list[str], np.ndarray, list[int | None]] | None:
+    """
+    All of a session's embedded chunks as (texts, float32 matrix, parent indexes)
+    for the in-process vector cache, or None if the session has more than `limit` of them.
+    """
+    with db_cursor() as cur:
+        cur.execute("""
+            SELECT content, embedding::real[], parent_index
+            FROM chunks
+            WHERE session_id = %s AND embedding IS NOT NULL
+            ORDER BY chunk_index
+            LIMIT %s
+        """, (session_id, limit + 1))
+        rows = cur.fetchall()
+    if len(rows) > limit:
+        return None
+    matrix = np.array([row[1] for row in rows], dtype=np.float32) if rows else np.empty((0, 0), dtype=np.float32)
+    return [row[0] for row in rows], matrix, [row[2] for row in rows]
+
+
+def get_parent_windows(session_id: str, parents: list[int]) -> dict[int, str]:
+    """Text of the given parent windows: their child chunks joined in order."""
+    if not parents:
+        return {}
+    with db_cursor() as cur:
+        cur.execute("""
+            SELECT parent_index, string_agg(content, ' ' ORDER BY chunk_index)
+            FROM chunks
+            WHERE session_id = %s AND parent_index = ANY(%s)
+            GROUP BY parent_index
+        """, (session_id, list(parents)))
+        return dict(cur.fetchall())
 
 
-def create_session(title: str, source_type: str, source_url: str, raw_text: str) -> str:
+def create_session(title: str, source_type: str, source_url: str, raw_text: str,
+                   content_hash: str | None = None) -> str:
     """Create a new session and return its ID."""
-    conn = get_connection()
-    cur = conn.cursor()
-    try:
+    with db_cursor() as cur:
         cur.execute(
-            """INSERT INTO sessions (title, source_type, source_url, raw_text)
-               VALUES (%s, %s, %s, %s) RETURNING id""",
-            (title, source_type, source_url, raw_text)
+            """INSERT INTO sessions (title, source_type, source_url, raw_text, raw_text_z, word_count, content_hash)
+               VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id""",
+            (title, source_type, source_url, *_text_columns(raw_text), content_hash)
         )
         session_id = str(cur.fetchone()[0])
-        conn.commit()
         return session_id
-    finally:
-        cur.close()
-        conn.close()
 
 
-def get_session(session_id: str) -> dict | None:
-    conn = get_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute("SELECT id, title, source_type, source_url, raw_text, created_at FROM sessions WHERE id = %s", (session_id,))
+def find_session_by_content_hash(content_hash: str) -> dict | None:
+    """Most recent fully ingested session (chunks stored) with the given content hash."""
+    with db_cursor() as cur:
+        cur.execute(
+            """SELECT s.id, s.title FROM sessions s
+               WHERE s.content_hash = %s AND s.ready
+                 AND EXISTS (SELECT 1 FROM chunks c WHERE c.session_id = s.id)
+               ORDER BY s.created_at DESC LIMIT 1""",
+            (content_hash,)
+        )
         row = cur.fetchone()
         if not row:
             return None
-        return {"id": str(row[0]), "title": row[1], "source_type": row[2], "source_url": row[3], "raw_text": row[4], "created_at": str(row[5])}
-    finally:
-        cur.close()
-        conn.close()
+        return {"id": str(row[0]), "title": row[1]}
 
 
-def get_all_sessions() -> list[dict]:
-    conn = get_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute("SELECT id, title, source_type, source_url, created_at FROM sessions ORDER BY created_at DESC")
+def clone_session(source_session_id: str, source_url: str) -> dict:
+    """
+    Create a new session that reuses another session's text, chunks and embeddings.
+    Everything is copied server-side in one transaction, so no text or vectors
+    travel through Python. Returns {session_id, word_count, chunk_count}.
+    """
+    with db_cursor() as cur:
+        cur.execute(
+            """INSERT INTO sessions (title, source_type, source_url, raw_text, raw_text_z, word_count, content_hash)
+               SELECT title, source_type, %s, raw_text, raw_text_z, word_count, content_hash FROM sessions WHERE id = %s
+               RETURNING id, COALESCE(word_count, array_length(regexp_split_to_array(btrim(raw_text), '\\s+'), 1))""",
+            (source_url, source_session_id)
+        )
+        session_id, word_count = cur.fetchone()
+        cur.execute(
+            """INSERT INTO chunks (session_id, content, chunk_index, parent_index, embedding)
+               SELECT %s, content, chunk_index, parent_index, embedding FROM chunks WHERE session_id = %s""",
+            (session_id, source_session_id)
+        )
+        chunk_count = cur.rowcount
+    session_vectors.invalidate(str(session_id))
+    return {"session_id": str(session_id), "word_count": word_count or 0, "chunk_count": chunk_count}
+
+
+def get_session(session_id: str) -> dict | None:
+    """
+    Session metadata (no raw text), served from the in-process cache when possible.
+    Settings that can change (answer_cache) aren't included: other workers' caches
+    wouldn't see the change. Chat reads the flag with save_user_message().
+    """
+    meta = session_cache.get(session_id)
+    if meta is not None:
+        return meta
+    if not _is_uuid(session_id):
+        return None
+    with db_cursor() as cur:
+        cur.execute(
+            "SELECT id, title, source_type, source_url, created_at FROM sessions WHERE id = %s AND ready",
+            (session_id,)
+        )
+        row = cur.fetchone()
+    if not row:
+        return None
+    meta = {"id": str(row[0]), "title": row[1], "source_type": row[2], "source_url": row[3],
+            "created_at": str(row[4])}
+    session_cache.put(session_id, meta)
+    return meta
+
+
+def set_session_answer_cache(session_id: str, enabled: bool) -> dict | None:
+    """Opt a session in or out of the chat answer cache. Returns its metadata, or None if it doesn't exist."""
+    if not _is_uuid(session_id):
+        return None
+    with db_cursor() as cur:
+        cur.execute("UPDATE sessions SET answer_cache = %s WHERE id = %s AND ready", (enabled, session_id))
+        updated = cur.rowcount
+    meta = get_session(session_id) if updated else None
+    return {**meta, "answer_cache": enabled} if meta else None
+
+
+def session_exists(session_id: str) -> bool:
+    return get_session(session_id) is not None
+
+
+def get_session_text(session_id: str) -> str | None:
+    """The session's full raw text, for the generators that need it. None if the session doesn't exist."""
+    if not _is_uuid(session_id):
+        return None
+    with db_cursor() as cur:
+        cur.execute("SELECT raw_text, raw_text_z FROM sessions WHERE id = %s AND ready", (session_id,))
+        row = cur.fetchone()
+    if not row:
+        return None
+    raw_text, raw_text_z = row
+    if raw_text_z is not None:
+        return zlib.decompress(raw_text_z).decode()
+    return raw_text or ""
+
+
+def _text_columns(text: str) -> tuple[str | None, bytes | None, int]:
+    """(raw_text, raw_text_z, word_count) values to store for `text`."""
+    if RAW_TEXT_COMPRESSION == "zlib":
+        return None, zlib.compress(text.encode(), 6), len(text.split())
+    return text, None, len(text.split())
+
+
+def get_sessions_page(limit: int, after: tuple[str, str] | None = None) -> list[dict]:
+    """Up to `limit` sessions, newest first, older than the (created_at, id) keyset position `after`."""
+    with db_cursor() as cur:
+        if after is None:
+            cur.execute(
+                """SELECT id, title, source_type, source_url, created_at FROM sessions
+                   WHERE ready
+                   ORDER BY created_at DESC, id DESC LIMIT %s""",
+                (limit,)
+            )
+        else:
+            cur.execute(
+                """SELECT id, title, source_type, source_url, created_at FROM sessions
+                   WHERE ready AND (created_at, id) < (%s::timestamptz, %s::uuid)
+                   ORDER BY created_at DESC, id DESC LIMIT %s""",
+                (*after, limit)
+            )
         rows = cur.fetchall()
         return [{"id": str(r[0]), "title": r[1], "source_type": r[2], "source_url": r[3], "created_at": str(r[4])} for r in rows]
-    finally:
-        cur.close()
-        conn.close()
 
 
 def save_flashcards(session_id: str, flashcards: list[dict]) -> list[str]:
-    conn = get_connection()
-    cur = conn.cursor()
-    try:
-        ids = []
-        for card in flashcards:
-            cur.execute(
-                "INSERT INTO flashcards (session_id, front, back) VALUES (%s, %s, %s) RETURNING id",
-                (session_id, card["front"], card["back"])
-            )
-            ids.append(str(cur.fetchone()[0]))
-        conn.commit()
-        return ids
-    finally:
-        cur.close()
-        conn.close()
+    with db_cursor() as cur:
+        rows = insert_returning(
+            cur,
+            "INSERT INTO flashcards (session_id, front, back) VALUES %s RETURNING id",
+            [(session_id, card["front"], card["back"]) for card in flashcards]
+        )
+        return [str(r[0]) for r in rows]
 
 
 def get_flashcards(session_id: str) -> list[dict]:
-    conn = get_connection()
-    cur = conn.cursor()
-    try:
+    with db_cursor() as cur:
         cur.execute("SELECT id, front, back FROM flashcards WHERE session_id = %s", (session_id,))
         return [{"id": str(r[0]), "front": r[1], "back": r[2]} for r in cur.fetchall()]
-    finally:
-        cur.close()
-        conn.close()
 
 
 def save_quiz_questions(session_id: str, questions: list[dict]) -> list[str]:
-    import json
-    conn = get_connection()
-    cur = conn.cursor()
-    try:
-        ids = []
-        for q in questions:
-            cur.execute(
-                """INSERT INTO quiz_questions (session_id, question, options, correct_answer, explanation)
-                   VALUES (%s, %s, %s, %s, %s) RETURNING id""",
-                (session_id, q["question"], json.dumps(q["options"]), q["correct_answer"], q.get("explanation", ""))
-            )
-            ids.append(str(cur.fetchone()[0]))
-        conn.commit()
-        return ids
-    finally:
-        cur.close()
-        conn.close()
+    with db_cursor() as cur:
+        rows = insert_returning(
+            cur,
+            """INSERT INTO quiz_questions (session_id, question, options, correct_answer, explanation)
+               VALUES %s RETURNING id""",
+            [(session_id, q["question"], json.dumps(q["options"]), q["correct_answer"], q.get("explanation", ""))
+             for q in questions]
+        )
+    ids = [str(r[0]) for r in rows]
+    # Extend the cached key with just these questions; a streamed quiz saves them one at a time
+    answer_keys.merge(session_id, {
+        question_id: {"correct_answer": q["correct_answer"], "explanation": q.get("explanation", "")}
+        for question_id, q in zip(ids, questions)
+    })
+    return ids
 
 
 def get_quiz_questions(session_id: str) -> list[dict]:
-    conn = get_connection()
-    cur = conn.cursor()
-    try:
+    with db_cursor() as cur:
         cur.execute("SELECT id, question, options, correct_answer, explanation FROM quiz_questions WHERE session_id = %s", (session_id,))
         return [
             {"id": str(r[0]), "question": r[1], "options": r[2], "correct_answer": r[3], "explanation": r[4]}
             for r in cur.fetchall()
         ]
-    finally:
-        cur.close()
-        conn.close()
 
 
-def save_chat_message(session_id: str, role: str, content: str) -> str:
-    conn = get_connection()
-    cur = conn.cursor()
+def get_quiz_answer(session_id: str, question_id: str) -> dict | None:
+    """One question's correct answer and explanation, by primary key."""
+    if not (_is_uuid(session_id) and _is_uuid(question_id)):
+        return None
+    with db_cursor() as cur:
+        cur.execute(
+            "SELECT correct_answer, explanation FROM quiz_questions WHERE id = %s AND session_id = %s",
+            (question_id, session_id)
+        )
+        row = cur.fetchone()
+        return {"correct_answer": row[0], "explanation": row[1]} if row else None
+
+
+def get_quiz_answer_key(session_id: str) -> dict[str, dict]:
+    """question id -> {correct_answer, explanation} for every question in the session (cached)."""
+    if not _is_uuid(session_id):
+        return {}
+    with db_cursor() as cur:
+        answers = _select_answer_key(cur, session_id)
+    answer_keys.put(session_id, answers)
+    return answers
+
+
+def _select_answer_key(cur, session_id: str) -> dict[str, dict]:
+    cur.execute("SELECT id, correct_answer, explanation FROM quiz_questions WHERE session_id = %s", (session_id,))
+    return {str(r[0]): {"correct_answer": r[1], "explanation": r[2]} for r in cur.fetchall()}
+
+
+def _is_uuid(value: str) -> bool:
     try:
+        uuid.UUID(value)
+        return True
+    except ValueError:
+        return False
+
+
+def get_cached_generation(cache_key: str, ttl_secs: float) -> tuple[list[dict], float] | None:
+    """Cached items younger than ttl_secs, with their age in seconds."""
+    with db_cursor() as cur:
+        cur.execute(
+            """SELECT items, EXTRACT(EPOCH FROM NOW() - created_at) FROM generation_cache
+               WHERE cache_key = %s AND created_at > NOW() - make_interval(secs => %s)""",
+            (cache_key, ttl_secs)
+        )
+        row = cur.fetchone()
+        return (row[0], float(row[1])) if row else None
+
+
+def store_generation(cache_key: str, kind: str, items: list[dict], ttl_secs: float):
+    """Upsert a generation and drop entries older than ttl_secs."""
+    with db_cursor() as cur:
+        cur.execute(
+            """INSERT INTO generation_cache (cache_key, kind, items) VALUES (%s, %s, %s)
+               ON CONFLICT (cache_key) DO UPDATE SET items = EXCLUDED.items, created_at = NOW()""",
+            (cache_key, kind, json.dumps(items))
+        )
+        cur.execute(
+            "DELETE FROM generation_cache WHERE created_at < NOW() - make_interval(secs => %s)",
+            (ttl_secs,)
+        )
+
+
+def save_chat_message(session_id: str, role: str, content: str) -> str:
+    with db_cursor() as cur:
         cur.execute(
             "INSERT INTO chat_messages (session_id, role, content) VALUES (%s, %s, %s) RETURNING id",
             (session_id, role, content)
         )
         msg_id = str(cur.fetchone()[0])
-        conn.commit()
         return msg_id
-    finally:
-        cur.close()
-        conn.close()
 
 
-def get_chat_history(session_id: str, limit: int = 20) -> list[dict]:
-    conn = get_connection()
-    cur = conn.cursor()
-    try:
+def save_user_message(session_id: str, content: str) -> bool:
+    """
+    Save a chat question. Returns whether the session uses the chat answer cache,
+    read in the same round trip so an opt-out on any worker applies to the next question.
+    """
+    with db_cursor() as cur:
         cur.execute(
-            """SELECT id, role, content, created_at FROM chat_messages
-               WHERE session_id = %s ORDER BY created_at DESC LIMIT %s""",
-            (session_id, limit)
+            """INSERT INTO chat_messages (session_id, role, content) VALUES (%s, 'user', %s)
+               RETURNING (SELECT answer_cache FROM sessions WHERE id = %s)""",
+            (session_id, content, session_id)
         )
+        return bool(cur.fetchone()[0])
+
+
+def get_chat_history(session_id: str, limit: int = 20, before: tuple[str, str] | None = None) -> list[dict]:
+    """
+    The `limit` most recent messages (older than the (created_at, id) keyset
+    position `before`, if given), returned oldest first.
+    """
+    with db_cursor() as cur:
+        if before is None:
+            cur.execute(
+                """SELECT id, role, content, created_at FROM chat_messages
+                   WHERE session_id = %s ORDER BY created_at DESC, id DESC LIMIT %s""",
+                (session_id, limit)
+            )
+        else:
+            cur.execute(
+                """SELECT id, role, content, created_at FROM chat_messages
+                   WHERE session_id = %s AND (created_at, id) < (%s::timestamptz, %s::uuid)
+                   ORDER BY created_at DESC, id DESC LIMIT %s""",
+                (session_id, *before, limit)
+            )
         rows = cur.fetchall()
         return [{"id": str(r[0]), "role": r[1], "content": r[2], "created_at": str(r[3])} for r in reversed(rows)]
-    finally:
-        cur.close()
-        conn.close()
+
+
+def get_conversation_memory(session_id: str, limit: int) -> dict:
+    """
+    In one round trip: the session's rolling summary (or None) and the `limit`
+    most recent messages it doesn't cover yet, oldest first.
+    """
+    with db_cursor() as cur:
+        summary = _select_chat_summary(cur, session_id)
+        if summary is None:
+            cur.execute(
+                """SELECT id, role, content, created_at FROM chat_messages
+                   WHERE session_id = %s ORDER BY created_at DESC, id DESC LIMIT %s""",
+                (session_id, limit)
+            )
+        else:
+            cur.execute(
+                """SELECT id, role, content, created_at FROM chat_messages
+                   WHERE session_id = %s AND (created_at, id) > (%s::timestamptz, %s::uuid)
+                   ORDER BY created_at DESC, id DESC LIMIT %s""",
+                (session_id, *summary["covered"], limit)
+            )
+        rows = cur.fetchall()
+    messages = [{"id": str(r[0]), "role": r[1], "content": r[2], "created_at": str(r[3])} for r in reversed(rows)]
+    return {"summary": summary, "messages": messages}
+
+
+def get_chat_summary(session_id: str) -> dict | None:
+    """{summary, covered: (created_at, id) of the last message it covers}, or None."""
+    with db_cursor() as cur:
+        return _select_chat_summary(cur, session_id)
+
+
+def _select_chat_summary(cur, session_id: str) -> dict | None:
+    cur.execute("SELECT summary, covered_at, covered_id FROM chat_summaries WHERE session_id = %s", (session_id,))
+    row = cur.fetchone()
+    return {"summary": row[0], "covered": (str(row[1]), str(row[2]))} if row else None
+
+
+def get_unsummarized_messages(session_id: str, after: tuple[str, str] | None, limit: int) -> list[dict]:
+    """The oldest `limit` messages after the keyset position `after` (all messages if None), oldest first."""
+    with db_cursor() as cur:
+        if after is None:
+            cur.execute(
+                """SELECT id, role, content, created_at FROM chat_messages
+                   WHERE session_id = %s ORDER BY created_at, id LIMIT %s""",
+                (session_id, limit)
+            )
+        else:
+            cur.execute(
+                """SELECT id, role, content, created_at FROM chat_messages
+                   WHERE session_id = %s AND (created_at, id) > (%s::timestamptz, %s::uuid)
+                   ORDER BY created_at, id LIMIT %s""",
+                (session_id, *after, limit)
+            )
+        return [{"id": str(r[0]), "role": r[1], "content": r[2], "created_at": str(r[3])} for r in cur.fetchall()]
+
+
+def save_chat_summary(session_id: str, summary: str, covered: tuple[str, str]):
+    """Store a summary covering messages up to `covered`, unless a newer one already covers more."""
+    with db_cursor() as cur:
+        cur.execute(
+            """INSERT INTO chat_summaries (session_id, summary, covered_at, covered_id)
+               VALUES (%s, %s, %s, %s)
+               ON CONFLICT (session_id) DO UPDATE
+               SET summary = EXCLUDED.summary, covered_at = EXCLUDED.covered_at,
+                   covered_id = EXCLUDED.covered_id, updated_at = NOW()
+               WHERE (chat_summaries.covered_at, chat_summaries.covered_id)
+                     < (EXCLUDED.covered_at, EXCLUDED.covered_id)""",
+            (session_id, summary, *covered)
+        )
+
+
+def create_ingest_job(source_type: str, source_url: str, payload: bytes | None = None) -> str:
+    with db_cursor() as cur:
+        cur.execute(
+            "INSERT INTO ingest_jobs (source_type, source_url, payload) VALUES (%s, %s, %s) RETURNING id",
+            (source_type, source_url, psycopg2.Binary(payload) if payload is not None else None)
+        )
+        return str(cur.fetchone()[0])
+
+
+def get_ingest_job(job_id: str) -> dict | None:
+    if not _is_uuid(job_id):
+        return None
+    with db_cursor() as cur:
+        cur.execute(
+            """SELECT id, source_type, source_url, status, stage, progress, result, error, created_at, updated_at
+               FROM ingest_jobs WHERE id = %s""",
+            (job_id,)
+        )
+        r = cur.fetchone()
+        if not r:
+            return None
+        return {
+            "id": str(r[0]), "source_type": r[1], "source_url": r[2], "status": r[3], "stage": r[4],
+            "progress": r[5], "result": r[6], "error": r[7], "created_at": str(r[8]), "updated_at": str(r[9]),
+        }
+
+
+def claim_ingest_job(job_id: str) -> dict | None:
+    """Atomically move a queued job to running. Returns its source, or None if already taken."""
+    with db_cursor() as cur:
+        cur.execute(
+            """UPDATE ingest_jobs SET status = 'running', updated_at = NOW()
+               WHERE id = %s AND status = 'queued'
+               RETURNING source_type, source_url""",
+            (job_id,)
+        )
+        row = cur.fetchone()
+        if not row:
+            return None
+        return {"source_type": row[0], "source_url": row[1]}
+
+
+def get_ingest_job_payload(job_id: str) -> bytes | None:
+    with db_cursor() as cur:
+        cur.execute("SELECT payload FROM ingest_jobs WHERE id = %s", (job_id,))
+        row = cur.fetchone()
+        return bytes(row[0]) if row and row[0] is not None else None
+
+
+def update_ingest_job(job_id: str, status: str | None = None, stage: str | None = None,
+                      progress: float | None = None, result: dict | None = None, error: str | None = None):
+    """Update the given job fields. Finished jobs drop their payload and are never updated again."""
+    with db_cursor() as cur:
+        cur.execute(
+            """UPDATE ingest_jobs SET
+                   status = COALESCE(%s, status),
+                   stage = COALESCE(%s, stage),
+                   progress = COALESCE(%s, progress),
+                   result = COALESCE(%s::jsonb, result),
+                   error = COALESCE(%s, error),
+                   payload = CASE WHEN %s IN ('done', 'failed') THEN NULL ELSE payload END,
+                   updated_at = NOW()
+               WHERE id = %s AND status NOT IN ('done', 'failed')""",
+            (status, stage, progress, json.dumps(result) if result is not None else None, error, status, job_id)
+        )
+
+
+def heartbeat_ingest_jobs(job_ids: list[str]):
+    """Show that this process is still running these jobs (see requeue_stale_ingest_jobs)."""
+    with db_cursor() as cur:
+        cur.execute(
+            "UPDATE ingest_jobs SET updated_at = NOW() WHERE id = ANY(%s::uuid[]) AND status = 'running'",
+            (job_ids,)
+        )
+
+
+def requeue_stale_ingest_jobs(stale_secs: float, queued_older_than_secs: float = 0) -> list[str]:
+    """
+    Mark running jobs whose process stopped heartbeating for `stale_secs` (crashed,
+    killed or redeployed) as queued again. Jobs other live processes are running
+    are left alone. Returns the IDs of queued jobs untouched for
+    `queued_older_than_secs`, oldest first, for the caller to enqueue.
+    """
+    with db_cursor() as cur:
+        cur.execute(
+            """UPDATE ingest_jobs SET status = 'queued'
+               WHERE status = 'running' AND updated_at < NOW() - make_interval(secs => %s)""",
+            (stale_secs,)
+        )
+        cur.execute(
+            """SELECT id FROM ingest_jobs
+               WHERE status = 'queued' AND updated_at <= NOW() - make_interval(secs => %s)
+               ORDER BY created_at""",
+            (queued_older_than_secs,)
+        )
+        return [str(r[0]) for r in cur.fetchall()]
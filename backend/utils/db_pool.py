@@ -0,0 +1,110 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool, PoolError
+
+
+def connect_kwargs(statement_timeout_ms: int) -> dict:
+    """Extra psycopg2.connect() arguments applied to every connection."""
+    if statement_timeout_ms > 0:
+        return {"options": f"-c statement_timeout={statement_timeout_ms}"}
+    return {}
+
+
+class ConnectionPool:
+    """
+    Thread-safe psycopg2 connection pool.
+
+    Unlike ThreadedConnectionPool on its own, checkout blocks (up to `acquire_timeout`)
+    when all connections are busy instead of raising, and connections that sat idle
+    longer than `healthcheck_idle_secs` are pinged before being handed out so a
+    server-side disconnect never reaches a query.
+    """
+
+    def __init__(self, dsn: str, minconn: int = 1, maxconn: int = 10,
+                 statement_timeout_ms: int = 0, healthcheck_idle_secs: float = 30.0,
+                 acquire_timeout: float = 30.0):
+        self._pool = ThreadedConnectionPool(minconn, maxconn, dsn, **connect_kwargs(statement_timeout_ms))
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used: dict[int, float] = {}
+        self._healthcheck_idle_secs = healthcheck_idle_secs
+        self._acquire_timeout = acquire_timeout
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self._in_use = 0
+        self._lock = threading.Lock()
+
+    def getconn(self):
+        if not self._slots.acquire(timeout=self._acquire_timeout):
+            raise PoolError(
+                f"Timed out after {self._acquire_timeout}s waiting for a database connection"
+            )
+        try:
+            conn = self._checkout()
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._in_use += 1
+        return conn
+
+    def putconn(self, conn, discard: bool = False):
+        discard = discard or conn.closed
+        if discard:
+            self._last_used.pop(id(conn), None)
+        else:
+            self._last_used[id(conn)] = time.monotonic()
+        try:
+            self._pool.putconn(conn, close=discard)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.putconn(conn, discard=broken)
+
+    def close(self):
+        self._pool.closeall()
+        self._last_used.clear()
+
+    def stats(self) -> dict:
+        return {"min": self.minconn, "max": self.maxconn, "in_use": self._in_use}
+
+    def _checkout(self):
+        while True:
+            conn = self._pool.getconn()
+            if conn.closed:
+                self._discard(conn)
+                continue
+            last_used = self._last_used.get(id(conn))
+            if last_used is not None and time.monotonic() - last_used > self._healthcheck_idle_secs:
+                if not self._ping(conn):
+                    self._discard(conn)
+                    continue
+            return conn
+
+    def _discard(self, conn):
+        self._last_used.pop(id(conn), None)
+        self._pool.putconn(conn, close=True)
+
+    @staticmethod
+    def _ping(conn) -> bool:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
@@ -1,54 +1,98 @@
-from sentence_transformers import SentenceTransformer
+import os
+import time
+import threading
+from typing import Iterable, Iterator
 import numpy as np
 
+from utils import metrics
+
 # Free local model — no API key needed, runs on CPU fine
-# 384-dimensional embeddings
-MODEL_NAME = "all-MiniLM-L6-v2"
-EMBEDDING_DIM = 384
+# Changing it re-embeds stored chunks on next startup (see services/index_maintenance.py)
+MODEL_NAME = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+# Encoder runtime: "torch" (default), "onnx" or "openvino" (needs sentence-transformers[onnx] / [openvino]).
+# EMBEDDING_MODEL_FILE picks a specific export, e.g. the int8 "onnx/model_quint8_avx2.onnx"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_MODEL_FILE = os.getenv("EMBEDDING_MODEL_FILE", "")
+
+# Identifies the vectors the encoder produces; a quantised export counts as a different model
+MODEL_ID = f"{MODEL_NAME}#{EMBEDDING_MODEL_FILE}" if EMBEDDING_MODEL_FILE else MODEL_NAME
+
+EMBED_BATCH_SIZE = 64  # chunks embedded (and written) per pipeline batch
+
+# Loaded on first use (or by services/warmup.py at startup), so importing this
+# module doesn't pay for torch + the model
+_model = None
+_model_lock = threading.Lock()
+
 
-CHUNK_SIZE = 800   # words per chunk
-CHUNK_OVERLAP = 100  # overlap between chunks
+def get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
 
-# Load once at startup (cached in memory)
-print(f"Loading embedding model '{MODEL_NAME}'...")
-_model = SentenceTransformer(MODEL_NAME)
-print("Embedding model loaded ✅")
+                kwargs = {}
+                if EMBEDDING_BACKEND != "torch":
+                    kwargs["backend"] = EMBEDDING_BACKEND
+                    if EMBEDDING_MODEL_FILE:
+                        kwargs["model_kwargs"] = {"file_name": EMBEDDING_MODEL_FILE}
+                print(f"Loading embedding model '{MODEL_ID}' ({EMBEDDING_BACKEND})...")
+                _model = SentenceTransformer(MODEL_NAME, **kwargs)
+                print("Embedding model loaded ✅")
+    return _model
 
 
-def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> list[str]:
-    """Split text into overlapping chunks by word count."""
-    words = text.split()
-    chunks = []
-    start = 0
-    while start < len(words):
-        end = start + chunk_size
-        chunk = " ".join(words[start:end])
-        chunks.append(chunk)
-        start += chunk_size - overlap
-    return [c for c in chunks if c.strip()]
+def embedding_dim() -> int:
+    model = get_model()
+    # Newer sentence-transformers deprecate get_sentence_embedding_dimension; older ones only have it
+    dimension = getattr(model, "get_embedding_dimension", None) or model.get_sentence_embedding_dimension
+    return dimension()  # 384 for all-MiniLM-L6-v2
+
+
+def lowercases_input() -> bool:
+    """Whether the model lowercases its input, so a text's case doesn't change its embedding."""
+    return bool(getattr(getattr(get_model(), "tokenizer", None), "do_lower_case", False))
+
+
+def warm_up():
+    """Load the model and run one encode so the first real request doesn't pay for lazy init."""
+    encode_batch(["warm up"])
 
 
 def get_embedding(text: str) -> list[float]:
     """Get a single embedding vector for a text string."""
-    embedding = _model.encode(text, convert_to_numpy=True)
+    embedding = get_model().encode(text, convert_to_numpy=True)
     return embedding.tolist()
 
 
 def get_embeddings_batch(texts: list[str]) -> list[list[float]]:
     """Get embeddings for multiple texts efficiently in one batch."""
-    embeddings = _model.encode(texts, convert_to_numpy=True, batch_size=32, show_progress_bar=False)
-    return embeddings.tolist()
+    return encode_batch(texts).tolist()
 
 
-def process_text_to_chunks(text: str) -> list[dict]:
+def iter_embedded_batches(chunks: Iterable[dict], batch_size: int = EMBED_BATCH_SIZE) -> Iterator[tuple[list[dict], np.ndarray]]:
     """
-    Chunk text and generate embeddings.
-    Returns list of {content, index, embedding} dicts.
+    Embed a stream of chunks ({content, ...} dicts) in fixed-size batches.
+    Yields (chunks, float32 embedding matrix) pairs; nothing beyond one batch is kept.
     """
-    chunks = chunk_text(text)
-    print(f"Processing {len(chunks)} chunks...")
-    embeddings = get_embeddings_batch(chunks)
-    return [
-        {"content": chunk, "index": i, "embedding": emb}
-        for i, (chunk, emb) in enumerate(zip(chunks, embeddings))
-    ]
\ No newline at end of file
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) == batch_size:
+            yield batch, encode_batch([c["content"] for c in batch])
+            batch = []
+    if batch:
+        yield batch, encode_batch([c["content"] for c in batch])
+
+
+def encode_batch(texts: list[str]) -> np.ndarray:
+    """Embed texts as one float32 matrix (one row per text)."""
+    model = get_model()
+    started = time.perf_counter()
+    embeddings = model.encode(texts, convert_to_numpy=True, batch_size=32, show_progress_bar=False)
+    metrics.EMBED_SECONDS.observe(time.perf_counter() - started)
+    metrics.EMBED_BATCH_SIZE.observe(len(texts))
+    metrics.EMBEDDED_TEXTS.inc(len(texts))
+    return embeddings.astype(np.float32)
@@ -0,0 +1,57 @@
+import os
+import time
+import hashlib
+from collections import OrderedDict
+
+from utils.database import get_cached_generation, store_generation, run_db
+
+# Generated flashcards / quizzes, reused when the same text is generated again with
+# the same settings. A small in-process LRU sits in front of the Postgres table.
+GEN_CACHE_TTL_SECS = float(os.getenv("GEN_CACHE_TTL_SECS", str(7 * 24 * 3600)))  # 0 disables the cache
+GEN_CACHE_LOCAL_SIZE = int(os.getenv("GEN_CACHE_LOCAL_SIZE", "256"))
+
+_local: OrderedDict[str, tuple[float, list[dict]]] = OrderedDict()  # key -> (expires_at, items)
+
+
+def generation_key(kind: str, text: str, count: int, settings: str) -> str:
+    """
+    Cache key for one generation: the text's hash plus everything that shapes the
+    output (generator type, count, and the model / prompt version / mode in `settings`).
+    """
+    text_sha256 = hashlib.sha256(text.encode()).hexdigest()
+    return hashlib.sha256(f"{kind}:{text_sha256}:{count}:{settings}".encode()).hexdigest()
+
+
+async def lookup(key: str) -> list[dict] | None:
+    if GEN_CACHE_TTL_SECS <= 0:
+        return None
+    entry = _local.get(key)
+    if entry is not None:
+        expires_at, items = entry
+        if expires_at > time.time():
+            _local.move_to_end(key)
+            return items
+        del _local[key]
+
+    cached = await run_db(get_cached_generation, key, GEN_CACHE_TTL_SECS)
+    if cached is None:
+        return None
+    items, age_secs = cached
+    _remember(key, items, GEN_CACHE_TTL_SECS - age_secs)
+    return items
+
+
+async def store(key: str, kind: str, items: list[dict]):
+    if GEN_CACHE_TTL_SECS <= 0 or not items:
+        return
+    await run_db(store_generation, key, kind, items, GEN_CACHE_TTL_SECS)
+    _remember(key, items, GEN_CACHE_TTL_SECS)
+
+
+def _remember(key: str, items: list[dict], ttl_secs: float):
+    if GEN_CACHE_LOCAL_SIZE <= 0:
+        return
+    _local[key] = (time.time() + ttl_secs, items)
+    _local.move_to_end(key)
+    while len(_local) > GEN_CACHE_LOCAL_SIZE:
+        _local.popitem(last=False)
@@ -0,0 +1,25 @@
+import hashlib
+
+from utils.embeddings import MODEL_ID
+from utils.chunking import CHUNKER_ID
+
+
+def _content_hash(kind: str, digest: str) -> str:
+    """
+    Key identifying one ingested document under the current chunking + embedding
+    settings. Changing the model or chunk sizes yields new keys, so stale chunks
+    are never reused.
+    """
+    key = f"{kind}:{digest}:{MODEL_ID}:{CHUNKER_ID}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def pdf_content_hash(pdf_sha256: str) -> str:
+    """Dedup key for a PDF, given the SHA-256 of its raw bytes."""
+    return _content_hash("pdf", pdf_sha256)
+
+
+def video_content_hash(video_id: str, transcript: str) -> str:
+    """Dedup key for a YouTube video: its ID plus a hash of the fetched transcript."""
+    transcript_sha256 = hashlib.sha256(transcript.encode()).hexdigest()
+    return _content_hash("youtube", f"{video_id}:{transcript_sha256}")
@@ -0,0 +1,59 @@
+import json
+
+
+class JsonItemStream:
+    """
+    Incremental scanner for a JSON reply that lists items in an array, like
+    {"flashcards": [{...}, {...}]} or [{...}, ...]. feed() takes text as it
+    streams in and returns each object element of an array as soon as its
+    closing brace arrives; objects nested inside an item stay part of it. Text
+    before the JSON starts (e.g. a markdown fence) is skipped.
+    """
+
+    def __init__(self):
+        self._parts: list[str] = []  # everything fed, for a whole-reply fallback
+        self._buffer = ""  # text from the start of the pending item (or just the latest piece)
+        self._stack: list[str] = []  # open "{" / "["
+        self._in_string = False
+        self._escaped = False
+        self._item_start: int | None = None  # buffer offset of the pending item's "{"
+        self._item_depth = 0
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def feed(self, text: str) -> list:
+        self._parts.append(text)
+        offset = len(self._buffer)
+        self._buffer += text
+        items = []
+        for i in range(offset, len(self._buffer)):
+            char = self._buffer[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = bool(self._stack)  # quotes in prose before the JSON don't count
+            elif char in "{[":
+                if char == "{" and self._item_start is None and self._stack and self._stack[-1] == "[":
+                    self._item_start, self._item_depth = i, len(self._stack)
+                self._stack.append(char)
+            elif char in "}]" and self._stack:
+                self._stack.pop()
+                if char == "}" and self._item_start is not None and len(self._stack) == self._item_depth:
+                    try:
+                        items.append(json.loads(self._buffer[self._item_start:i + 1]))
+                    except ValueError:
+                        pass  # malformed item; the rest of the stream may still be fine
+                    self._item_start = None
+        if self._item_start is None:
+            self._buffer = ""
+        else:
+            self._buffer = self._buffer[self._item_start:]
+            self._item_start = 0
+        return items
@@ -0,0 +1,344 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+# Process metrics in Prometheus text format (GET /metrics), without a client
+# library: counters, gauges and histograms with labels, plus gauges computed at
+# scrape time. OpenTelemetry spans are optional (OTEL_TRACING=true and
+# opentelemetry-api installed); metrics are always on.
+OTEL_TRACING = os.getenv("OTEL_TRACING", "false").lower() == "true"
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "ai-learning-assistant")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_registry: list["_Metric"] = []
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def _label_text(self, key: tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labels, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            return [f"{self.name}{self._label_text(k)} {_number(v)}" for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    """Set directly, or computed at scrape time by `function` (a number, or {label tuple: number})."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), function=None):
+        super().__init__(name, help, labels)
+        self.function = function
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self) -> list[str]:
+        if self.function is not None:
+            try:
+                value = self.function()
+            except Exception:
+                return []
+            values = value if isinstance(value, dict) else {(): value}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [f"{self.name}{self._label_text(k)} {_number(v)}" for k, v in values.items()]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]  # per-bucket counts, sum, count
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> list[str]:
+        lines = []
+        with self._lock:
+            items = [(k, list(s[0]), s[1], s[2]) for k, s in self._values.items()]
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{self._label_text(key, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{self._label_text(key, le)} {count}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {_number(total)}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {count}")
+        return lines
+
+
+def render() -> str:
+    """Every registered metric in Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+# --- Metrics ---------------------------------------------------------------
+
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being served, including open SSE streams")
+HTTP_REQUEST_SECONDS = Histogram("http_request_duration_seconds", "HTTP request duration until the body is sent",
+                                 ("method", "route", "status"))
+STAGE_SECONDS = Histogram("pipeline_stage_duration_seconds",
+                          "Time spent in each stage of ingestion, chat and generation", ("pipeline", "stage"))
+DB_QUERY_SECONDS = Histogram("db_query_duration_seconds", "Database statement time by calling function", ("query",))
+DB_POOL_WAIT_SECONDS = Histogram("db_pool_wait_seconds", "Time waiting to borrow a pooled connection")
+EMBED_BATCH_SIZE = Histogram("embedding_batch_size", "Texts per embedding model call", buckets=BATCH_BUCKETS)
+EMBED_SECONDS = Histogram("embedding_batch_duration_seconds", "Embedding model call duration")
+EMBEDDED_TEXTS = Counter("embedding_texts_total", "Texts embedded")
+LLM_TTFT_SECONDS = Histogram("llm_time_to_first_token_seconds", "Time to the first streamed token, including queueing",
+                             ("route",))
+LLM_CALL_SECONDS = Histogram("llm_call_duration_seconds", "LLM call duration, including queueing and retries",
+                             ("route", "outcome"))
+LLM_TOKENS = Counter("llm_tokens_total", "Estimated prompt and completion tokens", ("route", "kind"))
+INGEST_JOBS = Counter("ingest_jobs_total", "Finished background ingestion jobs", ("status",))
+
+_queue_depths: dict[str, object] = {}  # name -> callable returning the number of queued tasks
+EXECUTOR_QUEUE_DEPTH = Gauge("executor_queue_depth", "Tasks waiting for a worker", ("executor",),
+                             function=lambda: {(name, ): depth() for name, depth in list(_queue_depths.items())})
+
+
+def track_queue(name: str, depth):
+    """Report `depth()` as executor_queue_depth{executor=name}."""
+    _queue_depths[name] = depth
+
+
+def track_executor(name: str, executor):
+    """Report a ThreadPoolExecutor's backlog as executor_queue_depth{executor=name}."""
+    track_queue(name, executor._work_queue.qsize)
+
+
+# --- Stages and spans ------------------------------------------------------
+
+@contextmanager
+def stage(pipeline: str, name: str, **attributes):
+    """Time one pipeline stage into pipeline_stage_duration_seconds, inside a span when tracing."""
+    started = time.perf_counter()
+    with span(f"{pipeline}.{name}", **attributes):
+        try:
+            yield
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - started, pipeline=pipeline, stage=name)
+
+
+class StageTimer:
+    """
+    Exclusive time per stage for pipelines whose stages interleave, like the
+    streaming extract -> chunk -> embed -> store ingest: time spent in a nested
+    stage isn't counted again in the stage around it. Totals are observed once
+    at the end with observe(). Safe to use from several threads at once.
+    """
+
+    def __init__(self, pipeline: str):
+        self.pipeline = pipeline
+        self.totals: dict[str, float] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def __call__(self, stage_name: str | None):
+        """Time a block as `stage_name`; None excludes it (e.g. waiting on another thread)."""
+        stack = self._local.__dict__.setdefault("stack", [])
+        frame = [0.0]  # time taken by nested stages
+        stack.append(frame)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            stack.pop()
+            if stack:
+                stack[-1][0] += elapsed
+            if stage_name is not None:
+                with self._lock:
+                    self.totals[stage_name] = self.totals.get(stage_name, 0.0) + elapsed - frame[0]
+
+    def iterate(self, iterable, stage_name: str | None):
+        """Yield from `iterable`, timing each step as `stage_name`."""
+        iterator = iter(iterable)
+        try:
+            while True:
+                with self(stage_name):
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                yield item
+        finally:
+            close = getattr(iterator, "close", None)
+            if close:
+                close()
+
+    def observe(self, current_span=None):
+        """Record the totals, and set them as attributes of `current_span` if given."""
+        for stage_name, total in self.totals.items():
+            STAGE_SECONDS.observe(total, pipeline=self.pipeline, stage=stage_name)
+            if current_span is not None:
+                current_span.set_attribute(f"{self.pipeline}.{stage_name}_secs", round(total, 4))
+
+
+_tracer = None
+_tracer_ready = False
+
+
+def _get_tracer():
+    global _tracer, _tracer_ready
+    if not _tracer_ready:
+        _tracer = _init_tracer() if OTEL_TRACING else None
+        _tracer_ready = True
+    return _tracer
+
+
+def _init_tracer():
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        print("⚠️ OTEL_TRACING is on but opentelemetry-api isn't installed; spans are disabled")
+        return None
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    except ImportError:
+        pass  # API only: spans go to whatever provider the host set up (e.g. opentelemetry-instrument)
+    else:
+        if not isinstance(trace.get_tracer_provider(), TracerProvider):
+            provider = TracerProvider(resource=Resource.create({"service.name": OTEL_SERVICE_NAME}))
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))  # OTEL_EXPORTER_OTLP_* env
+            trace.set_tracer_provider(provider)
+    return trace.get_tracer(OTEL_SERVICE_NAME)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """An OpenTelemetry span around the block (the current span's child), or nothing when tracing is off."""
+    tracer = _get_tracer()
+    if tracer is None:
+        yield None
+        return
+    with tracer.start_as_current_span(name, attributes=attributes) as current:
+        yield current
+
+
+def start_span(name: str, **attributes):
+    """
+    A span that isn't made current, for work that spans yields of an async generator.
+    The caller ends it with end_span(). None when tracing is off.
+    """
+    tracer = _get_tracer()
+    return tracer.start_span(name, attributes=attributes) if tracer is not None else None
+
+
+def end_span(current, **attributes):
+    if current is not None:
+        for key, value in attributes.items():
+            current.set_attribute(key, value)
+        current.end()
+
+
+class MetricsMiddleware:
+    """ASGI middleware: in-flight requests and duration by route template, until the last body byte (SSE included)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+        try:
+            with span(f"{scope['method']} {scope['path']}"):
+                await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, method=scope["method"], route=route,
+                                         status=str(status["code"]))
@@ -0,0 +1,23 @@
+import base64
+import uuid
+from datetime import datetime
+
+# Keyset pagination over (created_at, id), newest first. A cursor is the position
+# of the last row returned, so each page is an index range scan however deep it is.
+
+
+def encode_cursor(row: dict) -> str:
+    """Opaque cursor pointing just past `row` (a dict with "created_at" and "id")."""
+    return base64.urlsafe_b64encode(f"{row['created_at']}|{row['id']}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    """(created_at, id) from a cursor. Raises ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.split("|", 1)
+        datetime.fromisoformat(created_at)
+        uuid.UUID(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor.") from e
+    return created_at, row_id
@@ -0,0 +1,12 @@
+def reciprocal_rank_fusion(rankings: list[tuple[list[str], float]], k: int = 60) -> list[tuple[str, float]]:
+    """
+    Merge ranked lists of keys with weighted reciprocal rank fusion: each key scores
+    sum(weight / (k + rank)) over the lists it appears in. Returns (key, score), best first.
+    """
+    scores: dict[str, float] = {}
+    for keys, weight in rankings:
+        if weight <= 0:
+            continue
+        for rank, key in enumerate(keys, start=1):
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,150 @@
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Chat answers cached per session and matched by question meaning: a new question
+# is answered from the cache when its embedding is close enough to a cached
+# question's and retrieval picked (mostly) the same passages for it. In-process,
+# so each worker keeps its own. Follow-ups that lean on the conversation ("explain
+# that again", "what about the second one?") mean something different in every chat,
+# so they are neither looked up nor stored.
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "4096"))  # answers across sessions; 0 disables
+SEMANTIC_CACHE_PER_SESSION = int(os.getenv("SEMANTIC_CACHE_PER_SESSION", "64"))
+SEMANTIC_CACHE_TTL_SECS = float(os.getenv("SEMANTIC_CACHE_TTL_SECS", "86400"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))  # question cosine similarity
+SEMANTIC_CACHE_CONTEXT_OVERLAP = float(os.getenv("SEMANTIC_CACHE_CONTEXT_OVERLAP", "0.75"))  # of the cached passages
+
+_REPLAY_PIECES = re.compile(r"\S+\s*|\s+")
+# Pronouns and back-references that tie a question to earlier turns
+_REFERS_BACK = re.compile(
+    r"\b(it|its|this|that|these|those|they|them|their|he|she|him|his|her|one|ones|same|above|"
+    r"previous|previously|earlier|before|again|last|latter|former|else|more|further|elaborate|continue)\b",
+    re.IGNORECASE,
+)
+MIN_STANDALONE_WORDS = 3  # "why?", "how so?" only make sense after another turn
+
+
+class _Entry:
+    __slots__ = ("session_id", "embedding", "context", "answer", "expires_at")
+
+    def __init__(self, session_id: str, embedding: np.ndarray, context: frozenset[str], answer: str):
+        self.session_id = session_id
+        self.embedding = embedding
+        self.context = context
+        self.answer = answer
+        self.expires_at = time.time() + SEMANTIC_CACHE_TTL_SECS
+
+
+_entries: OrderedDict[int, _Entry] = OrderedDict()  # least recently used first
+_by_session: dict[str, OrderedDict[int, None]] = {}  # session -> its entry ids, oldest first
+_next_id = 0
+_lock = threading.Lock()
+_counters = {"lookups": 0, "hits": 0, "misses": 0, "context_mismatches": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+
+def enabled() -> bool:
+    return SEMANTIC_CACHE_SIZE > 0
+
+
+def refers_back(question: str) -> bool:
+    """Whether a question probably depends on earlier turns, so its answer can't be shared."""
+    return len(question.split()) < MIN_STANDALONE_WORDS or _REFERS_BACK.search(question) is not None
+
+
+def context_keys(passages: list[str]) -> frozenset[str]:
+    """Identifies the retrieved passages an answer was grounded in."""
+    return frozenset(hashlib.blake2b(p.encode(), digest_size=12).hexdigest() for p in passages)
+
+
+def lookup(session_id: str, embedding, context: frozenset[str]) -> str | None:
+    """
+    A cached answer to a question similar to this one (cosine >= SEMANTIC_CACHE_THRESHOLD)
+    whose passages mostly reappear in `context`, or None.
+    """
+    query = _normalized(embedding)
+    with _lock:
+        _counters["lookups"] += 1
+        best, best_score, similar = None, SEMANTIC_CACHE_THRESHOLD, False
+        for entry_id in list(_by_session.get(session_id, ())):
+            entry = _entries[entry_id]
+            if entry.expires_at <= time.time():
+                _remove(entry_id)
+                _counters["expired"] += 1
+                continue
+            if entry.embedding.shape != query.shape:
+                continue  # embedded by a previous model
+            score = float(entry.embedding @ query)
+            if score < best_score:
+                continue
+            similar = True
+            if len(entry.context & context) >= SEMANTIC_CACHE_CONTEXT_OVERLAP * len(entry.context):
+                best, best_score = entry_id, score
+        if best is None:
+            _counters["misses"] += 1
+            _counters["context_mismatches"] += similar
+            return None
+        _counters["hits"] += 1
+        _entries.move_to_end(best)
+        return _entries[best].answer
+
+
+def store(session_id: str, embedding, context: frozenset[str], answer: str):
+    """Cache an answer, evicting the session's oldest and then the least recently used answers."""
+    global _next_id
+    if not enabled() or not answer.strip():
+        return
+    entry = _Entry(session_id, _normalized(embedding), context, answer)
+    with _lock:
+        _next_id += 1
+        _entries[_next_id] = entry
+        _by_session.setdefault(session_id, OrderedDict())[_next_id] = None
+        _counters["stores"] += 1
+        session_entries = _by_session[session_id]
+        while len(session_entries) > SEMANTIC_CACHE_PER_SESSION:
+            _remove(next(iter(session_entries)))
+            _counters["evictions"] += 1
+        while len(_entries) > SEMANTIC_CACHE_SIZE:
+            _remove(next(iter(_entries)))
+            _counters["evictions"] += 1
+
+
+def invalidate(session_id: str):
+    """Drop a session's cached answers (e.g. it opted out)."""
+    with _lock:
+        for entry_id in list(_by_session.get(session_id, ())):
+            _remove(entry_id)
+
+
+def replay(answer: str) -> list[str]:
+    """A cached answer split into word-sized deltas, to stream like a live one."""
+    return _REPLAY_PIECES.findall(answer)
+
+
+def stats() -> dict:
+    with _lock:
+        lookups = _counters["lookups"]
+        return {
+            **_counters,
+            "hit_rate": round(_counters["hits"] / lookups, 3) if lookups else 0.0,
+            "answers": len(_entries),
+            "sessions": len(_by_session),
+        }
+
+
+def _remove(entry_id: int):
+    # Caller holds _lock
+    entry = _entries.pop(entry_id)
+    session_entries = _by_session[entry.session_id]
+    del session_entries[entry_id]
+    if not session_entries:
+        del _by_session[entry.session_id]
+
+
+def _normalized(embedding) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    return vector / (np.linalg.norm(vector) or 1)
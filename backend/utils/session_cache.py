@@ -0,0 +1,43 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+# Session metadata (title, source) cached in-process, so existence checks on the
+# chat and read routes don't hit Postgres on every request. Only fields that never
+# change after ingest are cached: invalidate() reaches this process alone, so other
+# workers would keep a changed value for up to SESSION_CACHE_TTL_SECS. Settings
+# (answer_cache) are read from Postgres. Missing sessions are re-checked.
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "4096"))  # 0 disables the cache
+SESSION_CACHE_TTL_SECS = float(os.getenv("SESSION_CACHE_TTL_SECS", "300"))
+
+_entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()  # session id -> (expires_at, metadata)
+_lock = threading.Lock()
+
+
+def get(session_id: str) -> dict | None:
+    with _lock:
+        entry = _entries.get(session_id)
+        if entry is None:
+            return None
+        expires_at, meta = entry
+        if expires_at <= time.time():
+            del _entries[session_id]
+            return None
+        _entries.move_to_end(session_id)
+        return meta
+
+
+def put(session_id: str, meta: dict):
+    if SESSION_CACHE_SIZE <= 0:
+        return
+    with _lock:
+        _entries[session_id] = (time.time() + SESSION_CACHE_TTL_SECS, meta)
+        _entries.move_to_end(session_id)
+        while len(_entries) > SESSION_CACHE_SIZE:
+            _entries.popitem(last=False)
+
+
+def invalidate(session_id: str):
+    with _lock:
+        _entries.pop(session_id, None)
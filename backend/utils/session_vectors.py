@@ -0,0 +1,185 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# In-process cache of hot sessions' chunk embeddings, so retrieval for a session
+# being chatted with is a single matmul instead of a pgvector round trip
+VECTOR_CACHE_MB = float(os.getenv("VECTOR_CACHE_MB", "256"))  # 0 disables the cache
+VECTOR_CACHE_MAX_CHUNKS = int(os.getenv("VECTOR_CACHE_MAX_CHUNKS", "20000"))  # bigger sessions stay on pgvector
+
+_budget_bytes = int(VECTOR_CACHE_MB * 1024 * 1024)
+TOO_LARGE_REMEMBERED = 4096  # sessions known not to fit; the oldest are forgotten (and re-checked) first
+WRITES_REMEMBERED = 1024  # recent chunk writes kept to detect stale loads
+
+_entries: OrderedDict[str, "SessionVectors"] = OrderedDict()  # least recently used first
+_too_large: OrderedDict[str, None] = OrderedDict()  # oldest first
+# Stale-load detection: every invalidation ticks _clock and records it for the session.
+# A load started at clock t is discarded if its session was written after t, or if
+# writes after t may have been forgotten (_forgotten_upto), so memory stays bounded.
+_clock = 0
+_writes: OrderedDict[str, int] = OrderedDict()  # session -> clock of its last write, oldest first
+_forgotten_upto = 0
+_used_bytes = 0
+_hits = 0
+_misses = 0
+_lock = threading.Lock()
+
+
+class SessionVectors:
+    """One session's chunk texts, L2-normalised float32 embedding matrix and parent windows."""
+
+    def __init__(self, contents: list[str], matrix: np.ndarray, parents: list[int | None] | None = None):
+        self.contents = contents
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        norms = np.linalg.norm(self.matrix, axis=1, keepdims=True)
+        self.matrix /= np.where(norms == 0, 1, norms)
+        self.parents = parents if parents is not None else [None] * len(contents)
+        self.nbytes = self.matrix.nbytes + sum(len(c) for c in contents)
+        self._positions: dict[str, int] | None = None
+
+    def parent_windows(self, parents: list[int]) -> dict[int, str]:
+        """Text of the given parent windows, in the same shape as database.get_parent_windows."""
+        wanted = set(parents)
+        children: dict[int, list[str]] = {}
+        for content, parent in zip(self.contents, self.parents):
+            if parent in wanted:
+                children.setdefault(parent, []).append(content)
+        return {parent: " ".join(texts) for parent, texts in children.items()}
+
+    def index_of(self, content: str) -> int | None:
+        """Row of a chunk given its text (e.g. a full-text match from the DB)."""
+        if self._positions is None:
+            self._positions = {c: i for i, c in enumerate(self.contents)}
+        return self._positions.get(content)
+
+    def scores(self, query_embedding) -> np.ndarray:
+        """Cosine similarity of every chunk to the query."""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        return self.matrix @ (query / (np.linalg.norm(query) or 1))
+
+    def search(self, query_embedding, top_k: int) -> list[dict]:
+        """Cosine top-k, in the same shape as database.similarity_search."""
+        if not self.contents or top_k <= 0:
+            return []
+        scores = self.scores(query_embedding)
+        if top_k < len(scores):
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [{"content": self.contents[i], "similarity": float(scores[i]), "parent": self.parents[i]} for i in top]
+
+
+def enabled() -> bool:
+    return _budget_bytes > 0
+
+
+def token(session_id: str) -> int:
+    """Taken before loading a session from the DB; put() ignores the load if it went stale."""
+    with _lock:
+        return _clock
+
+
+def get(session_id: str) -> SessionVectors | None:
+    global _hits, _misses
+    with _lock:
+        entry = _entries.get(session_id)
+        if entry is None:
+            _misses += 1
+            return None
+        _entries.move_to_end(session_id)
+        _hits += 1
+        return entry
+
+
+def peek(session_id: str) -> SessionVectors | None:
+    """The cached entry, if any, without counting a lookup or refreshing its LRU position."""
+    with _lock:
+        return _entries.get(session_id)
+
+
+def is_cacheable(session_id: str) -> bool:
+    return enabled() and session_id not in _too_large
+
+
+def mark_too_large(session_id: str):
+    """Keep a session that doesn't fit the cache on pgvector until its chunks change."""
+    with _lock:
+        _mark_too_large(session_id)
+
+
+def put(session_id: str, contents: list[str], matrix: np.ndarray, parents: list[int | None],
+        load_token: int) -> SessionVectors:
+    """
+    Cache a session loaded from the DB, evicting least recently used sessions
+    to stay within the memory budget. Returns the entry (cached or not).
+    """
+    global _used_bytes
+    entry = SessionVectors(contents, matrix, parents)
+    with _lock:
+        if _writes.get(session_id, 0) > load_token or _forgotten_upto > load_token:
+            return entry  # chunks were (or may have been) written while we were loading
+        if entry.nbytes > _budget_bytes or len(contents) > VECTOR_CACHE_MAX_CHUNKS:
+            _mark_too_large(session_id)
+            return entry
+        old = _entries.pop(session_id, None)
+        if old is not None:
+            _used_bytes -= old.nbytes
+        while _entries and _used_bytes + entry.nbytes > _budget_bytes:
+            _, evicted = _entries.popitem(last=False)
+            _used_bytes -= evicted.nbytes
+        _entries[session_id] = entry
+        _used_bytes += entry.nbytes
+    return entry
+
+
+def invalidate(session_id: str):
+    """Drop a session after its chunks were written."""
+    global _used_bytes, _clock, _forgotten_upto
+    with _lock:
+        _clock += 1
+        _writes.pop(session_id, None)
+        _writes[session_id] = _clock
+        while len(_writes) > WRITES_REMEMBERED:
+            _, written_at = _writes.popitem(last=False)
+            _forgotten_upto = max(_forgotten_upto, written_at)
+        _too_large.pop(session_id, None)
+        entry = _entries.pop(session_id, None)
+        if entry is not None:
+            _used_bytes -= entry.nbytes
+
+
+def invalidate_all():
+    """Drop every session (e.g. embeddings were rewritten across sessions)."""
+    global _used_bytes, _clock, _forgotten_upto
+    with _lock:
+        _clock += 1
+        _forgotten_upto = _clock  # every load in flight is stale
+        _writes.clear()
+        _entries.clear()
+        _too_large.clear()
+        _used_bytes = 0
+
+
+def _mark_too_large(session_id: str):
+    # Caller holds _lock
+    _too_large[session_id] = None
+    _too_large.move_to_end(session_id)
+    while len(_too_large) > TOO_LARGE_REMEMBERED:
+        _too_large.popitem(last=False)
+
+
+def stats() -> dict:
+    with _lock:
+        lookups = _hits + _misses
+        return {
+            "sessions": len(_entries),
+            "too_large": len(_too_large),
+            "bytes": _used_bytes,
+            "budget_bytes": _budget_bytes,
+            "hits": _hits,
+            "misses": _misses,
+            "hit_rate": round(_hits / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,80 @@
+import time
+import asyncio
+import threading
+from typing import AsyncIterator, Callable, Iterator
+
+STREAM_QUEUE_SIZE = 64  # max deltas buffered between the worker thread and the client
+
+# Headers for SSE responses: no caching, and no proxy buffering (nginx) between the events and the client
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def stream_metrics(started: float, first_item_at: float | None) -> dict:
+    """Time to the first streamed item and to the end of the stream (from perf_counter() readings)."""
+    finished = time.perf_counter()
+    return {
+        "first_item_ms": round((first_item_at - started) * 1000, 1) if first_item_at is not None else None,
+        "total_ms": round((finished - started) * 1000, 1),
+    }
+
+
+async def iterate_in_thread(make_iter: Callable[[], Iterator], maxsize: int = STREAM_QUEUE_SIZE) -> AsyncIterator:
+    """
+    Drive a blocking iterator in a worker thread and yield each item on the event loop
+    as soon as it is produced.
+
+    The hand-off queue is bounded, so a slow client applies backpressure to the producer.
+    If the consumer stops early (e.g. the client disconnected), the producer is told to
+    stop and the underlying iterator is closed after its current item.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item):
+        if stop.is_set():
+            return
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    def produce():
+        iterator = None
+        try:
+            iterator = make_iter()
+            for item in iterator:
+                if stop.is_set():
+                    break
+                put(item)
+            else:
+                put(_DONE)
+        except BaseException as e:
+            put(_Failure(e))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close:
+                close()
+
+    loop.run_in_executor(None, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        # Free any slot the producer may be blocked on so its thread can exit
+        while not queue.empty():
+            queue.get_nowait()
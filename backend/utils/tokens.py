@@ -0,0 +1,31 @@
+import re
+
+# LLM token estimate without shipping the model's tokenizer. Llama 3's BPE keeps
+# common words whole, splits long ones, and gives punctuation and digit groups
+# their own tokens; counting the same way errs slightly high, which is the safe
+# side for budgeting.
+_PIECES = re.compile(r"[^\W\d_]+|\d{1,3}|[^\w\s]|_")
+
+
+def count_tokens(text: str) -> int:
+    return sum(1 + (len(piece) - 1) // 8 for piece in _PIECES.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Longest whole-word prefix of `text` estimated to fit in `max_tokens`."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    words = text.split(" ")
+    low, high = 0, len(words)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if count_tokens(" ".join(words[:mid])) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return " ".join(words[:low])
+
+
+def message_tokens(messages: list[dict]) -> int:
+    """Prompt tokens for a chat message list, including the per-message framing."""
+    return sum(count_tokens(m["content"]) + 4 for m in messages)
@@ -0,0 +1,94 @@
+import os
+import math
+
+# ANN index on chunks.embedding: "hnsw" (default), "ivfflat" or "none" (exact scans).
+# Only built when per-session searches scan it iteratively (see VECTOR_SESSION_SCAN)
+VECTOR_INDEX = os.getenv("VECTOR_INDEX", "hnsw")
+
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "40"))
+
+IVFFLAT_LISTS = int(os.getenv("IVFFLAT_LISTS", "0"))  # 0 = derive from row count
+IVFFLAT_PROBES = int(os.getenv("IVFFLAT_PROBES", "10"))
+IVFFLAT_MIN_ROWS = int(os.getenv("IVFFLAT_MIN_ROWS", "1000"))  # don't train lists on (nearly) empty tables
+IVFFLAT_REBUILD_GROWTH = float(os.getenv("IVFFLAT_REBUILD_GROWTH", "2.0"))  # rebuild once rows grow by this factor
+
+# Every search is filtered to one session, and an ANN index scan applies that filter
+# only to the ef_search / probes candidates it found, so on a table holding many
+# sessions it returns far fewer than k rows, often none. "exact" searches the
+# session's own rows through chunks_session_id_idx (exact, and cheap for one
+# session) and no ANN index is built, since nothing would read it; "iterative"
+# keeps the ANN scan but lets it continue until enough rows pass the filter
+# (pgvector >= 0.8; older versions fall back to "exact"). "auto" picks "iterative"
+# when the installed pgvector supports it, else "exact".
+VECTOR_SESSION_SCAN = os.getenv("VECTOR_SESSION_SCAN", "auto")
+
+VECTOR_INDEX_CHECK_SECS = float(os.getenv("VECTOR_INDEX_CHECK_SECS", "600"))
+
+INDEX_NAME = "chunks_embedding_idx"
+
+
+def ivfflat_lists(row_count: int) -> int:
+    """pgvector's guidance: rows / 1000 up to 1M rows, sqrt(rows) beyond."""
+    if row_count <= 1_000_000:
+        return max(10, row_count // 1000)
+    return int(math.sqrt(row_count))
+
+
+def desired_index(row_count: int, kind: str = VECTOR_INDEX) -> dict | None:
+    """Index spec for the current settings and table size, or None for no index."""
+    if VECTOR_SESSION_SCAN != "iterative":
+        return None  # exact per-session scans never read it; it would only slow down writes
+    if kind == "hnsw":
+        return {"kind": "hnsw", "m": HNSW_M, "ef_construction": HNSW_EF_CONSTRUCTION}
+    if kind == "ivfflat":
+        if row_count < IVFFLAT_MIN_ROWS:
+            return None
+        return {"kind": "ivfflat", "lists": IVFFLAT_LISTS or ivfflat_lists(row_count)}
+    return None
+
+
+def needs_rebuild(current: dict | None, rows_at_build: int, desired: dict, row_count: int) -> bool:
+    if not current or current.get("kind") != desired["kind"]:
+        return True
+    if desired["kind"] == "hnsw":
+        # HNSW grows incrementally; only a parameter change needs a rebuild
+        return current != desired
+    if IVFFLAT_LISTS and current.get("lists") != IVFFLAT_LISTS:
+        return True
+    # IVFFlat centroids are fixed at build time; retrain once the table has grown enough
+    return row_count > max(rows_at_build, 1) * IVFFLAT_REBUILD_GROWTH
+
+
+def index_ddl(spec: dict, name: str = INDEX_NAME, table: str = "chunks", concurrently: bool = True) -> str:
+    how = "CONCURRENTLY " if concurrently else ""
+    if spec["kind"] == "hnsw":
+        params = f"m = {int(spec['m'])}, ef_construction = {int(spec['ef_construction'])}"
+    else:
+        params = f"lists = {int(spec['lists'])}"
+    return (f"CREATE INDEX {how}{name} ON {table} "
+            f"USING {spec['kind']} (embedding vector_cosine_ops) WITH ({params})")
+
+
+def check_extension(version: str):
+    """Resolve VECTOR_SESSION_SCAN for the installed pgvector (iterative scans need >= 0.8)."""
+    global VECTOR_SESSION_SCAN
+    iterative_ok = tuple(int(p) for p in version.split(".")[:2]) >= (0, 8)
+    if VECTOR_SESSION_SCAN == "auto":
+        VECTOR_SESSION_SCAN = "iterative" if iterative_ok else "exact"
+    elif VECTOR_SESSION_SCAN == "iterative" and not iterative_ok:
+        print(f"⚠️ VECTOR_SESSION_SCAN=iterative needs pgvector >= 0.8 (found {version}); using exact scans")
+        VECTOR_SESSION_SCAN = "exact"
+
+
+def search_settings(kind: str = VECTOR_INDEX) -> list[str]:
+    """Per-transaction settings applied before a (per-session) similarity query."""
+    if kind not in ("hnsw", "ivfflat"):
+        return []
+    if VECTOR_SESSION_SCAN != "iterative":
+        # No plain index scans: the ANN index can't be used, the session_id index still can (as a bitmap scan)
+        return ["SET LOCAL enable_indexscan = off"]
+    if kind == "hnsw":
+        return [f"SET LOCAL hnsw.ef_search = {HNSW_EF_SEARCH}", "SET LOCAL hnsw.iterative_scan = strict_order"]
+    return [f"SET LOCAL ivfflat.probes = {IVFFLAT_PROBES}", "SET LOCAL ivfflat.iterative_scan = relaxed_order"]
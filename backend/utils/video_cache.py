@@ -0,0 +1,42 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+from utils import metrics
+
+# YouTube transcripts and titles cached in-process by video id, so re-processing a
+# video (or a retried job) doesn't fetch it again. Videos that can't be processed
+# ("transcripts disabled", unavailable) are remembered for a shorter while, so
+# repeated bad URLs don't hit YouTube either.
+VIDEO_CACHE_SIZE = int(os.getenv("VIDEO_CACHE_SIZE", "512"))  # entries; 0 disables the cache
+VIDEO_CACHE_TTL_SECS = float(os.getenv("VIDEO_CACHE_TTL_SECS", str(6 * 3600)))
+VIDEO_NEGATIVE_TTL_SECS = float(os.getenv("VIDEO_NEGATIVE_TTL_SECS", "3600"))  # for videos without a transcript
+
+LOOKUPS = metrics.Counter("video_cache_lookups_total", "Video transcript / title cache lookups", ("kind", "result"))
+
+_entries: OrderedDict[tuple[str, str], tuple[float, str]] = OrderedDict()  # (kind, video id) -> (expires_at, value)
+_lock = threading.Lock()
+
+
+def get(kind: str, video_id: str) -> str | None:
+    """A cached "transcript" / "title", or the error message of a "no_transcript" entry."""
+    with _lock:
+        entry = _entries.get((kind, video_id))
+        if entry is not None and entry[0] <= time.time():
+            del _entries[(kind, video_id)]
+            entry = None
+        if entry is not None:
+            _entries.move_to_end((kind, video_id))
+    LOOKUPS.inc(kind=kind, result="miss" if entry is None else "hit")
+    return entry[1] if entry is not None else None
+
+
+def put(kind: str, video_id: str, value: str, ttl_secs: float = VIDEO_CACHE_TTL_SECS):
+    if VIDEO_CACHE_SIZE <= 0 or ttl_secs <= 0:
+        return
+    with _lock:
+        _entries[(kind, video_id)] = (time.time() + ttl_secs, value)
+        _entries.move_to_end((kind, video_id))
+        while len(_entries) > VIDEO_CACHE_SIZE:
+            _entries.popitem(last=False)